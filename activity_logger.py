@@ -0,0 +1,240 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seuils de vidage par défaut du tampon
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0
+# Échecs consécutifs d'un lot avant de l'écrire ligne par ligne
+DEFAULT_MAX_RETRIES = 3
+# Au-delà, les événements les plus anciens sont abandonnés
+DEFAULT_MAX_PENDING = 100_000
+
+INSERT_ACTIVITY_LOG = '''
+INSERT INTO activity_logs (user_id, action, details, ip_address, created_at)
+VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def create_user_tables(conn: sqlite3.Connection) -> None:
+    """Crée les tables des utilisateurs, des demandes admin et des logs d'activité"""
+    with conn:
+        # Table des utilisateurs
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT DEFAULT 'user',
+            status TEXT DEFAULT 'active',
+            last_login TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            auth_version INTEGER NOT NULL DEFAULT 0,
+            CHECK (role IN ('user', 'manager', 'admin')),
+            CHECK (status IN ('active', 'inactive', 'suspended'))
+        )''')
+
+        # Version des autorisations, incrémentée à chaque changement de rôle ou de statut
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+        if 'auth_version' not in columns:
+            conn.execute('ALTER TABLE users ADD COLUMN auth_version INTEGER NOT NULL DEFAULT 0')
+
+        # Table des demandes admin
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS admin_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            justification TEXT,
+            request_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'pending',
+            approved_by INTEGER,
+            FOREIGN KEY (approved_by) REFERENCES users (id)
+        )''')
+
+        # Table des logs d'activité
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS activity_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            details TEXT,
+            ip_address TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_activity_logs_created ON activity_logs (created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_activity_logs_user_created ON activity_logs (user_id, created_at)')
+
+
+class BufferedActivityLogger:
+    """
+    Tampon des logs d'activité: les événements sont mis en file en mémoire et écrits
+    par lots (executemany) depuis un thread en arrière-plan, dans l'ordre d'arrivée
+    """
+
+    def __init__(self, db_name: str = "bank_database.db", batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_retries: int = DEFAULT_MAX_RETRIES,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        """
+        Args:
+            db_name: Chemin de la base de données
+            batch_size: Nombre d'événements en attente qui déclenche un vidage immédiat
+            flush_interval: Délai maximal (secondes) avant l'écriture d'un événement
+            max_retries: Tentatives d'écriture d'un lot avant de l'écrire ligne par ligne
+            max_pending: Taille maximale du tampon (les plus anciens sont abandonnés)
+        """
+        self.db_path = os.path.abspath(db_name)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+        self.max_pending = max_pending
+        self._buffer: List[tuple] = []
+        self._failed_attempts = 0
+        # Événements abandonnés depuis le dernier vidage (tampon plein)
+        self._dropped = 0
+        # _lock protège le tampon; _flush_lock sérialise les écritures pour conserver l'ordre
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connexion dédiée, utilisée uniquement sous _flush_lock"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        return self._conn
+
+    def log(self, user_id: int, action: str, details: str = "", ip_address: str = "") -> None:
+        """Met un événement en file (horodaté à l'appel, en UTC comme CURRENT_TIMESTAMP)"""
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._buffer.append((user_id, action, details, ip_address, created_at))
+            self._trim()
+            pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _trim(self) -> None:
+        """Abandonne les événements les plus anciens au-delà de max_pending (appelé sous _lock)"""
+        overflow = len(self._buffer) - self.max_pending
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self._dropped += overflow
+
+    def pending(self) -> int:
+        """Nombre d'événements pas encore écrits"""
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self) -> int:
+        """
+        Écrit immédiatement tous les événements en attente.
+        Un lot en échec est retenté au plus max_retries fois, puis écrit ligne par ligne:
+        les lignes refusées sont journalisées et abandonnées.
+        Returns:
+            int: Nombre d'événements écrits
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                logger.warning(f"Tampon des logs d'activité plein: {dropped} événements anciens abandonnés")
+            if not batch:
+                return 0
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(INSERT_ACTIVITY_LOG, batch)
+                self._failed_attempts = 0
+                return len(batch)
+            except sqlite3.Error as e:
+                self._failed_attempts += 1
+                logger.error(f"Écriture des logs d'activité impossible "
+                             f"(tentative {self._failed_attempts}/{self.max_retries}): {str(e)}")
+                if self._failed_attempts < self.max_retries:
+                    # Le lot est remis en tête du tampon pour la prochaine tentative, ordre conservé
+                    with self._lock:
+                        self._buffer[:0] = batch
+                        self._trim()
+                    return 0
+            self._failed_attempts = 0
+            return self._write_rows(batch)
+
+    def _write_rows(self, batch: List[tuple]) -> int:
+        """Écrit un lot ligne par ligne; les lignes refusées sont journalisées puis abandonnées"""
+        written = 0
+        for row in batch:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute(INSERT_ACTIVITY_LOG, row)
+                written += 1
+            except sqlite3.Error as e:
+                logger.error(f"Log d'activité abandonné {row!r}: {str(e)}")
+        return written
+
+    # ===== Vidage en arrière-plan =====
+    def start(self) -> None:
+        """Démarre le thread de vidage"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self) -> None:
+        """Arrête le thread, écrit les événements restants et ferme la connexion"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        with self._flush_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_loggers: Dict[str, BufferedActivityLogger] = {}
+_loggers_lock = threading.Lock()
+
+
+def get_activity_logger(db_name: str = "bank_database.db") -> BufferedActivityLogger:
+    """Retourne le logger d'activité du processus pour une base (démarré au premier appel)"""
+    db_path = os.path.abspath(db_name)
+    with _loggers_lock:
+        activity_logger = _loggers.get(db_path)
+        if activity_logger is None:
+            activity_logger = BufferedActivityLogger(db_path)
+            activity_logger.start()
+            _loggers[db_path] = activity_logger
+        return activity_logger
+
+
+@atexit.register
+def _flush_all() -> None:
+    """Écrit les événements en attente à l'arrêt du processus"""
+    with _loggers_lock:
+        activity_loggers = list(_loggers.values())
+    for activity_logger in activity_loggers:
+        activity_logger.stop()
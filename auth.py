@@ -13,6 +13,8 @@ Structure:
 # 1. IMPORTS ET CONFIGURATION
 # =============================================
 from io import BytesIO
+import csv
+import io
 import logging
 import re
 import PyPDF2
@@ -35,10 +37,22 @@ import pandas as pd
 import plotly.express as px
 from database import BankDatabase
 from receipt_generator import generate_receipt_pdf
+from receipt_batch import generate_receipts_batch
+from receipt_store import get_receipt_store
+from teller_journal import generate_teller_journal
+from qr_rendering import draw_qr_fpdf
+from kpi_snapshot import get_kpi_service
+from activity_logger import create_user_tables, get_activity_logger
+from password_hashing import hash_password, verify_password, needs_rehash, get_dummy_hash
+from session_store import SessionError, get_session_store
+from rate_limiter import get_login_rate_limiter, resolve_client_address
+from maintenance import get_maintenance_scheduler
 from faker import Faker
 import time
 import base64
 import os
+import threading
+import uuid
 from datetime import datetime, timedelta
 from PIL import Image
 import PyPDF2
@@ -60,6 +74,10 @@ from streamlit.components.v1 import html
 # Modifiez cette ligne
 DATABASE_NAME = os.path.abspath("bank_database.db")  # Chemin absolu
 
+# Proxys inverses de confiance (adresses ou réseaux CIDR), seuls autorisés à fournir X-Forwarded-For
+# Exemple derrière nginx sur la même machine: TRUSTED_PROXIES = ('127.0.0.1', '::1')
+TRUSTED_PROXIES = ()
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -71,58 +89,30 @@ logger = logging.getLogger(__name__)
 # 2. CLASSES DE GESTION DE BASE DE DONNÉES
 # =============================================
 
+USER_ROLES = ('user', 'manager', 'admin')
+USER_STATUSES = ('active', 'inactive', 'suspended')
+
 class EnhancedUserManager:
     """Gestionnaire complet des utilisateurs et de l'administration"""
+
+    # Bases dont le schéma a déjà été vérifié par ce processus
+    _initialized_databases = set()
+    _initialized_lock = threading.Lock()
     
     def __init__(self, conn: sqlite3.Connection):
-        """Initialise la connexion et crée les tables"""
+        """Initialise la connexion et crée les tables (une fois par base et par processus)"""
         self.conn = conn
-        self._create_tables()
+        self.db_path = conn.execute("PRAGMA database_list").fetchone()[2] or DATABASE_NAME
+        with self._initialized_lock:
+            if self.db_path not in self._initialized_databases:
+                self._create_tables()
+                self._initialized_databases.add(self.db_path)
+        # Les logs d'activité passent par le tampon partagé du processus pour ce fichier
+        self.activity_logger = get_activity_logger(self.db_path)
 
     def _create_tables(self):
         """Crée les tables nécessaires dans la base de données"""
-        with self.conn:
-            # Table des utilisateurs
-            self.conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT DEFAULT 'user',
-                status TEXT DEFAULT 'active',
-                last_login TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                CHECK (role IN ('user', 'manager', 'admin')),
-                CHECK (status IN ('active', 'inactive', 'suspended'))
-            )''')
-
-            # Table des demandes admin
-            self.conn.execute('''
-            CREATE TABLE IF NOT EXISTS admin_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                justification TEXT,
-                request_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'pending',
-                approved_by INTEGER,
-                FOREIGN KEY (approved_by) REFERENCES users (id)
-            )''')
-
-            # Table des logs d'activité
-            self.conn.execute('''
-            CREATE TABLE IF NOT EXISTS activity_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                action TEXT NOT NULL,
-                details TEXT,
-                ip_address TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )''')
+        create_user_tables(self.conn)
 
     # Méthodes de gestion des utilisateurs
     def add_user(self, username: str, email: str, password_hash: str, role: str = 'user') -> int:
@@ -134,7 +124,8 @@ class EnhancedUserManager:
                 INSERT INTO users (username, email, password_hash, role)
                 VALUES (?, ?, ?, ?)
                 ''', (username, email, password_hash, role))
-                return cursor.lastrowid
+            invalidate_auth_cache()
+            return cursor.lastrowid
         except sqlite3.IntegrityError as e:
             raise sqlite3.IntegrityError(f"Erreur d'intégrité: {str(e)}")
 
@@ -151,19 +142,91 @@ class EnhancedUserManager:
         cursor.execute('SELECT * FROM users ORDER BY username')
         return [dict(row) for row in cursor.fetchall()]
 
+    def get_user_id_by_username(self, username: str) -> Optional[int]:
+        """Récupère l'ID d'un utilisateur par son nom d'utilisateur"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id FROM users WHERE username=?', (username,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
     def update_user_role(self, user_id: int, new_role: str) -> None:
         """Met à jour le rôle d'un utilisateur"""
         with self.conn:
             self.conn.execute(
-                'UPDATE users SET role=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
+                'UPDATE users SET role=?, auth_version=auth_version+1, updated_at=CURRENT_TIMESTAMP WHERE id=?',
                 (new_role, user_id))
+        invalidate_auth_cache()
+        get_session_store(self.db_path).invalidate_user(user_id)
+
+    def update_password_hash(self, user_id: int, password_hash: str) -> None:
+        """Remplace le hachage du mot de passe d'un utilisateur"""
+        with self.conn:
+            self.conn.execute(
+                'UPDATE users SET password_hash=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
+                (password_hash, user_id))
 
     def update_user_status(self, user_id: int, new_status: str) -> None:
         """Met à jour le statut d'un utilisateur"""
         with self.conn:
             self.conn.execute(
-                'UPDATE users SET status=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
+                'UPDATE users SET status=?, auth_version=auth_version+1, updated_at=CURRENT_TIMESTAMP WHERE id=?',
                 (new_status, user_id))
+        invalidate_auth_cache()
+        get_session_store(self.db_path).invalidate_user(user_id)
+
+    def apply_user_changes(self, changes: List[Dict], changed_by: int) -> int:
+        """
+        Applique des changements de rôle et de statut, avec leurs logs d'audit, en une seule transaction
+        Args:
+            changes: Lignes modifiées, chacune {'id': ..., 'role': ...?, 'status': ...?}
+            changed_by: ID de l'utilisateur qui effectue les modifications
+        Returns:
+            int: Nombre d'utilisateurs modifiés
+        """
+        updates, audit_rows = [], []
+        for change in changes:
+            user_id = int(change['id'])
+            role, status = change.get('role'), change.get('status')
+            if role is not None and role not in USER_ROLES:
+                raise ValueError(f"Rôle invalide: {role}")
+            if status is not None and status not in USER_STATUSES:
+                raise ValueError(f"Statut invalide: {status}")
+            if role is None and status is None:
+                continue
+            updates.append((role, status, user_id))
+            if role is not None:
+                audit_rows.append((changed_by, "Modification rôle", f"Utilisateur ID:{user_id} nouveau rôle: {role}"))
+            if status is not None:
+                audit_rows.append((changed_by, "Modification statut", f"Utilisateur ID:{user_id} nouveau statut: {status}"))
+
+        if not updates:
+            return 0
+        try:
+            with self.conn:
+                self.conn.executemany('''
+                UPDATE users
+                SET role=COALESCE(?, role), status=COALESCE(?, status),
+                    auth_version=auth_version+1, updated_at=CURRENT_TIMESTAMP
+                WHERE id=?
+                ''', updates)
+                # Audit écrit directement dans la transaction, pas via le tampon des logs
+                self.conn.executemany(
+                    'INSERT INTO activity_logs (user_id, action, details) VALUES (?, ?, ?)',
+                    audit_rows)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la mise à jour des utilisateurs: {str(e)}")
+
+        invalidate_auth_cache()
+        session_store = get_session_store(self.db_path)
+        for _, _, user_id in updates:
+            session_store.invalidate_user(user_id)
+        return len(updates)
+
+    def admin_exists(self) -> bool:
+        """Indique si au moins un compte administrateur existe"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM users WHERE role='admin')")
+        return bool(cursor.fetchone()[0])
 
     def count_active_users(self) -> int:
         """Compte les utilisateurs actifs"""
@@ -172,37 +235,131 @@ class EnhancedUserManager:
         return cursor.fetchone()[0]
 
     def log_activity(self, user_id: int, action: str, details: str = "", ip_address: str = "") -> None:
-        """Enregistre une activité utilisateur"""
-        with self.conn:
-            self.conn.execute('''
-            INSERT INTO activity_logs (user_id, action, details, ip_address)
-            VALUES (?, ?, ?, ?)
-            ''', (user_id, action, details, ip_address))
+        """Enregistre une activité utilisateur (écriture différée, par lots)"""
+        self.activity_logger.log(user_id, action, details, ip_address)
+
+    def _activity_log_filters(self, date_filter=None, user_id: int = None, action: str = None) -> tuple:
+        """Construit la clause WHERE des logs (plage sur created_at pour rester indexée)"""
+        conditions, params = [], []
+        if date_filter:
+            conditions.append("l.created_at >= date(?) AND l.created_at < date(?, '+1 day')")
+            params.extend([str(date_filter), str(date_filter)])
+        if user_id:
+            conditions.append('l.user_id = ?')
+            params.append(user_id)
+        if action:
+            conditions.append("l.action LIKE ? ESCAPE '\\'")
+            escaped = action.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+        return (' AND '.join(conditions) or '1=1'), params
 
     def get_activity_logs(self, date_filter: str = None, user_id: int = None) -> List[Dict]:
         """Récupère les logs d'activité avec filtres"""
-        query = '''
+        # Les événements encore en tampon doivent être visibles
+        self.activity_logger.flush()
+        where, params = self._activity_log_filters(date_filter, user_id)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
         SELECT l.*, u.username 
         FROM activity_logs l
         JOIN users u ON l.user_id = u.id
-        WHERE 1=1
-        '''
-        params = []
-        
-        if date_filter:
-            query += ' AND date(l.created_at) = date(?)'
-            params.append(date_filter)
-        
-        if user_id:
-            query += ' AND l.user_id = ?'
-            params.append(user_id)
-        
-        query += ' ORDER BY l.created_at DESC'
-        
+        WHERE {where}
+        ORDER BY l.created_at DESC
+        ''', params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def count_activity_logs(self, date_filter=None, user_id: int = None, action: str = None) -> int:
+        """Compte les logs correspondant aux filtres"""
+        self.activity_logger.flush()
+        where, params = self._activity_log_filters(date_filter, user_id, action)
         cursor = self.conn.cursor()
-        cursor.execute(query, params)
+        cursor.execute(f'SELECT COUNT(*) FROM activity_logs l WHERE {where}', params)
+        return cursor.fetchone()[0]
+
+    def get_activity_logs_page(self, date_filter=None, user_id: int = None, action: str = None,
+                               page: int = 1, page_size: int = 100) -> List[Dict]:
+        """Récupère une page de logs filtrés, du plus récent au plus ancien"""
+        self.activity_logger.flush()
+        where, params = self._activity_log_filters(date_filter, user_id, action)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+        SELECT l.created_at, u.username, l.action, l.details, l.ip_address
+        FROM activity_logs l
+        LEFT JOIN users u ON l.user_id = u.id
+        WHERE {where}
+        ORDER BY l.created_at DESC, l.id DESC
+        LIMIT ? OFFSET ?
+        ''', params + [page_size, (max(1, page) - 1) * page_size])
         return [dict(row) for row in cursor.fetchall()]
 
+    def iter_activity_logs_csv(self, date_filter=None, user_id: int = None, action: str = None,
+                               chunk_size: int = 5000):
+        """
+        Génère l'export CSV des logs filtrés par morceaux de texte, sans charger tous les logs
+        Yields:
+            str: En-tête puis lignes CSV, par paquets de chunk_size logs
+        """
+        self.activity_logger.flush()
+        where, params = self._activity_log_filters(date_filter, user_id, action)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+        SELECT l.created_at, u.username, l.action, l.details, l.ip_address
+        FROM activity_logs l
+        LEFT JOIN users u ON l.user_id = u.id
+        WHERE {where}
+        ORDER BY l.created_at DESC, l.id DESC
+        ''', params)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["Date", "Utilisateur", "Action", "Détails", "IP"])
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(tuple(row) for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def get_activity_summary(self, day=None) -> Dict:
+        """
+        Résume l'activité d'une journée en une seule requête (servie par l'index sur created_at)
+        Args:
+            day: Jour à résumer (date ou 'YYYY-MM-DD', par défaut aujourd'hui)
+        Returns:
+            Dict: {'day', 'last_activity', 'total', 'by_action', 'by_user'}
+        """
+        self.activity_logger.flush()
+        day = str(day or datetime.now().date())
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT NULL AS action, NULL AS username, 0 AS count, MAX(created_at) AS last_at
+        FROM activity_logs
+        UNION ALL
+        SELECT l.action, u.username, COUNT(*), MAX(l.created_at)
+        FROM activity_logs l
+        LEFT JOIN users u ON l.user_id = u.id
+        WHERE l.created_at >= date(?) AND l.created_at < date(?, '+1 day')
+        GROUP BY l.action, l.user_id
+        ''', (day, day))
+        rows = cursor.fetchall()
+
+        by_action, by_user = {}, {}
+        for row in rows[1:]:
+            by_action[row['action']] = by_action.get(row['action'], 0) + row['count']
+            username = row['username'] or "Inconnu"
+            by_user[username] = by_user.get(username, 0) + row['count']
+        return {
+            'day': day,
+            'last_activity': rows[0]['last_at'],
+            'total': sum(by_action.values()),
+            'by_action': dict(sorted(by_action.items(), key=lambda item: -item[1])),
+            'by_user': dict(sorted(by_user.items(), key=lambda item: -item[1]))
+        }
+
     # Méthodes de gestion des comptes admin
     def create_admin_account(self, username: str, email: str, password: str, justification: str = "") -> bool:
         """Crée un compte administrateur immédiatement"""
@@ -214,7 +371,8 @@ class EnhancedUserManager:
                 INSERT INTO users (username, email, password_hash, role)
                 VALUES (?, ?, ?, 'admin')
                 ''', (username, email, password_hash))
-                return True
+            invalidate_auth_cache()
+            return True
         except sqlite3.Error as e:
             st.error(f"Erreur lors de la création du compte admin: {str(e)}")
             return False
@@ -259,60 +417,18 @@ class EnhancedUserManager:
                     SET status="approved", approved_by=?
                     WHERE id=?
                     ''', (approved_by, request_id))
-                    return True
-                return False
+                else:
+                    return False
+            invalidate_auth_cache()
+            return True
         except sqlite3.Error as e:
             st.error(f"Erreur lors de l'approbation: {str(e)}")
             return False
 
-    # Autres méthodes de gestion
-    def update_user_role(self, user_id: int, new_role: str) -> None:
-        """Met à jour le rôle d'un utilisateur"""
-        with self.conn:
-            self.conn.execute(
-                'UPDATE users SET role=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
-                (new_role, user_id))
-
-    def log_activity(self, user_id: int, action: str, details: str = "", ip_address: str = "") -> None:
-        """Enregistre une activité utilisateur"""
-        with self.conn:
-            self.conn.execute('''
-            INSERT INTO activity_logs (user_id, action, details, ip_address)
-            VALUES (?, ?, ?, ?)
-            ''', (user_id, action, details, ip_address))
-
-    def get_activity_logs(self, date_filter: str = None, user_id: int = None) -> List[Dict]:
-        """Récupère les logs d'activité avec filtres"""
-        query = '''
-        SELECT l.*, u.username 
-        FROM activity_logs l
-        JOIN users u ON l.user_id = u.id
-        WHERE 1=1
-        '''
-        params = []
-        
-        if date_filter:
-            query += ' AND date(l.created_at) = date(?)'
-            params.append(date_filter)
-        
-        if user_id:
-            query += ' AND l.user_id = ?'
-            params.append(user_id)
-        
-        query += ' ORDER BY l.created_at DESC'
-        
-        cursor = self.conn.cursor()
-        cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
-
 # =============================================
 # 3. FONCTIONS UTILITAIRES
 # =============================================
 
-def hash_password(password: str) -> str:
-    """Hash un mot de passe avec SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
 def get_db_connection() -> sqlite3.Connection:
     """Établit une connexion persistante à la base de données"""
     conn = sqlite3.connect(DATABASE_NAME, timeout=10)  # Augmentez le timeout
@@ -323,6 +439,113 @@ def get_db_connection() -> sqlite3.Connection:
     conn.execute("PRAGMA wal_autocheckpoint = 100")  # Ajoutez ceci
     return conn
 
+# Fait "un administrateur existe" mis en cache pour tout le processus (clé: chemin de la base)
+_admin_exists_cache: Dict[str, bool] = {}
+_auth_cache_generation = 0
+_auth_cache_lock = threading.Lock()
+
+def invalidate_auth_cache() -> None:
+    """Invalide le cache d'authentification après une modification des utilisateurs"""
+    global _auth_cache_generation
+    with _auth_cache_lock:
+        _admin_exists_cache.clear()
+        _auth_cache_generation += 1
+
+def admin_exists() -> bool:
+    """Indique si un administrateur existe, en n'interrogeant la base qu'après une invalidation"""
+    with _auth_cache_lock:
+        cached = _admin_exists_cache.get(DATABASE_NAME)
+        generation = _auth_cache_generation
+    if cached is not None:
+        return cached
+
+    conn = get_db_connection()
+    try:
+        exists = EnhancedUserManager(conn).admin_exists()
+    finally:
+        conn.close()
+
+    with _auth_cache_lock:
+        # Une modification concurrente a pu rendre la valeur lue obsolète
+        if generation == _auth_cache_generation:
+            _admin_exists_cache[DATABASE_NAME] = exists
+    return exists
+
+def start_user_session(user: Dict) -> bool:
+    """
+    Ouvre une session serveur et marque la session Streamlit comme authentifiée
+    Returns:
+        bool: False si le compte n'est pas actif (aucune session n'est ouverte)
+    """
+    if user.get('status') != 'active':
+        return False
+    store = get_session_store(DATABASE_NAME)
+    token = store.create_session(user['id'])
+    session_user = store.get_session(token)
+    if session_user is None:
+        # Compte désactivé entre la lecture et l'ouverture de la session
+        store.revoke(token)
+        return False
+    st.session_state.session_token = token
+    st.session_state.user = session_user
+    st.session_state.authenticated = True
+    return True
+
+def end_user_session() -> None:
+    """Ferme la session serveur et déconnecte la session Streamlit"""
+    try:
+        get_session_store(DATABASE_NAME).revoke(st.session_state.get('session_token'))
+    except SessionError as e:
+        logger.error(str(e))
+    st.session_state.session_token = None
+    st.session_state.authenticated = False
+    st.session_state.user = None
+
+def _get_peer_address() -> Optional[str]:
+    """Adresse de la connexion websocket de la session (pair TCP, non modifiable par le client)"""
+    ip_address = getattr(getattr(st, 'context', None), 'ip_address', None)  # Streamlit >= 1.45
+    if ip_address:
+        return ip_address
+    try:
+        from streamlit import runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is None or not runtime.exists():
+            return None
+        client = runtime.get_instance().get_client(ctx.session_id)
+    except ImportError:
+        return None
+    request = getattr(client, 'request', None)
+    return getattr(request, 'remote_ip', None)
+
+def get_client_ip() -> Optional[str]:
+    """
+    Adresse IP du client: adresse de connexion, ou X-Forwarded-For uniquement derrière
+    un proxy déclaré dans TRUSTED_PROXIES
+    Returns:
+        Optional[str]: Adresse IP, ou None si elle ne peut pas être déterminée
+    """
+    try:
+        headers = st.context.headers
+    except AttributeError:
+        # Versions de Streamlit antérieures à st.context
+        try:
+            from streamlit.web.server.websocket_headers import _get_websocket_headers
+            headers = _get_websocket_headers()
+        except ImportError:
+            headers = None
+    forwarded = headers.get("X-Forwarded-For") if headers else None
+    return resolve_client_address(_get_peer_address(), forwarded, TRUSTED_PROXIES)
+
+def get_rate_limit_key() -> str:
+    """Clé de limitation par client: l'adresse IP, ou à défaut la session (jamais une valeur partagée)"""
+    client_ip = get_client_ip()
+    if client_ip:
+        return client_ip
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return f"session:{ctx.session_id}" if ctx else "session:inconnue"
+
 def init_session():
     """Initialise les variables de session"""
     if 'authenticated' not in st.session_state:
@@ -331,8 +554,8 @@ def init_session():
 
 def get_last_activity(user_manager: EnhancedUserManager) -> str:
     """Récupère la dernière activité enregistrée"""
-    logs = user_manager.get_activity_logs()
-    return logs[0]['created_at'][:16] if logs else "Aucune"
+    last_activity = user_manager.get_activity_summary()['last_activity']
+    return last_activity[:16] if last_activity else "Aucune"
 
 # =============================================
 # 4. PAGES DE L'INTERFACE UTILISATEUR
@@ -347,17 +570,31 @@ def login_page():
         password = st.text_input("Mot de passe", type="password")
         
         if st.form_submit_button("Se connecter"):
+            # Refus avant toute lecture en base ou calcul de hachage
+            limiter = get_login_rate_limiter()
+            retry_after = limiter.check(username, get_rate_limit_key())
+            if retry_after is not None:
+                st.error(f"Trop de tentatives de connexion. Réessayez dans {int(retry_after) + 1} secondes.")
+                return
             try:
                 conn = get_db_connection()
                 user_manager = EnhancedUserManager(conn)
                 user = user_manager.get_user_by_username(username)
                 
-                if user and user['password_hash'] == hash_password(password):
-                    st.session_state.authenticated = True
-                    st.session_state.user = dict(user)
-                    st.success("Connexion réussie!")
-                    time.sleep(1)
-                    st.rerun()
+                # Vérification dans le pool de calcul, hors du thread du script. Un nom inconnu est
+                # vérifié contre un hachage factice: même durée, les comptes existants ne sont pas révélés
+                password_valid = verify_password(password, user['password_hash'] if user else get_dummy_hash())
+                if user and password_valid:
+                    # Les anciens hachages (SHA-256 sans sel, coût trop faible) sont remplacés au passage
+                    if needs_rehash(user['password_hash']):
+                        user_manager.update_password_hash(user['id'], hash_password(password))
+                    limiter.reset_username(username)
+                    if start_user_session(user):
+                        st.success("Connexion réussie!")
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.error("Ce compte est désactivé. Contactez un administrateur.")
                 else:
                     st.error("Identifiants incorrects")
             except Exception as e:
@@ -389,12 +626,7 @@ def initial_admin_setup():
                 if user_manager.create_admin_account(username, email, password):
                     st.success("Compte admin créé! Redirection...")
                     time.sleep(2)
-                    st.session_state.authenticated = True
-                    st.session_state.user = {
-                        'username': username,
-                        'email': email,
-                        'role': 'admin'
-                    }
+                    start_user_session(user_manager.get_user_by_username(username))
                     st.rerun()
                 conn.close()
 
@@ -448,11 +680,6 @@ def admin_approval_page(user_manager: EnhancedUserManager):
                     time.sleep(2)
                     st.rerun()
 
-def get_last_activity(user_manager: EnhancedUserManager) -> str:
-    """Récupère la dernière activité"""
-    logs = user_manager.get_activity_logs()
-    return logs[0]['created_at'][:16] if logs else "Aucune"
-
 def show_user_management(user_manager: EnhancedUserManager):
     """Affiche l'interface de gestion des utilisateurs"""
     st.header("Gestion des Utilisateurs")
@@ -515,34 +742,26 @@ def show_user_management(user_manager: EnhancedUserManager):
         )
         
         if st.button("💾 Enregistrer les modifications"):
-            # Comparaison pour détecter les changements
-            original_df = df[cols_to_show].set_index('id')
-            edited_df = edited_df.set_index('id')
+            # Comparaison vectorielle: seules les cellules rôle/statut modifiées sont retenues
+            editable = ['role', 'status']
+            original_df = df.set_index('id')[editable]
+            edited_df = edited_df.set_index('id')[editable].reindex(original_df.index)
+            changed = original_df.ne(edited_df)
+            diff = edited_df.where(changed)[changed.any(axis=1)]
+            changes = [
+                {'id': user_id, **{col: value for col, value in row.items() if pd.notna(value)}}
+                for user_id, row in diff.to_dict('index').items()
+            ]
             
-            for user_id in original_df.index:
-                original = original_df.loc[user_id]
-                edited = edited_df.loc[user_id]
-                
-                # Vérifier les changements de rôle
-                if original['role'] != edited['role']:
-                    user_manager.update_user_role(user_id, edited['role'])
-                    user_manager.log_activity(
-                        st.session_state.user['id'],
-                        "Modification rôle",
-                        f"Utilisateur ID:{user_id} nouveau rôle: {edited['role']}"
-                    )
-                
-                # Vérifier les changements de statut
-                if original['status'] != edited['status']:
-                    user_manager.update_user_status(user_id, edited['status'])
-                    user_manager.log_activity(
-                        st.session_state.user['id'],
-                        "Modification statut",
-                        f"Utilisateur ID:{user_id} nouveau statut: {edited['status']}"
-                    )
-            
-            st.success("Modifications enregistrées!")
-            st.rerun()
+            if not changes:
+                st.info("Aucune modification à enregistrer")
+            else:
+                try:
+                    count = user_manager.apply_user_changes(changes, st.session_state.user['id'])
+                    st.success(f"Modifications enregistrées pour {count} utilisateur(s)!")
+                    st.rerun()
+                except (ValueError, DatabaseError) as e:
+                    st.error(str(e))
     else:
         st.info("Aucun utilisateur trouvé")
 
@@ -562,21 +781,28 @@ def show_activity_logs(user_manager: EnhancedUserManager):
             )
         with cols[2]:
             action_filter = st.text_input("Action contenant")
+
+    # Répartition de la journée par action
+    activity_summary = user_manager.get_activity_summary(date_filter)
+    if activity_summary['by_action']:
+        st.caption(f"{activity_summary['total']} actions le {activity_summary['day']}")
+        st.bar_chart(pd.Series(activity_summary['by_action'], name="Actions"))
     
-    # Récupération des logs
-    logs = user_manager.get_activity_logs(
-        date_filter=str(date_filter),
-        user_id=None if user_filter == "Tous" else next(
-            u['id'] for u in user_manager.get_all_users() if u['username'] == user_filter
-        )
-    )
-    
-    # Filtrage supplémentaire
-    if action_filter:
-        logs = [log for log in logs if action_filter.lower() in log['action'].lower()]
+    # Filtres appliqués en SQL, une page à la fois
+    filters = {
+        'date_filter': date_filter,
+        'user_id': None if user_filter == "Tous" else user_manager.get_user_id_by_username(user_filter),
+        'action': action_filter or None
+    }
+    total = user_manager.count_activity_logs(**filters)
     
     # Affichage
-    if logs:
+    if total:
+        page_size = 100
+        pages = -(-total // page_size)
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+        logs = user_manager.get_activity_logs_page(**filters, page=page, page_size=page_size)
+
         # Formatage des données pour l'affichage
         log_data = [{
             "Date": log['created_at'][:19],
@@ -595,16 +821,39 @@ def show_activity_logs(user_manager: EnhancedUserManager):
                 "Détails": st.column_config.TextColumn("Détails", width="large")
             }
         )
+        st.caption(f"Page {page}/{pages} - {total} logs")
         
-        # Bouton d'export
-        csv = pd.DataFrame(log_data).to_csv(index=False).encode('utf-8')
-        st.download_button(
-            "📤 Exporter en CSV",
-            data=csv,
-            file_name=f"logs_activite_{date_filter}.csv",
-            mime="text/csv"
-        )
+        # Export: le CSV est produit par morceaux à la demande, puis conservé dans la session
+        # jusqu'au téléchargement. Le nombre de lignes fait partie de la clé: un export
+        # devenu incomplet (nouveaux événements, autres filtres) est libéré
+        export_key = (date_filter, filters['user_id'], filters['action'], total)
+        prepared_export = st.session_state.get('activity_logs_export')
+        if prepared_export and prepared_export['key'] != export_key:
+            del st.session_state['activity_logs_export']
+            prepared_export = None
+
+        if st.button("📄 Préparer l'export CSV"):
+            with io.BytesIO() as export_buffer:
+                for chunk in user_manager.iter_activity_logs_csv(**filters):
+                    export_buffer.write(chunk.encode('utf-8'))
+                prepared_export = {
+                    'key': export_key,
+                    'prepared_at': datetime.now(),
+                    'data': export_buffer.getvalue()
+                }
+            st.session_state.activity_logs_export = prepared_export
+
+        if prepared_export:
+            st.download_button(
+                f"📤 Exporter en CSV ({total} lignes, préparé à {prepared_export['prepared_at']:%H:%M:%S})",
+                data=prepared_export['data'],
+                file_name=f"logs_activite_{date_filter}.csv",
+                mime="text/csv",
+                # Le fichier reste servi pendant ce rechargement: la copie en session peut être libérée
+                on_click=lambda: st.session_state.pop('activity_logs_export', None)
+            )
     else:
+        st.session_state.pop('activity_logs_export', None)
         st.info("Aucune activité trouvée pour ces critères")
 
 def show_system_settings():
@@ -628,6 +877,45 @@ def show_system_settings():
             # Ici vous pourriez sauvegarder dans un fichier de config ou une table dédiée
             st.success("Paramètres système mis à jour!")
 
+    # Compteurs de la limitation des tentatives de connexion
+    st.subheader("Limitation des connexions")
+    limiter_stats = get_login_rate_limiter().stats()
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Limiteur": "Nom d'utilisateur" if name == 'username' else "Adresse IP",
+                "Clés suivies": stats['keys'],
+                "Capacité": stats['max_keys'],
+                "Autorisées": stats['allowed'],
+                "Refusées": stats['rejected'],
+                "Évictions": stats['evictions'],
+            }
+            for name, stats in limiter_stats.items()
+        ]),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    # Statistiques des caches d'entités (clients, comptes, AVI)
+    st.subheader("Cache des entités")
+    cache_stats = BankDatabase.get_cache_stats(DATABASE_NAME)
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Entité": name,
+                "Entrées": stats['size'],
+                "Capacité": stats['maxsize'],
+                "Succès": stats['hits'],
+                "Échecs": stats['misses'],
+                "Évictions": stats['evictions'],
+                "Taux de succès": f"{stats['hit_rate']:.1%}"
+            }
+            for name, stats in cache_stats.items()
+        ]),
+        hide_index=True,
+        use_container_width=True
+    )
+
 
 def admin_dashboard():
     """Tableau de bord principal de l'administrateur"""
@@ -654,8 +942,7 @@ def admin_dashboard():
             st.rerun()
             
         if st.button("🚪 Déconnexion"):
-            st.session_state.authenticated = False
-            st.session_state.user = None
+            end_user_session()
             st.rerun()
     
     # Contenu principal
@@ -666,13 +953,15 @@ def admin_dashboard():
         user_manager = EnhancedUserManager(conn)
         
         # Métriques
+        activity_summary = user_manager.get_activity_summary()
         col1, col2, col3 = st.columns(3)
         with col1:
             st.metric("Utilisateurs actifs", user_manager.count_active_users())
         with col2:
-            st.metric("Dernière activité", get_last_activity(user_manager))
+            last_activity = activity_summary['last_activity']
+            st.metric("Dernière activité", last_activity[:16] if last_activity else "Aucune")
         with col3:
-            st.metric("Actions aujourd'hui", len(user_manager.get_activity_logs(date_filter=datetime.now().date())))
+            st.metric("Actions aujourd'hui", activity_summary['total'])
         
         # Onglets
         tab1, tab2, tab3 = st.tabs(["👥 Gestion Utilisateurs", "📊 Activités", "⚙ Paramètres"])
@@ -700,24 +989,34 @@ def check_authentication(required_role: str = None) -> None:
         required_role: Rôle requis pour accéder à la page (optionnel)
     """
 
-    # Vérifie si un admin existe
-    conn = get_db_connection()
-    user_manager = EnhancedUserManager(conn)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users WHERE role='admin'")
-    admin_count = cursor.fetchone()[0]
-    conn.close()
-
     # Initialise l'état de session si nécessaire
     if 'authenticated' not in st.session_state:
         st.session_state['authenticated'] = False
     
+    # Une session authentifiée est revalidée contre le stockage des sessions (cache
+    # mémoire): un changement de rôle ou de statut s'applique dès le rerun suivant
+    if st.session_state['authenticated']:
+        try:
+            user = get_session_store(DATABASE_NAME).get_session(st.session_state.get('session_token'))
+        except SessionError as e:
+            # Session invérifiable: l'utilisateur est déconnecté plutôt que laissé authentifié
+            logger.error(str(e))
+            end_user_session()
+            st.error("Impossible de vérifier votre session, reconnectez-vous")
+        else:
+            if user is None:
+                end_user_session()
+                st.warning("Votre session a expiré ou votre compte a été modifié, reconnectez-vous")
+            else:
+                st.session_state.user = user
+
     # Redirige vers la page d'authentification si non connecté
-    if admin_count == 0:
-        initial_admin_setup()
-    elif not st.session_state['authenticated']:
-        login_page()
-        st.stop()
+    if not st.session_state['authenticated']:
+        if not admin_exists():
+            initial_admin_setup()
+        else:
+            login_page()
+            st.stop()
     else:
         user_role = st.session_state.user.get('role')
         if user_role == 'admin':
@@ -742,6 +1041,7 @@ def logout() -> None:
     Déconnecte l'utilisateur et nettoie la session
     """
     username = st.session_state.get('username', 'Inconnu')
+    get_session_store(DATABASE_NAME).revoke(st.session_state.get('session_token'))
     st.session_state.clear()
     logger.info(f"Utilisateur {username} déconnecté")
     st.rerun()
@@ -799,8 +1099,7 @@ def show_admin_dashboard():
             st.rerun()
             
         if st.button("🚪 Déconnexion"):
-            st.session_state.authenticated = False
-            st.session_state.user = None
+            end_user_session()
             st.rerun()
     
     # Contenu principal en fonction du rôle
@@ -845,18 +1144,13 @@ def show_admin_dashboard():
             else:
                 st.info("Aucune activité récente")
 
-        # Ajoutez ceci au début de votre script
-        st.session_state.setdefault('force_refresh', True)
-
-        if st.session_state.force_refresh:
-            time.sleep(0.1)  # Pause minimale
-            st.session_state.force_refresh = False
-            st.rerun()  # Force le rechargement propre
-
         # Initialisation des composants
         db = BankDatabase()
         fake = Faker()
 
+        # Tâches de fin de journée (instantanés de solde), une fois par processus
+        get_maintenance_scheduler(DATABASE_NAME)
+
         # Fonctions utilitaires améliorées
         def generate_iban(country_code="FR"):
             """Génère un IBAN valide avec vérification"""
@@ -909,18 +1203,22 @@ def show_admin_dashboard():
         # Page Tableau de Bord
         if selected == "Tableau de Bord":
             
+            # Instantané des indicateurs partagé par le processus (recalculé selon le TTL
+            # ou après une écriture), pour ne pas relancer les requêtes à chaque interaction
+            kpi = get_kpi_service(DATABASE_NAME).get_snapshot()
+
             # Section KPI
             st.subheader("Indicateurs Clés", divider="blue")
             # KPI
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Clients Actifs", db.count_active_clients(), "+5%")
+                st.metric("Clients Actifs", kpi['active_clients'], "+5%")
             with col2:
-                st.metric("Transactions Journalières", db.count_daily_transactions(), "12%")
+                st.metric("Transactions Journalières", kpi['daily_transactions'], "12%")
             with col3:
-                st.metric("Dépôts Totaux", f"{db.total_deposits():,.2f} XAF", "8%")
+                st.metric("Dépôts Totaux", f"{kpi['total_deposits']:,.2f} XAF", "8%")
             with col4:
-                st.metric("Retraits Totaux", f"{db.total_withdrawals():,.2f} XAF", "3%")
+                st.metric("Retraits Totaux", f"{kpi['total_withdrawals']:,.2f} XAF", "3%")
             
             # Graphiques
             st.subheader("Analytiques", divider="blue")
@@ -931,7 +1229,7 @@ def show_admin_dashboard():
 
             with col1:
                 st.subheader("Dépôts vs Retraits (7 jours)")
-                df_trans = pd.DataFrame(db.get_last_week_transactions())
+                df_trans = pd.DataFrame(kpi['weekly'])
                 if not df_trans.empty:
                     fig = px.bar(df_trans, x="date", y=["deposit", "withdrawal"], 
                                 barmode="group", color_discrete_sequence=["#4CAF50", "#F44336"])
@@ -941,8 +1239,7 @@ def show_admin_dashboard():
 
             with col2:
                 st.subheader("Répartition des Clients par Type")
-                data = db.get_clients_by_type()
-                df_clients = pd.DataFrame(data)
+                df_clients = pd.DataFrame(kpi['clients_by_type'])
 
                 if not df_clients.empty:
                     if len(df_clients.columns) == 2:
@@ -957,28 +1254,18 @@ def show_admin_dashboard():
             # Nouveau graphique pour les reçus générés
             st.subheader("Reçus Générés (30 derniers jours)")
             
-            # Compter les reçus générés (simulation - à adapter avec votre système de stockage)
-            receipts_dir = "receipts"
-            if os.path.exists(receipts_dir):
-                receipt_files = [f for f in os.listdir(receipts_dir) if f.endswith('.pdf')]
-                receipt_dates = [datetime.fromtimestamp(os.path.getmtime(os.path.join(receipts_dir, f))) for f in receipt_files]
+            # Comptes journaliers lus dans la table documents (requête indexée)
+            receipt_counts = db.get_daily_document_counts('receipt', days=30)
+            if receipt_counts:
+                df_receipts = pd.DataFrame(receipt_counts)
                 
-                if receipt_dates:
-                    df_receipts = pd.DataFrame({
-                        'date': [d.date() for d in receipt_dates],
-                        'count': 1
-                    })
-                    df_receipts = df_receipts.groupby('date').sum().reset_index()
-                    
-                    fig = px.line(df_receipts, x='date', y='count', 
-                                title="Nombre de reçus générés par jour",
-                                labels={'date': 'Date', 'count': 'Nombre de reçus'},
-                                markers=True)
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.warning("Aucun reçu généré dans les 30 derniers jours.")
+                fig = px.line(df_receipts, x='date', y='count', 
+                            title="Nombre de reçus générés par jour",
+                            labels={'date': 'Date', 'count': 'Nombre de reçus'},
+                            markers=True)
+                st.plotly_chart(fig, use_container_width=True)
             else:
-                st.warning("Aucun répertoire de reçus trouvé.")
+                st.warning("Aucun reçu généré dans les 30 derniers jours.")
 
             # Dernières transactions avec filtres
             st.subheader("Dernières Transactions", divider="blue")
@@ -1506,22 +1793,60 @@ def show_admin_dashboard():
             
             with tab1:
                 st.subheader("Historique des Transactions")
-                
-                # Barre de recherche
-                search_query = st.text_input("Rechercher dans les transactions", "")
-                
-                transactions = db.get_all_transactions()
-                if transactions:
-                    df = pd.DataFrame(transactions)
-                    
-                    # Filtrage basé sur la recherche
-                    if search_query:
-                        mask = df.apply(lambda row: row.astype(str).str.contains(search_query, case=False).any(), axis=1)
-                        df = df[mask]
-                    
-                    st.dataframe(df, use_container_width=True, hide_index=True)
+
+                history_view = st.radio("Vue", ["Toutes les transactions", "Relevé par compte"], horizontal=True)
+
+                if history_view == "Relevé par compte":
+                    # Mouvements d'un compte avec solde après chaque opération, paginés côté base
+                    accounts = db.get_all_ibans()
+                    if accounts:
+                        account_options = {f"{a['iban']} - {a['first_name']} {a['last_name']}": a['id'] for a in accounts}
+                        selected_account = st.selectbox("Compte", options=list(account_options.keys()))
+
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            start_date = st.date_input("Du", value=datetime.now().date() - timedelta(days=30))
+                        with col2:
+                            end_date = st.date_input("Au", value=datetime.now().date())
+                        with col3:
+                            page = st.number_input("Page", min_value=1, value=1, step=1)
+
+                        history = db.get_account_history(
+                            account_options[selected_account],
+                            start=start_date.strftime('%Y-%m-%d'),
+                            end=end_date.strftime('%Y-%m-%d'),
+                            page=page,
+                            page_size=50
+                        )
+
+                        st.metric("Solde d'ouverture", f"{history['opening_balance']:,.2f}")
+                        if history['transactions']:
+                            df = pd.DataFrame(history['transactions']).rename(columns={
+                                'date': 'Date', 'type': 'Type', 'amount': 'Montant',
+                                'description': 'Description', 'balance_after': 'Solde après'
+                            })
+                            st.dataframe(df, use_container_width=True, hide_index=True)
+                            st.caption(f"Page {history['page']}/{history['pages']} - {history['total']} mouvements")
+                        else:
+                            st.info("Aucun mouvement sur cette période.")
+                    else:
+                        st.warning("Aucun compte trouvé.")
                 else:
-                    st.warning("Aucune transaction trouvée.")
+                    # Barre de recherche
+                    search_query = st.text_input("Rechercher dans les transactions", "")
+
+                    transactions = db.get_all_transactions()
+                    if transactions:
+                        df = pd.DataFrame(transactions)
+
+                        # Filtrage basé sur la recherche
+                        if search_query:
+                            mask = df.apply(lambda row: row.astype(str).str.contains(search_query, case=False).any(), axis=1)
+                            df = df[mask]
+
+                        st.dataframe(df, use_container_width=True, hide_index=True)
+                    else:
+                        st.warning("Aucune transaction trouvée.")
             
             with tab2:
                 st.subheader("Effectuer une Transaction")
@@ -1542,7 +1867,9 @@ def show_admin_dashboard():
                     
                     if selected_client:
                         client_id = client_options[selected_client]
-                        client_ibans = db.get_ibans_by_client(client_id)
+                        # Fiche client, comptes et totaux en un nombre fixe de requêtes
+                        client_overview = db.get_client_overview(client_id)
+                        client_ibans = client_overview['accounts'] if client_overview else []
                         
                         if client_ibans:
                             iban_options = {i['iban']: i['id'] for i in client_ibans}
@@ -1567,36 +1894,48 @@ def show_admin_dashboard():
                                         st.warning("Aucun autre compte disponible pour le virement")
                                         target_id = None
                                 
-                                if st.form_submit_button("Exécuter la Transaction"):
+                                submitted = st.form_submit_button("Exécuter la Transaction")
+
+                                # Clé d'idempotence de la saisie: conservée tant que les soumissions se suivent
+                                # (double clic, rerun), renouvelée au premier affichage qui suit une soumission
+                                if not submitted and st.session_state.get('transaction_key_used'):
+                                    st.session_state.pop('transaction_idempotency_key', None)
+                                    st.session_state['transaction_key_used'] = False
+                                idempotency_key = st.session_state.setdefault('transaction_idempotency_key', uuid.uuid4().hex)
+
+                                if submitted:
                                     iban_id = iban_options[selected_iban]
-                                    if transaction_type == "Dépôt":
-                                        db.deposit(iban_id, amount, description)
-                                        st.success(f"Dépôt de XAF{amount:,.2f} effectué avec succès!")
-                                    elif transaction_type == "Retrait":
-                                        # Vérifier le solde avant retrait
-                                        iban_data = next(i for i in client_ibans if i['id'] == iban_id)
-                                        if iban_data['balance'] >= amount:
-                                            db.withdraw(iban_id, amount, description)
-                                            st.success(f"Retrait de XAF{amount:,.2f} effectué avec succès!")
-                                        else:
-                                            st.error("Solde insuffisant pour effectuer ce retrait.")
-                                    elif transaction_type == "Virement" and target_id:
-                                        # Vérifier le solde avant virement
-                                        iban_data = next(i for i in client_ibans if i['id'] == iban_id)
-                                        if iban_data['balance'] >= amount:
-                                            # Transaction atomique
-                                            db.withdraw(iban_id, amount, f"Virement vers {target_account}")
-                                            db.deposit(target_id, amount, f"Virement depuis {iban_data['iban']}")
-                                            st.success(f"Virement de XAF{amount:,.2f} effectué avec succès!")
-                                        else:
-                                            st.error("Solde insuffisant pour effectuer ce virement.")
+                                    st.session_state['transaction_key_used'] = True
+                                    try:
+                                        if transaction_type == "Dépôt":
+                                            db.deposit(iban_id, amount, description, idempotency_key=idempotency_key)
+                                            st.success(f"Dépôt de XAF{amount:,.2f} effectué avec succès!")
+                                        elif transaction_type == "Retrait":
+                                            # Vérifier le solde avant retrait
+                                            iban_data = next(i for i in client_ibans if i['id'] == iban_id)
+                                            if iban_data['balance'] >= amount:
+                                                db.withdraw(iban_id, amount, description, idempotency_key=idempotency_key)
+                                                st.success(f"Retrait de XAF{amount:,.2f} effectué avec succès!")
+                                            else:
+                                                st.error("Solde insuffisant pour effectuer ce retrait.")
+                                        elif transaction_type == "Virement" and target_id:
+                                            # Vérifier le solde avant virement
+                                            iban_data = next(i for i in client_ibans if i['id'] == iban_id)
+                                            if iban_data['balance'] >= amount:
+                                                # Débit et crédit dans une seule transaction
+                                                db.transfer(iban_id, target_id, amount, description,
+                                                            idempotency_key=idempotency_key)
+                                                st.success(f"Virement de XAF{amount:,.2f} effectué avec succès!")
+                                            else:
+                                                st.error("Solde insuffisant pour effectuer ce virement.")
+                                    except ValueError as e:
+                                        st.error(str(e))
                                     time.sleep(1)
                                     st.rerun()
 
                                 if selected_iban:
-                                    # Si vous avez besoin de chercher par IBAN
-                                    all_accounts = db.get_all_ibans()
-                                    account_details = next((acc for acc in all_accounts if acc['iban'] == selected_iban), None)
+                                    # Les comptes du client sont déjà chargés avec la vue client
+                                    account_details = next((acc for acc in client_ibans if acc['iban'] == selected_iban), None)
                                     if account_details:
                                         with st.expander("🔍 Détails du compte source"):
                                             cols = st.columns(2)
@@ -1660,20 +1999,110 @@ def show_admin_dashboard():
                 st.subheader("Statistiques", divider="blue")
                 col1, col2 = st.columns(2)
                 with col1:
-                    receipts_dir = "receipts"
-                    if os.path.exists(receipts_dir):
-                        receipt_count = len([f for f in os.listdir(receipts_dir) if f.endswith('.pdf')])
-                        st.metric("📄 Reçus générés", receipt_count)
-                    else:
-                        st.metric("📄 Reçus générés", 0)
+                    st.metric("📄 Reçus générés", db.count_documents('receipt'))
                 
+                # Une seule lecture des transactions pour la métrique et la sélection
+                transactions = db.get_all_transactions()
                 with col2:
-                    transactions_count = len(db.get_all_transactions())
-                    st.metric("💸 Transactions éligibles", transactions_count)
+                    st.metric("💸 Transactions éligibles", len(transactions))
+            
+            # Génération par lot (journée, période ou client)
+            with st.expander("📦 Reçus par lot", expanded=False):
+                with st.form("batch_receipts_form"):
+                    batch_cols = st.columns(3)
+                    with batch_cols[0]:
+                        batch_dates = st.date_input(
+                            "Période",
+                            value=(datetime.now().date(), datetime.now().date())
+                        )
+                    with batch_cols[1]:
+                        batch_client = st.selectbox(
+                            "Client",
+                            options=[None] + db.get_all_clients(),
+                            format_func=lambda c: "Tous les clients" if c is None else f"{c['first_name']} {c['last_name']} (ID:{c['id']})"
+                        )
+                    with batch_cols[2]:
+                        batch_format = st.radio(
+                            "Format",
+                            options=['zip', 'pdf'],
+                            format_func=lambda f: "ZIP (un PDF par transaction)" if f == 'zip' else "PDF unique",
+                        )
+                    batch_include_qr = st.checkbox("Inclure un QR code de vérification", value=True, key="batch_include_qr")
+                    batch_submitted = st.form_submit_button("📦 Générer les reçus", use_container_width=True)
+
+                if batch_submitted:
+                    if isinstance(batch_dates, (tuple, list)):
+                        batch_start = batch_dates[0]
+                        batch_end = batch_dates[-1]
+                    else:
+                        batch_start = batch_end = batch_dates
+                    batch_ids = db.get_transaction_ids(
+                        str(batch_start), str(batch_end),
+                        client_id=batch_client['id'] if batch_client else None
+                    )
+                    if not batch_ids:
+                        st.warning("Aucune transaction pour cette sélection.")
+                    else:
+                        progress = st.progress(0.0, text=f"0 / {len(batch_ids)} reçus")
+                        try:
+                            batch = generate_receipts_batch(
+                                batch_ids,
+                                {'include_qr': batch_include_qr},
+                                db_name=DATABASE_NAME,
+                                output_format=batch_format,
+                                progress_callback=lambda done, total: progress.progress(
+                                    done / total, text=f"{done} / {total} reçus")
+                            )
+                            if batch['file'] is None:
+                                st.warning("Aucun reçu généré: les transactions sélectionnées sont introuvables.")
+                            else:
+                                st.success(f"{batch['count']} reçu(s) générés")
+                                # download_button n'accepte que str, bytes ou un tampon en mémoire
+                                with batch['file'] as batch_file:
+                                    batch_bytes = batch_file.read()
+                                st.download_button(
+                                    label="⬇️ Télécharger les reçus",
+                                    data=batch_bytes,
+                                    file_name=f"recus_{batch_start}_{batch_end}.{batch_format}",
+                                    mime="application/zip" if batch_format == 'zip' else "application/pdf",
+                                    use_container_width=True
+                                )
+                        except Exception as e:
+                            st.error(f"Erreur lors de la génération des reçus: {str(e)}")
+            
+            # Journal de caisse: toutes les opérations de la journée dans un seul PDF
+            with st.expander("🗓️ Journal de caisse", expanded=False):
+                with st.form("teller_journal_form"):
+                    journal_cols = st.columns(2)
+                    with journal_cols[0]:
+                        journal_day = st.date_input("Journée", value=datetime.now().date())
+                    with journal_cols[1]:
+                        journal_branch = st.selectbox(
+                            "Guichet",
+                            options=[None] + db.get_branch_codes(),
+                            format_func=lambda code: "Tous les guichets" if code is None else code
+                        )
+                    journal_submitted = st.form_submit_button("🗓️ Générer le journal", use_container_width=True)
+
+                if journal_submitted:
+                    try:
+                        with st.spinner("Génération du journal..."):
+                            journal = generate_teller_journal(
+                                db, journal_day, branch_code=journal_branch, output="bytes"
+                            )
+                        st.success(f"Journal généré: {journal['count']} opération(s), {journal['pages']} page(s)")
+                        st.download_button(
+                            label="⬇️ Télécharger le journal",
+                            data=journal['file'],
+                            file_name=f"journal_{journal_day}{'_' + journal_branch if journal_branch else ''}.pdf",
+                            mime="application/pdf",
+                            use_container_width=True
+                        )
+                    except Exception as e:
+                        st.error(f"Erreur lors de la génération du journal: {str(e)}")
             
             # Sélection de la transaction
             st.subheader("Sélection de la transaction", divider="blue")
-            transactions = db.get_all_transactions()
             
             if not transactions:
                 st.warning("Aucune transaction disponible pour générer un reçu.")
@@ -1706,10 +2135,15 @@ def show_admin_dashboard():
                 index=0
             )
             
-            # Récupération des données
-            transaction_data = selected_transaction
-            client_data = db.get_client_by_id(transaction_data['client_id'])
-            iban_data = db.get_iban_by_id(transaction_data['iban_id'])
+            # Récupération des données (transaction, client et compte en une requête)
+            transaction_context = db.get_transaction_context(selected_transaction['id'])
+            if transaction_context is None:
+                # Transaction supprimée depuis le chargement de la liste, ou compte/client introuvable
+                st.warning("Cette transaction, son compte ou son client est introuvable.")
+                st.stop()
+            transaction_data = transaction_context['transaction']
+            client_data = transaction_context['client']
+            iban_data = transaction_context['iban']
             
             # Affichage des informations
             with st.expander("📋 Aperçu des informations", expanded=True):
@@ -1759,42 +2193,34 @@ def show_admin_dashboard():
             # Génération du PDF
             if submitted:
                 with st.spinner("Génération du reçu en cours..."):
-                    # Sauvegarde temporaire du logo
-                    logo_path = None
-                    if company_logo:
-                        logo_path = f"temp_logo_{transaction_data['id']}.png"
-                        with open(logo_path, "wb") as f:
-                            f.write(company_logo.getbuffer())
-                    
-                    pdf_path = generate_receipt_pdf(
-                        transaction_data=transaction_data,
-                        client_data=client_data,
-                        iban_data=iban_data,
-                        company_name=company_name,
-                        logo_path=logo_path,
-                        receipt_title=receipt_title,
-                        additional_notes=additional_notes,
-                        include_signature=include_signature,
-                        include_qr=include_qr  # Utilisez le même nom que dans la fonction
+                    # Reçu déjà rendu pour les mêmes données et options: relu depuis le stockage
+                    pdf_bytes = get_receipt_store(DATABASE_NAME).get_or_render(
+                        transaction_data,
+                        client_data,
+                        iban_data,
+                        {
+                            'company_name': company_name,
+                            'logo_bytes': company_logo.getvalue() if company_logo else None,
+                            'receipt_title': receipt_title,
+                            'additional_notes': additional_notes,
+                            'include_signature': include_signature,
+                            'include_qr': include_qr,
+                        }
                     )
                     
-                    # Nettoyage du logo temporaire
-                    if logo_path and os.path.exists(logo_path):
-                        os.remove(logo_path)
-                    
                     # Téléchargement
-                    with open(pdf_path, "rb") as f:
-                        st.download_button(
-                            label="⬇️ Télécharger le reçu",
-                            data=f,
-                            file_name=f"reçu_{transaction_data['id']}.pdf",
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
+                    st.download_button(
+                        label="⬇️ Télécharger le reçu",
+                        data=pdf_bytes,
+                        file_name=f"reçu_{transaction_data['id']}.pdf",
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
                     
                     # Aperçu stylisé
                     st.success("Reçu généré avec succès !")
                     st.markdown("**Aperçu:** (le PDF peut différer légèrement)")
+                    notes_html = additional_notes.replace('\n', '<br>')
                     
                     # Simulation d'aperçu
                     with st.container():
@@ -1819,7 +2245,7 @@ def show_admin_dashboard():
                                     <p><strong>Référence:</strong> {transaction_data['id']}</p>
                                 </div>
                                 <div class="receipt-notes">
-                                    <p>{additional_notes.replace('\n', '<br>')}</p>
+                                    <p>{notes_html}</p>
                                 </div>
                                 {'''<div class="receipt-signature">
                                     <p>Signature</p>
@@ -2234,28 +2660,14 @@ def show_admin_dashboard():
                                     "Date Création": avi_data['date_creation']
                                 }
                                 
-                                qr = qrcode.QRCode(
-                                    version=1,
-                                    error_correction=qrcode.constants.ERROR_CORRECT_L,
-                                    box_size=3,
-                                    border=2,
-                                )
-                                
-                                qr.add_data(qr_data)
-                                qr.make(fit=True)
-                                
-                                img = qr.make_image(fill_color="black", back_color="white")
-                                img_bytes = BytesIO()
-                                img.save(img_bytes, format='PNG')
-                                img_bytes.seek(0)
-                                
-                                pdf.image(img_bytes, x=150, y=pdf.get_y()-40, w=40)
+                                draw_qr_fpdf(pdf, str(qr_data), x=150, y=pdf.get_y()-40, size=40)
                                 pdf.ln(20)
                                 
                                 # ---- Sauvegarde du fichier ----
                                 os.makedirs("avi_documents", exist_ok=True)
                                 output_path = f"avi_documents/AVI_{avi_data['reference']}.pdf"
                                 pdf.output(output_path)
+                                db.record_document('avi', avi_data['id'], output_path)
                                 
                                 # ---- Affichage et téléchargement ----
                                 st.success("✅ Attestation générée avec succès!")
@@ -2816,4 +3228,4 @@ def show_admin_dashboard():
             conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,356 @@
+"""
+Banc d'essai des opérations BankDatabase
+
+Mesure débit (ops/s) et latences (p50/p95/p99) de chaque opération sur des jeux
+de données synthétiques de plusieurs tailles, enregistre les résultats comme
+référence JSON et échoue si une exécution régresse au-delà d'un seuil, ou si
+aucune référence n'existe pour un profil contrôlé (--allow-missing-baseline pour
+un premier passage).
+
+Exemples:
+    python benchmark.py --profiles 10k --save-baseline
+    python benchmark.py --profiles 10k 1m --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from data_generator import PROFILES, BankDataGenerator
+from database import BankDatabase
+from latency_stats import percentile
+from receipt_generator import _build_receipt_theme, generate_receipt_pdf, get_receipt_theme
+from teller_journal import generate_teller_journal
+
+DATA_DIR = os.path.join("benchmarks", "data")
+BASELINE_DIR = os.path.join("benchmarks", "baselines")
+DEFAULT_THRESHOLD = 0.20
+SEED = 1234
+
+
+class BenchContext:
+    """Données partagées par les cas de test d'un profil"""
+
+    def __init__(self, db: BankDatabase, workdir: str, seed: int = SEED):
+        self.db = db
+        self.workdir = workdir
+        self.rng = random.Random(seed)
+        cursor = db.conn.cursor()
+        self.client_ids = [row[0] for row in cursor.execute("SELECT id FROM clients")]
+        accounts = cursor.execute("SELECT id, iban, balance FROM ibans").fetchall()
+        self.iban_ids = [row['id'] for row in accounts]
+        self.ibans = [row['iban'] for row in accounts]
+        self.last_names = [row[0] for row in cursor.execute(
+            "SELECT last_name FROM clients ORDER BY RANDOM() LIMIT 200")] or ["Dupont"]
+        self.sequence = 0
+
+    def next_sequence(self) -> int:
+        self.sequence += 1
+        return self.sequence
+
+
+# ===== Cas de test =====
+# Chaque cas reçoit le contexte et retourne la fonction mesurée (un appel = une opération)
+
+def case_add_client(ctx: BenchContext) -> Callable:
+    def run():
+        n = ctx.next_sequence()
+        ctx.db.add_client("Bench", f"Client{n}", f"bench.{n}.{time.time_ns()}@example.com",
+                          "0600000000", "Particulier", "Actif")
+    return run
+
+
+def case_add_account(ctx: BenchContext) -> Callable:
+    def run():
+        data = ctx.db.generate_iban()
+        data.update(client_id=ctx.rng.choice(ctx.client_ids), type='Courant', currency='XAF')
+        ctx.db.add_account(data)
+    return run
+
+
+def case_deposit(ctx: BenchContext) -> Callable:
+    def run():
+        ctx.db.deposit(ctx.rng.choice(ctx.iban_ids), 1000.0, "Bench dépôt")
+    return run
+
+
+def case_withdraw(ctx: BenchContext) -> Callable:
+    # Un dépôt préalable garantit un solde suffisant sans être mesuré
+    for iban_id in ctx.iban_ids:
+        ctx.db.conn.execute("UPDATE ibans SET balance = balance + 1000000 WHERE id = ?", (iban_id,))
+    ctx.db.conn.commit()
+    ctx.db.clear_entity_caches()
+
+    def run():
+        ctx.db.withdraw(ctx.rng.choice(ctx.iban_ids), 10.0, "Bench retrait")
+    return run
+
+
+def case_search_accounts(ctx: BenchContext) -> Callable:
+    def run():
+        ctx.db.search_accounts(client_query=ctx.rng.choice(ctx.last_names)[:4])
+    return run
+
+
+def case_search_avis(ctx: BenchContext) -> Callable:
+    def run():
+        ctx.db.search_avis(search_term=ctx.rng.choice(["AVI-", "CG42", "300"]),
+                           statut=ctx.rng.choice([None, "Etudiant"]))
+    return run
+
+
+def case_get_all_transactions(ctx: BenchContext) -> Callable:
+    def run():
+        ctx.db.get_all_transactions()
+    return run
+
+
+def case_get_last_week_transactions(ctx: BenchContext) -> Callable:
+    def run():
+        ctx.db.get_last_week_transactions()
+    return run
+
+
+def case_get_account_history(ctx: BenchContext) -> Callable:
+    def run():
+        ctx.db.get_account_history(ctx.rng.choice(ctx.iban_ids), page=ctx.rng.randint(1, 3), page_size=50)
+    return run
+
+
+def case_generate_rib_receipt(ctx: BenchContext) -> Callable:
+    output = os.path.join(ctx.workdir, "rib.pdf")
+
+    def run():
+        ctx.db.generate_rib_receipt(ctx.rng.choice(ctx.ibans), output_path=output)
+    return run
+
+
+def case_generate_receipt_pdf(ctx: BenchContext) -> Callable:
+    # Sans QR code: mesure la mise en page et les styles du reçu
+    count, max_id = ctx.db.conn.execute("SELECT COUNT(*), MAX(id) FROM transactions").fetchone()
+    if not count:
+        raise ValueError("Le cas generate_receipt_pdf nécessite au moins une transaction")
+    sampled_ids = ctx.rng.sample(range(1, max_id + 1), min(50, count))
+    contexts = [context for context in map(ctx.db.get_transaction_context, sampled_ids) if context]
+    if not contexts:
+        # Identifiants trop clairsemés pour le tirage: premières transactions existantes
+        contexts = [ctx.db.get_transaction_context(row[0]) for row in
+                    ctx.db.conn.execute("SELECT id FROM transactions ORDER BY id LIMIT 50").fetchall()]
+
+    def run():
+        context = ctx.rng.choice(contexts)
+        generate_receipt_pdf(context['transaction'], context['client'], context['iban'],
+                             "Digital Financial Service", include_qr=False, output="bytes")
+    return run
+
+
+def case_receipt_theme_build(ctx: BenchContext) -> Callable:
+    # Coût de construction des styles, payé à chaque reçu avant le thème partagé
+    return _build_receipt_theme
+
+
+def case_receipt_theme_cached(ctx: BenchContext) -> Callable:
+    return get_receipt_theme
+
+
+def case_teller_journal(ctx: BenchContext) -> Callable:
+    # Journal d'une journée chargée (tous guichets)
+    busiest_day = ctx.db.conn.execute(
+        "SELECT date(date) FROM transactions GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+
+    def run():
+        generate_teller_journal(ctx.db, busiest_day, output="bytes")
+    return run
+
+
+# Nom -> (fabrique, nombre d'itérations par défaut)
+CASES: Dict[str, tuple] = {
+    'add_client': (case_add_client, 500),
+    'add_account': (case_add_account, 500),
+    'deposit': (case_deposit, 1000),
+    'withdraw': (case_withdraw, 1000),
+    'search_accounts': (case_search_accounts, 50),
+    'search_avis': (case_search_avis, 50),
+    'get_all_transactions': (case_get_all_transactions, 5),
+    'get_last_week_transactions': (case_get_last_week_transactions, 20),
+    'get_account_history': (case_get_account_history, 200),
+    'generate_rib_receipt': (case_generate_rib_receipt, 30),
+    'generate_receipt_pdf': (case_generate_receipt_pdf, 200),
+    'receipt_theme_build': (case_receipt_theme_build, 2000),
+    'receipt_theme_cached': (case_receipt_theme_cached, 2000),
+    'teller_journal': (case_teller_journal, 30),
+}
+
+
+# ===== Mesure =====
+def measure(operation: Callable, iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """Exécute l'opération et retourne débit et latences (en millisecondes)"""
+    for _ in range(min(warmup, iterations)):
+        operation()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        operation()
+        latencies.append((time.perf_counter_ns() - t0) / 1e6)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 4),
+        'p50_ms': round(percentile(latencies, 0.50), 4),
+        'p95_ms': round(percentile(latencies, 0.95), 4),
+        'p99_ms': round(percentile(latencies, 0.99), 4),
+        'max_ms': round(latencies[-1], 4)
+    }
+
+
+def dataset_path(profile: str, seed: int = SEED) -> str:
+    """Retourne le jeu de données du profil, généré une fois puis réutilisé"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"bench_{profile}_{seed}.db")
+    if not os.path.exists(path):
+        print(f"Génération du jeu de données {profile}...")
+        generator = BankDataGenerator(path, seed=seed, end_date=datetime(2025, 1, 31))
+        try:
+            generator.run(**PROFILES[profile])
+        finally:
+            generator.close()
+    return path
+
+
+def run_profile(profile: str, case_names: List[str], scale: float = 1.0) -> Dict[str, Dict]:
+    """Exécute les cas sur une copie fraîche du jeu de données du profil"""
+    source = dataset_path(profile)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix=f"bench_{profile}_") as workdir:
+        for name in case_names:
+            factory, iterations = CASES[name]
+            # Chaque cas part d'une copie intacte: les écritures d'un cas n'influencent pas le suivant
+            db_copy = os.path.join(workdir, "bench.db")
+            shutil.copyfile(source, db_copy)
+            db = BankDatabase(db_copy)
+            try:
+                operation = factory(BenchContext(db, workdir))
+                results[name] = measure(operation, max(1, int(iterations * scale)))
+            finally:
+                db.close()
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(db_copy + suffix):
+                        os.remove(db_copy + suffix)
+            r = results[name]
+            print(f"  {name:<28} {r['ops_per_sec']:>10.1f} ops/s   "
+                  f"p50 {r['p50_ms']:>9.3f} ms   p95 {r['p95_ms']:>9.3f} ms   p99 {r['p99_ms']:>9.3f} ms")
+    return results
+
+
+# ===== Références =====
+def baseline_path(profile: str, baseline_dir: str = BASELINE_DIR) -> str:
+    return os.path.join(baseline_dir, f"{profile}.json")
+
+
+def save_baseline(profile: str, results: Dict[str, Dict], baseline_dir: str = BASELINE_DIR) -> str:
+    """Enregistre les résultats d'un profil comme nouvelle référence"""
+    os.makedirs(baseline_dir, exist_ok=True)
+    path = baseline_path(profile, baseline_dir)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            'profile': profile,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.platform(),
+            'results': results
+        }, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def compare_to_baseline(results: Dict[str, Dict], baseline: Dict,
+                        threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Compare une exécution à la référence
+    Returns:
+        List[str]: Descriptions des régressions (débit en baisse ou p95 en hausse de plus du seuil)
+    """
+    regressions = []
+    for name, reference in baseline.get('results', {}).items():
+        current = results.get(name)
+        if not current:
+            continue
+        if reference['ops_per_sec'] and current['ops_per_sec'] < reference['ops_per_sec'] * (1 - threshold):
+            regressions.append(
+                f"{name}: débit {current['ops_per_sec']:.1f} ops/s < référence {reference['ops_per_sec']:.1f} ops/s"
+            )
+        if reference['p95_ms'] and current['p95_ms'] > reference['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.3f} ms > référence {reference['p95_ms']:.3f} ms"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai des opérations BankDatabase")
+    parser.add_argument('--profiles', nargs='+', default=['10k'], choices=sorted(PROFILES))
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiplicateur du nombre d'itérations")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Régression tolérée (0.20 = 20%%)")
+    parser.add_argument('--baseline-dir', default=BASELINE_DIR)
+    parser.add_argument('--save-baseline', action='store_true', help="Enregistre les résultats comme référence")
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help="Ne pas échouer lorsqu'un profil n'a pas de référence (premier passage)")
+    parser.add_argument('--output', help="Fichier JSON où écrire les résultats bruts")
+    args = parser.parse_args(argv)
+
+    all_results = {}
+    failures = []
+    for profile in args.profiles:
+        print(f"Profil {profile}")
+        results = run_profile(profile, args.cases, args.scale)
+        all_results[profile] = results
+
+        if args.save_baseline:
+            print(f"  Référence enregistrée: {save_baseline(profile, results, args.baseline_dir)}")
+            continue
+
+        path = baseline_path(profile, args.baseline_dir)
+        if not os.path.exists(path):
+            # Sans référence le contrôle ne peut rien détecter: échec explicite, sauf demande contraire
+            print(f"  Aucune référence ({path}): utilisez --save-baseline sur la machine de contrôle")
+            if not args.allow_missing_baseline:
+                failures.append(f"[{profile}] référence absente: {path}")
+            continue
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        unreferenced = sorted(set(results) - set(baseline.get('results', {})))
+        if unreferenced:
+            print(f"  Cas sans référence (non contrôlés): {', '.join(unreferenced)}")
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"  RÉGRESSION {regression}")
+        failures.extend(f"[{profile}] {r}" for r in regressions)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(all_results, f, indent=2, ensure_ascii=False)
+
+    if failures:
+        print(f"{len(failures)} échec(s) du contrôle (régressions au-delà de {args.threshold:.0%} ou référence absente)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
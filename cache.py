@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+
+class LRUCache:
+    """Cache LRU borné, thread-safe, avec compteurs de succès/échecs"""
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Args:
+            maxsize: Nombre maximal d'entrées conservées
+        """
+        if maxsize <= 0:
+            raise ValueError("La taille du cache doit être positive")
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retourne la valeur associée à la clé (et la marque comme récente)"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Ajoute ou remplace une entrée, en évinçant la plus ancienne si nécessaire"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Supprime une entrée si elle existe"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Vide le cache (les compteurs sont conservés)"""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs du cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
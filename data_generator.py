@@ -0,0 +1,424 @@
+"""
+Générateur de jeux de données bancaires synthétiques
+
+Remplit une base avec des clients, des comptes (IBAN/RIB générés par BankDatabase),
+des transactions réparties de façon réaliste dans le temps, des AVI et des logs
+d'activité. Les insertions sont faites par lots et le résultat est déterministe
+pour une graine donnée.
+
+Exemples:
+    python data_generator.py --profile 10k --db bench_10k.db
+    python data_generator.py --db demo.db --clients 200 --transactions 50000 --seed 7
+"""
+
+import argparse
+import bisect
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from faker import Faker
+
+from activity_logger import create_user_tables
+from database import BankDatabase
+
+# Profils de volumétrie (nombre de transactions visé: 10k, 1M, 10M lignes)
+PROFILES = {
+    '10k': {'clients': 500, 'accounts_per_client': 2, 'transactions': 10_000,
+            'avis': 100, 'activity_logs': 2_000, 'users': 10},
+    '1m': {'clients': 20_000, 'accounts_per_client': 2, 'transactions': 1_000_000,
+           'avis': 5_000, 'activity_logs': 100_000, 'users': 50},
+    '10m': {'clients': 200_000, 'accounts_per_client': 2, 'transactions': 10_000_000,
+            'avis': 20_000, 'activity_logs': 1_000_000, 'users': 200},
+}
+
+CLIENT_TYPES = (['Particulier', 'Entreprise', 'VIP'], [80, 15, 5])
+CLIENT_STATUSES = (['Actif', 'Inactif', 'En attente'], [85, 10, 5])
+ACCOUNT_TYPES = (['Courant', 'Épargne', 'Entreprise'], [60, 30, 10])
+CURRENCIES = (['XAF', 'EUR', 'USD'], [85, 10, 5])
+TRANSACTION_TYPES = (['Dépôt', 'Retrait', 'Virement', 'Prélèvement'], [45, 35, 15, 5])
+ACTIVITY_ACTIONS = (
+    ['Connexion', 'Déconnexion', 'Dépôt', 'Retrait', 'Génération reçu',
+     'Création client', 'Modification rôle', 'Modification statut'],
+    [30, 20, 15, 12, 10, 8, 3, 2]
+)
+
+# Activité par heure (0-23): pic aux heures d'ouverture des agences
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 14, 16, 16, 15, 10, 12, 15, 14, 12, 9, 6, 4, 3, 2, 1, 1]
+# Activité par jour de semaine (lundi=0): plus faible le week-end
+WEEKDAY_WEIGHTS = [1.15, 1.0, 1.0, 1.0, 1.2, 0.55, 0.15]
+
+
+def _fmt(dt: datetime) -> str:
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class BankDataGenerator:
+    """Génère et insère un jeu de données synthétique dans une base BankDatabase"""
+
+    def __init__(self, db_name: str, seed: int = 42, batch_size: int = 10_000,
+                 days: int = 365, end_date: datetime = None):
+        """
+        Args:
+            db_name: Chemin de la base à remplir (créée si besoin)
+            seed: Graine du générateur pseudo-aléatoire
+            batch_size: Nombre de lignes par executemany/commit
+            days: Profondeur de l'historique en jours
+            end_date: Dernier jour de l'historique (par défaut: aujourd'hui)
+        """
+        self.db_name = db_name
+        self.seed = seed
+        self.batch_size = batch_size
+        self.days = days
+        end = end_date or datetime.now()
+        self.end_date = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        self.start_date = self.end_date - timedelta(days=days)
+
+        self.rng = random.Random(seed)
+        self.fake = Faker('fr_FR')
+        self.fake.seed_instance(seed)
+
+        # BankDatabase crée le schéma et fournit les règles IBAN/RIB
+        self.db = BankDatabase(db_name)
+        self.conn = sqlite3.connect(os.path.abspath(db_name), timeout=60)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = OFF")
+
+    def _choice(self, population_weights) -> str:
+        population, weights = population_weights
+        return self.rng.choices(population, weights)[0]
+
+    def _next_id(self, table: str) -> int:
+        return self.conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+
+    def _insert_batches(self, query: str, rows, label: str) -> int:
+        """Insère les lignes d'un itérable par lots, chaque lot dans sa transaction"""
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                with self.conn:
+                    self.conn.executemany(query, batch)
+                total += len(batch)
+                batch = []
+                print(f"  {label}: {total:,} lignes", end='\r', flush=True)
+        if batch:
+            with self.conn:
+                self.conn.executemany(query, batch)
+            total += len(batch)
+        print(f"  {label}: {total:,} lignes")
+        return total
+
+    def _random_datetime(self, start: datetime, end: datetime) -> datetime:
+        seconds = int((end - start).total_seconds())
+        return start + timedelta(seconds=self.rng.randint(0, max(seconds - 1, 0)))
+
+    # ===== Clients =====
+    def generate_clients(self, count: int) -> List[int]:
+        """Insère `count` clients et retourne leurs IDs"""
+        first_id = self._next_id('clients')
+        ids = list(range(first_id, first_id + count))
+
+        def rows():
+            for client_id in ids:
+                first_name = self.fake.first_name()
+                last_name = self.fake.last_name()
+                # L'email est unique: l'ID garantit l'absence de collision
+                email = f"{first_name}.{last_name}.{client_id}@{self.fake.free_email_domain()}".lower()
+                created_at = self._random_datetime(
+                    self.start_date - timedelta(days=365), self.start_date
+                )
+                yield (
+                    client_id, first_name, last_name, email, self.fake.phone_number(),
+                    self._choice(CLIENT_TYPES), self._choice(CLIENT_STATUSES), _fmt(created_at)
+                )
+
+        self._insert_batches('''
+        INSERT INTO clients (id, first_name, last_name, email, phone, type, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows(), "Clients")
+        return ids
+
+    # ===== Comptes =====
+    def generate_accounts(self, client_ids: List[int], per_client: int) -> List[Dict]:
+        """Insère les comptes (IBAN/RIB) des clients et retourne leur description"""
+        first_id = self._next_id('ibans')
+        bank_names = list(BankDatabase.BANK_DATA.keys())
+        existing = {row[0] for row in self.conn.execute("SELECT iban FROM ibans")}
+        accounts = []
+
+        def rows():
+            account_id = first_id
+            for client_id in client_ids:
+                # Entre 1 et 2 * per_client comptes, per_client en moyenne
+                n_accounts = max(1, min(2 * per_client, int(self.rng.expovariate(1 / per_client)) + 1))
+                for _ in range(n_accounts):
+                    data = self.db.generate_iban(self.rng.choice(bank_names), rng=self.rng)
+                    while data['iban'] in existing:
+                        data = self.db.generate_iban(data['bank_name'], rng=self.rng)
+                    existing.add(data['iban'])
+                    currency = self._choice(CURRENCIES)
+                    balance = round(self.rng.lognormvariate(11, 1.2), 2) if currency == 'XAF' \
+                        else round(self.rng.lognormvariate(6, 1.2), 2)
+                    accounts.append({
+                        'id': account_id, 'client_id': client_id, 'currency': currency,
+                        'balance': balance, 'iban': data['iban'], 'bic': data['bic'],
+                        'bank_code': data['bank_code'], 'account_number': data['account_number']
+                    })
+                    yield (
+                        account_id, client_id, data['iban'], currency, self._choice(ACCOUNT_TYPES),
+                        balance, data['bank_name'], data['bank_code'], data['bic'],
+                        data['rib_key'], data['account_number'], data['branch_code'],
+                        _fmt(self._random_datetime(self.start_date - timedelta(days=180), self.start_date))
+                    )
+                    account_id += 1
+
+        self._insert_batches('''
+        INSERT INTO ibans (id, client_id, iban, currency, type, balance, bank_name, bank_code,
+                           bic, rib_key, account_number, branch_code, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows(), "Comptes")
+        return accounts
+
+    # ===== Transactions =====
+    def _daily_counts(self, total: int) -> List[int]:
+        """Répartit `total` transactions sur les jours (week-ends, fins de mois, bruit)"""
+        weights = []
+        for offset in range(self.days):
+            day = self.start_date + timedelta(days=offset)
+            weight = WEEKDAY_WEIGHTS[day.weekday()]
+            if day.day >= 25 or day.day <= 2:
+                weight *= 1.6  # Versement des salaires et prélèvements de début de mois
+            weights.append(weight * self.rng.uniform(0.85, 1.15))
+        scale = total / sum(weights)
+        counts = [int(w * scale) for w in weights]
+        # Le reste est distribué sur les jours les plus chargés
+        remainder = total - sum(counts)
+        for index in sorted(range(self.days), key=lambda i: -weights[i])[:remainder]:
+            counts[index] += 1
+        return counts
+
+    def _amount(self, currency: str) -> float:
+        base = 10.5 if currency == 'XAF' else 4.5
+        return max(round(self.rng.lognormvariate(base, 1.1), 2), 1.0)
+
+    def generate_transactions(self, accounts: List[Dict], total: int) -> int:
+        """
+        Insère les transactions dans l'ordre chronologique (les IDs suivent les dates)
+        en maintenant des soldes cohérents, puis met à jour le solde des comptes
+        """
+        if not accounts or total <= 0:
+            return 0
+
+        # Activité des comptes très inégale (loi de Pareto)
+        cumulative = []
+        running = 0.0
+        for _ in accounts:
+            running += self.rng.paretovariate(1.5)
+            cumulative.append(running)
+
+        balances = [a['balance'] for a in accounts]
+        hours = list(range(24))
+        first_id = self._next_id('transactions')
+
+        def rows():
+            tx_id = first_id
+            for offset, count in enumerate(self._daily_counts(total)):
+                day = self.start_date + timedelta(days=offset)
+                seconds = sorted(
+                    h * 3600 + self.rng.randint(0, 3599)
+                    for h in self.rng.choices(hours, HOUR_WEIGHTS, k=count)
+                )
+                for second in seconds:
+                    index = bisect.bisect_left(cumulative, self.rng.uniform(0, running))
+                    account = accounts[min(index, len(accounts) - 1)]
+                    tx_type = self._choice(TRANSACTION_TYPES)
+                    amount = self._amount(account['currency'])
+                    if tx_type == 'Dépôt':
+                        balances[index] += amount
+                        description = "Versement espèces"
+                    elif balances[index] >= amount:
+                        balances[index] -= amount
+                        description = {
+                            'Retrait': "Retrait guichet",
+                            'Virement': "Virement émis",
+                            'Prélèvement': "Prélèvement automatique"
+                        }[tx_type]
+                    else:
+                        # Solde insuffisant: l'opération devient un dépôt
+                        tx_type = 'Dépôt'
+                        balances[index] += amount
+                        description = "Versement espèces"
+                    yield (
+                        tx_id, account['id'], account['client_id'], tx_type, amount,
+                        description, _fmt(day + timedelta(seconds=second))
+                    )
+                    tx_id += 1
+
+        inserted = self._insert_batches('''
+        INSERT INTO transactions (id, iban_id, client_id, type, amount, description, date)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows(), "Transactions")
+
+        self._insert_batches(
+            'UPDATE ibans SET balance = ? WHERE id = ?',
+            ((round(balance, 2), account['id']) for account, balance in zip(accounts, balances)),
+            "Soldes"
+        )
+
+        # Les écritures sont insérées en masse: instantanés de solde reconstruits d'un coup
+        print(f"  Instantanés de solde: {self.db.backfill_balance_snapshots():,} lignes")
+        return inserted
+
+    # ===== AVI =====
+    def generate_avis(self, accounts: List[Dict], count: int) -> int:
+        """Insère des attestations AVI rattachées à des comptes existants"""
+        if not accounts or count <= 0:
+            return 0
+        first_id = self._next_id('avis')
+        per_day: Dict[str, int] = {}
+        existing = {row[0] for row in self.conn.execute("SELECT reference FROM avis")}
+
+        def rows():
+            for avi_id in range(first_id, first_id + count):
+                account = self.rng.choice(accounts)
+                created = self._random_datetime(self.start_date, self.end_date)
+                day = created.strftime('%Y%m%d')
+                per_day[day] = per_day.get(day, 0) + 1
+                while f"AVI-{day}-{per_day[day]:04d}" in existing:
+                    per_day[day] += 1
+                devise = account['currency'] if account['currency'] in ('XAF', 'EUR', 'USD') else 'XAF'
+                yield (
+                    avi_id, f"AVI-{day}-{per_day[day]:04d}", self.fake.name(),
+                    account['bank_code'], account['account_number'], devise, account['iban'],
+                    account['bic'], float(self.rng.choice([2_500_000, 5_000_000, 7_500_000, 10_000_000])),
+                    created.strftime('%Y-%m-%d'),
+                    (created + timedelta(days=365)).strftime('%Y-%m-%d'),
+                    self.rng.choice(['Etudiant', 'Fonctionnaire']), None, _fmt(created)
+                )
+
+        return self._insert_batches('''
+        INSERT INTO avis (id, reference, nom_complet, code_banque, numero_compte, devise, iban,
+                          bic, montant, date_creation, date_expiration, statut, commentaires,
+                          created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows(), "AVI")
+
+    # ===== Utilisateurs et logs d'activité =====
+    def generate_activity_logs(self, users: int, count: int) -> int:
+        """
+        Crée des guichetiers puis insère leurs logs d'activité chronologiquement.
+        Les comptes créés ont un hash de mot de passe invalide: on ne peut pas s'y connecter.
+        """
+        if count <= 0:
+            return 0
+        create_user_tables(self.conn)
+
+        first_id = self._next_id('users')
+        user_ids = list(range(first_id, first_id + max(users, 1)))
+        self._insert_batches('''
+        INSERT INTO users (id, username, email, password_hash, role, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            (
+                user_id, f"guichet_{user_id}", f"guichet_{user_id}@ecocapital.local",
+                '!synthetique',
+                'manager' if user_id % 10 == 0 else 'user', 'active',
+                _fmt(self.start_date - timedelta(days=30))
+            )
+            for user_id in user_ids
+        ), "Utilisateurs")
+
+        ips = [self.fake.ipv4_private() for _ in user_ids]
+        first_log_id = self._next_id('activity_logs')
+
+        def rows():
+            log_id = first_log_id
+            for offset, day_count in enumerate(self._daily_counts(count)):
+                day = self.start_date + timedelta(days=offset)
+                for second in sorted(
+                    h * 3600 + self.rng.randint(0, 3599)
+                    for h in self.rng.choices(range(24), HOUR_WEIGHTS, k=day_count)
+                ):
+                    user_index = self.rng.randrange(len(user_ids))
+                    action = self._choice(ACTIVITY_ACTIONS)
+                    yield (
+                        log_id, user_ids[user_index], action, f"{action} (données synthétiques)",
+                        ips[user_index], _fmt(day + timedelta(seconds=second))
+                    )
+                    log_id += 1
+
+        return self._insert_batches('''
+        INSERT INTO activity_logs (id, user_id, action, details, ip_address, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows(), "Logs d'activité")
+
+    def run(self, clients: int, accounts_per_client: int, transactions: int,
+            avis: int = 0, activity_logs: int = 0, users: int = 10) -> Dict[str, int]:
+        """Génère le jeu de données complet et retourne le nombre de lignes par table"""
+        started = time.perf_counter()
+        client_ids = self.generate_clients(clients)
+        accounts = self.generate_accounts(client_ids, accounts_per_client)
+        summary = {
+            'clients': len(client_ids),
+            'ibans': len(accounts),
+            'transactions': self.generate_transactions(accounts, transactions),
+            'avis': self.generate_avis(accounts, avis),
+            'activity_logs': self.generate_activity_logs(users, activity_logs)
+        }
+        with self.conn:
+            self.conn.execute("ANALYZE")
+        print(f"Terminé en {time.perf_counter() - started:.1f}s: {summary}")
+        return summary
+
+    def close(self) -> None:
+        self.conn.close()
+        self.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un jeu de données bancaire synthétique")
+    parser.add_argument('--db', default='bank_synthetic.db', help="Base à remplir")
+    parser.add_argument('--profile', choices=sorted(PROFILES), help="Profil de volumétrie prédéfini")
+    parser.add_argument('--clients', type=int)
+    parser.add_argument('--accounts-per-client', type=int)
+    parser.add_argument('--transactions', type=int)
+    parser.add_argument('--avis', type=int)
+    parser.add_argument('--activity-logs', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--days', type=int, default=365, help="Profondeur de l'historique")
+    parser.add_argument('--end-date', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help="Dernier jour de l'historique, AAAA-MM-JJ (par défaut: aujourd'hui)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--force', action='store_true', help="Supprime la base si elle existe")
+    args = parser.parse_args(argv)
+
+    options = dict(PROFILES[args.profile] if args.profile else PROFILES['10k'])
+    for key in options:
+        value = getattr(args, key)
+        if value is not None:
+            options[key] = value
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} existe déjà (utilisez --force pour la remplacer)")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    print(f"Génération de {args.db} (graine {args.seed}): {options}")
+    generator = BankDataGenerator(args.db, seed=args.seed, batch_size=args.batch_size,
+                                  days=args.days, end_date=args.end_date)
+    try:
+        generator.run(**options)
+    finally:
+        generator.close()
+
+
+if __name__ == "__main__":
+    main()
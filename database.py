@@ -1,13 +1,19 @@
+import hashlib
+import json
 import logging
 import os
+import re
 import sqlite3
 from datetime import datetime, timedelta
 import random
-from typing import Optional, Dict, List, Union
+import threading
+from typing import Optional, Dict, List, Union, Iterator
 from venv import logger
 
 from jsonschema import ValidationError
 
+from cache import LRUCache
+
 class DatabaseError(Exception):
     """Classe de base pour les erreurs de base de données"""
     pass
@@ -27,6 +33,9 @@ class BankDatabase:
         logging.basicConfig(filename='database.log', level=logging.INFO)
         # Convertir en chemin absolu
         db_path = os.path.abspath(db_name)
+        self.db_path = db_path
+        self._cache = self._get_entity_caches(db_path)
+        self._pending_evictions = []
         try:
             self.conn = sqlite3.connect(db_path, timeout=15)
             self.conn.row_factory = sqlite3.Row
@@ -38,6 +47,73 @@ class BankDatabase:
             raise DatabaseError(f"Erreur de connexion à la base de données: {str(e)}")
 
 
+    # Nombre d'écritures d'un compte entre deux instantanés de solde
+    SNAPSHOT_INTERVAL = 100
+
+    # Caches d'entités partagés par toutes les instances du processus (clé: chemin de la base)
+    ENTITY_CACHE_SIZE = 1024
+    _entity_caches: Dict[str, Dict[str, LRUCache]] = {}
+    _entity_caches_lock = threading.Lock()
+
+    @classmethod
+    def _get_entity_caches(cls, db_path: str) -> Dict[str, LRUCache]:
+        """Retourne (en les créant si besoin) les caches d'entités associés à une base"""
+        with cls._entity_caches_lock:
+            caches = cls._entity_caches.get(db_path)
+            if caches is None:
+                caches = {
+                    name: LRUCache(cls.ENTITY_CACHE_SIZE)
+                    for name in ('client', 'iban', 'account', 'avi')
+                }
+                cls._entity_caches[db_path] = caches
+            return caches
+
+    @classmethod
+    def get_cache_stats(cls, db_name: str = "bank_database.db") -> Dict[str, Dict]:
+        """Retourne les compteurs (succès, échecs, taille) des caches d'entités"""
+        caches = cls._get_entity_caches(os.path.abspath(db_name))
+        return {name: cache.stats() for name, cache in caches.items()}
+
+    def clear_entity_caches(self) -> None:
+        """Vide les caches d'entités de cette base"""
+        for cache in self._cache.values():
+            cache.clear()
+
+    def _evict_account(self, iban_id: int, iban: str) -> None:
+        """Invalide les entrées de cache d'un compte (par ID et par IBAN)"""
+        self._cache['iban'].invalidate(iban_id)
+        self._cache['account'].invalidate(iban)
+
+    # Écouteurs notifiés après chaque écriture (ex: invalidation des indicateurs)
+    _write_listeners = []
+
+    @classmethod
+    def add_write_listener(cls, callback) -> None:
+        """
+        Enregistre une fonction appelée après chaque écriture réussie
+        Args:
+            callback: Fonction (db_path, entity) où entity vaut 'client', 'account',
+                      'transaction' ou 'avi'
+        """
+        if callback not in cls._write_listeners:
+            cls._write_listeners.append(callback)
+
+    def _notify_write(self, entity: str) -> None:
+        """Prévient les écouteurs d'une écriture (leurs erreurs n'annulent pas l'écriture)"""
+        for callback in list(self._write_listeners):
+            try:
+                callback(self.db_path, entity)
+            except Exception as e:
+                logging.error(f"Erreur d'un écouteur d'écriture: {str(e)}")
+
+    def _apply_pending_evictions(self) -> None:
+        """
+        Réapplique les invalidations après le commit, pour qu'un lecteur concurrent
+        n'ait pas remis en cache l'état antérieur pendant la transaction
+        """
+        while self._pending_evictions:
+            self._evict_account(*self._pending_evictions.pop())
+
     # Dictionnaire des banques avec leurs codes et BIC
     BANK_DATA = {
         "Digital Financial Service": {"code": "30001", "bic": "UNAFCGCG"},
@@ -46,12 +122,13 @@ class BankDatabase:
         #"Société Générale": {"code": "30003", "bic": "SOGEFRPP"}
     }
     
-    def generate_account_number(self, bank_name="Digital Financial Service"):
-        """Génère un numéro de compte complet avec clé RIB"""
+    def generate_account_number(self, bank_name="Digital Financial Service", rng=None):
+        """Génère un numéro de compte complet avec clé RIB (rng: générateur aléatoire, module random par défaut)"""
+        rng = rng or random
         bank_info = self.BANK_DATA.get(bank_name, self.BANK_DATA["Digital Financial Service"])
         code_banque = bank_info["code"]
-        code_guichet = f"{random.randint(0, 99999):05d}"
-        num_compte = f"{random.randint(0, 99999999999):011d}"
+        code_guichet = f"{rng.randint(0, 99999):05d}"
+        num_compte = f"{rng.randint(0, 99999999999):011d}"
         
         # Calcul de la clé RIB (formule bancaire française)
         rib_key = 97 - (
@@ -73,9 +150,9 @@ class BankDatabase:
         query = "SELECT * FROM accounts WHERE iban = ?"
         return self.conn.execute(query, (iban,)).fetchone()
 
-    def generate_iban(self, bank_name="Digital Financial Service"):
+    def generate_iban(self, bank_name="Digital Financial Service", rng=None):
         """Génère un IBAN valide à partir des données bancaires"""
-        account_data = self.generate_account_number(bank_name)
+        account_data = self.generate_account_number(bank_name, rng)
         country_code = "CG"
         check_digits = "42"  # Pour la France
         
@@ -141,6 +218,9 @@ class BankDatabase:
                     
                 if 'branch_code' not in columns:
                     cursor.execute("ALTER TABLE ibans ADD COLUMN branch_code TEXT")
+
+                if 'movements_since_snapshot' not in columns:
+                    cursor.execute("ALTER TABLE ibans ADD COLUMN movements_since_snapshot INTEGER NOT NULL DEFAULT 0")
                     
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors de la mise à jour du schéma: {str(e)}")
@@ -192,7 +272,12 @@ class BankDatabase:
                     account_data['account_number'],
                     account_data['branch_code']
                 ))
-                return cursor.lastrowid
+                account_id = cursor.lastrowid
+            # Les AVI sont jointes aux comptes par IBAN
+            self._cache['account'].invalidate(account_data['iban'])
+            self._cache['avi'].clear()
+            self._notify_write('account')
+            return account_id
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur SQLite: {str(e)}")
 
@@ -407,8 +492,7 @@ class BankDatabase:
             
             # ---- QR Code ----
             try:
-                import qrcode
-                from io import BytesIO
+                from qr_rendering import draw_qr_fpdf
                 
                 qr_data = {
                     "IBAN": account_data['iban'],
@@ -418,21 +502,8 @@ class BankDatabase:
                     "Date": datetime.now().strftime('%d/%m/%Y')
                 }
                 
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_L,
-                    box_size=3,
-                    border=2,
-                )
-                
-                qr.add_data(qr_data)
-                qr.make(fit=True)
-                
-                img = qr.make_image(fill_color="black", back_color="white")
-                img_bytes = BytesIO()
-                img.save(img_bytes, format='PNG')
-                img_bytes.seek(0)
-                pdf.image(img_bytes, x=150, y=pdf.get_y()+10, w=40)
+                # Modules dessinés en rectangles vectoriels
+                draw_qr_fpdf(pdf, str(qr_data), x=150, y=pdf.get_y()+10, size=40)
 
             except ImportError:
                 pass
@@ -448,6 +519,7 @@ class BankDatabase:
                 output_path = f"rib_documents/RIB_{account_data['iban']}.pdf"
             
             pdf.output(output_path)
+            self.record_document('rib', account_data['id'], output_path)
             return output_path
             
         except Exception as e:
@@ -486,6 +558,7 @@ class BankDatabase:
                     rib_key TEXT NOT NULL,
                     account_number TEXT NOT NULL,
                     branch_code TEXT NOT NULL,
+                    movements_since_snapshot INTEGER NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
                 )
@@ -525,8 +598,166 @@ class BankDatabase:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
                 ''')
+
+                # Index pour les vues client (comptes et transactions d'un client)
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_ibans_client ON ibans (client_id)')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_client_date ON transactions (client_id, date)')
+
+                # Index pour les indicateurs par période (jour, semaine)
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)')
+
+                # Clés d'idempotence des opérations (dépôt, retrait, virement)
+                self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    request_hash TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                ''')
+                self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_idempotency_key ON idempotency_keys (idempotency_key)')
+
+                # Instantanés de solde: solde du compte après la transaction last_transaction_id
+                self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS balance_snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    iban_id INTEGER NOT NULL,
+                    last_transaction_id INTEGER NOT NULL,
+                    balance REAL NOT NULL,
+                    snapshot_at TIMESTAMP NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (iban_id) REFERENCES ibans (id) ON DELETE CASCADE
+                )
+                ''')
+                self.conn.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_balance_snapshots_iban
+                ON balance_snapshots (iban_id, snapshot_at, last_transaction_id)
+                ''')
+
+                # Index des mouvements d'un compte dans l'ordre chronologique
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_iban_date ON transactions (iban_id, date)')
+
+                # Documents générés (reçus, RIB, AVI): remplace le parcours des répertoires de sortie
+                documents_exist = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='documents'").fetchone()
+                self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_type TEXT NOT NULL CHECK(doc_type IN ('receipt', 'rib', 'avi')),
+                    entity_id INTEGER,
+                    path TEXT,
+                    size INTEGER,
+                    created_at TIMESTAMP NOT NULL
+                )
+                ''')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_type_created ON documents (doc_type, created_at)')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_type_entity ON documents (doc_type, entity_id)')
+                if not documents_exist:
+                    self._import_existing_documents()
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors de la création des tables: {str(e)}")
+
+    # Répertoires de sortie des générateurs, repris une seule fois à la création de la table documents
+    LEGACY_DOCUMENT_DIRS = (
+        ('receipt', 'receipts', re.compile(r'^receipt_(\d+)_')),
+        ('rib', 'rib_documents', re.compile(r'^RIB_(.+)\.pdf$')),
+        ('rib', 'rib_receipts', re.compile(r'^RIB_(.+)\.pdf$')),
+        ('avi', 'avi_documents', re.compile(r'^AVI_(.+)\.pdf$')),
+    )
+
+    def _import_existing_documents(self) -> None:
+        """Enregistre les fichiers déjà présents dans les répertoires de sortie (migration)"""
+        cursor = self.conn.cursor()
+        rows = []
+        for doc_type, directory, pattern in self.LEGACY_DOCUMENT_DIRS:
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                match = pattern.match(name)
+                if not name.endswith('.pdf') or not match or not os.path.isfile(path):
+                    continue
+                key = match.group(1)
+                if doc_type == 'receipt':
+                    entity_id = int(key)
+                else:
+                    table, column = ('ibans', 'iban') if doc_type == 'rib' else ('avis', 'reference')
+                    found = cursor.execute(f'SELECT id FROM {table} WHERE {column}=?', (key,)).fetchone()
+                    entity_id = found[0] if found else None
+                stat = os.stat(path)
+                rows.append((doc_type, entity_id, path, stat.st_size,
+                             datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')))
+        cursor.executemany(
+            'INSERT INTO documents (doc_type, entity_id, path, size, created_at) VALUES (?, ?, ?, ?, ?)', rows)
+        if rows:
+            logger.info(f"{len(rows)} document(s) existant(s) enregistré(s) dans la table documents")
+
+    # ===== Documents générés =====
+    @staticmethod
+    def insert_document(conn: sqlite3.Connection, doc_type: str, entity_id: Optional[int],
+                        path: str = None, size: int = None) -> int:
+        """Insère une ligne documents sur une connexion donnée (sans commit), horodatée à l'heure locale"""
+        cursor = conn.execute(
+            'INSERT INTO documents (doc_type, entity_id, path, size, created_at) VALUES (?, ?, ?, ?, ?)',
+            (doc_type, entity_id, path, size, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return cursor.lastrowid
+
+    def record_document(self, doc_type: str, entity_id: Optional[int], path: str = None,
+                        size: int = None) -> int:
+        """
+        Enregistre un document généré
+        Args:
+            doc_type: 'receipt', 'rib' ou 'avi'
+            entity_id: ID de la transaction, du compte ou de l'AVI
+            path: Chemin du fichier (optionnel)
+            size: Taille en octets (lue sur le fichier si omise)
+        Returns:
+            int: ID du document
+        """
+        if size is None and path and os.path.exists(path):
+            size = os.path.getsize(path)
+        try:
+            with self.conn:
+                return self.insert_document(self.conn, doc_type, entity_id, path, size)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de l'enregistrement du document: {str(e)}")
+
+    def count_documents(self, doc_type: str = None) -> int:
+        """Nombre de documents générés, tous types ou d'un type"""
+        try:
+            cursor = self.conn.cursor()
+            if doc_type:
+                cursor.execute('SELECT COUNT(*) FROM documents WHERE doc_type=?', (doc_type,))
+            else:
+                cursor.execute('SELECT COUNT(*) FROM documents')
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors du comptage des documents: {str(e)}")
+
+    def get_daily_document_counts(self, doc_type: str, days: int = 30) -> List[Dict]:
+        """
+        Nombre de documents générés par jour sur une période glissante
+        Args:
+            doc_type: 'receipt', 'rib' ou 'avi'
+            days: Nombre de jours, aujourd'hui inclus
+        Returns:
+            List[Dict]: {'date', 'count'} pour les jours ayant au moins un document
+        """
+        start = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            SELECT date(created_at) AS date, COUNT(*) AS count
+            FROM documents
+            WHERE doc_type = ? AND created_at >= ?
+            GROUP BY date(created_at)
+            ORDER BY date
+            ''', (doc_type, start))
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors du comptage journalier des documents: {str(e)}")
         
     def get_avi_by_id(self, avi_id: int) -> Optional[Dict]:
         """Récupère une AVI par son ID"""
@@ -540,6 +771,9 @@ class BankDatabase:
 
     def get_avi_by_reference(self, reference: str) -> Optional[Dict]:
         """Récupère une AVI par sa référence"""
+        cached = self._cache['avi'].get(reference)
+        if cached is not None:
+            return dict(cached)
         try:
             cursor = self.conn.cursor()
             cursor.execute('''
@@ -556,7 +790,10 @@ class BankDatabase:
             ''', (reference,))
             
             avi = cursor.fetchone()
-            return dict(avi) if avi else None
+            if not avi:
+                return None
+            self._cache['avi'].set(reference, dict(avi))
+            return dict(avi)
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors de la récupération de l'AVI par référence: {str(e)}")
 
@@ -617,8 +854,11 @@ class BankDatabase:
                 SET {set_clause}
                 WHERE reference=?
                 ''', values)
-                
-                return cursor.rowcount > 0
+                updated = cursor.rowcount > 0
+
+            self._cache['avi'].invalidate(reference)
+            self._notify_write('avi')
+            return updated
                 
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors de la mise à jour de l'AVI: {str(e)}")
@@ -661,7 +901,9 @@ class BankDatabase:
                     avi_data['statut'],
                     avi_data.get('commentaires')
                 ))
-                return cursor.lastrowid
+                avi_id = cursor.lastrowid
+            self._notify_write('avi')
+            return avi_id
         except sqlite3.IntegrityError as e:
             raise IntegrityError(f"Erreur d'intégrité lors de l'ajout de l'AVI: {str(e)}")
         except sqlite3.Error as e:
@@ -716,7 +958,9 @@ class BankDatabase:
                 INSERT INTO clients (first_name, last_name, email, phone, type, status)
                 VALUES (?, ?, ?, ?, ?, ?)
                 ''', (first_name, last_name, email, phone, client_type, status))
-                return cursor.lastrowid
+                client_id = cursor.lastrowid
+            self._notify_write('client')
+            return client_id
         except sqlite3.IntegrityError as e:
             raise IntegrityError(f"Email déjà existant: {str(e)}")
         except sqlite3.Error as e:
@@ -736,6 +980,11 @@ class BankDatabase:
                 
                 if cursor.rowcount == 0:
                     raise NotFoundError(f"Client avec ID {client_id} non trouvé")
+
+            # Les comptes mis en cache embarquent le nom et le contact du client
+            self._cache['client'].invalidate(client_id)
+            self._cache['account'].clear()
+            self._notify_write('client')
         except sqlite3.IntegrityError as e:
             raise IntegrityError(f"Email déjà existant: {str(e)}")
         except sqlite3.Error as e:
@@ -743,12 +992,16 @@ class BankDatabase:
 
     def get_client_by_id(self, client_id: int) -> Optional[Dict]:
         """Récupère un client par son ID"""
+        cached = self._cache['client'].get(client_id)
+        if cached is not None:
+            return dict(cached)
         try:
             cursor = self.conn.cursor()
             cursor.execute('SELECT * FROM clients WHERE id=?', (client_id,))
             client = cursor.fetchone()
             
             if client:
+                self._cache['client'].set(client_id, dict(client))
                 return dict(client)
             return None
         except sqlite3.Error as e:
@@ -796,7 +1049,9 @@ class BankDatabase:
                 INSERT INTO ibans (client_id, iban, currency, type, balance)
                 VALUES (?, ?, ?, ?, ?)
                 ''', (client_id, iban, currency, account_type, balance))
-                return cursor.lastrowid
+                iban_id = cursor.lastrowid
+            self._notify_write('account')
+            return iban_id
         except sqlite3.IntegrityError as e:
             raise IntegrityError(f"IBAN déjà existant: {str(e)}")
         except sqlite3.Error as e:
@@ -804,11 +1059,17 @@ class BankDatabase:
 
     def get_iban_by_id(self, iban_id: int) -> Optional[Dict]:
         """Récupère un compte IBAN par son ID"""
+        cached = self._cache['iban'].get(iban_id)
+        if cached is not None:
+            return dict(cached)
         try:
             cursor = self.conn.cursor()
             cursor.execute('SELECT * FROM ibans WHERE id=?', (iban_id,))
             iban = cursor.fetchone()
-            return dict(iban) if iban else None
+            if not iban:
+                return None
+            self._cache['iban'].set(iban_id, dict(iban))
+            return dict(iban)
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors de la récupération de l'IBAN: {str(e)}")
 
@@ -823,6 +1084,9 @@ class BankDatabase:
 
     def get_account_by_iban(self, iban: str) -> Optional[Dict]:
         """Récupère les détails complets d'un compte par son IBAN"""
+        cached = self._cache['account'].get(iban)
+        if cached is not None:
+            return dict(cached)
         try:
             cursor = self.conn.cursor()
             cursor.execute('''
@@ -839,7 +1103,10 @@ class BankDatabase:
             ''', (iban,))
             
             account = cursor.fetchone()
-            return dict(account) if account else None
+            if not account:
+                return None
+            self._cache['account'].set(iban, dict(account))
+            return dict(account)
             
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors de la récupération du compte par IBAN: {str(e)}")
@@ -859,15 +1126,15 @@ class BankDatabase:
 
     # ===== Méthodes pour les transactions =====
     def _execute_transaction(self, iban_id: int, amount: float, 
-                           transaction_type: str, description: str) -> None:
-        """Méthode interne pour exécuter une transaction"""
+                           transaction_type: str, description: str) -> int:
+        """Méthode interne pour exécuter une transaction (retourne l'ID de la transaction)"""
         if amount <= 0:
             raise ValueError("Le montant doit être positif")
             
         cursor = self.conn.cursor()
         
         # Récupère le client_id et vérifie le solde pour les retraits
-        cursor.execute('SELECT client_id, balance FROM ibans WHERE id=?', (iban_id,))
+        cursor.execute('SELECT client_id, balance, iban FROM ibans WHERE id=?', (iban_id,))
         result = cursor.fetchone()
         
         if not result:
@@ -883,28 +1150,378 @@ class BankDatabase:
         INSERT INTO transactions (iban_id, client_id, type, amount, description)
         VALUES (?, ?, ?, ?, ?)
         ''', (iban_id, client_id, transaction_type, amount, description))
+        transaction_id = cursor.lastrowid
         
         # Met à jour le solde
         if transaction_type == 'Dépôt':
-            cursor.execute('UPDATE ibans SET balance = balance + ? WHERE id=?', (amount, iban_id))
+            cursor.execute('''
+            UPDATE ibans SET balance = balance + ?, movements_since_snapshot = movements_since_snapshot + 1
+            WHERE id=?
+            ''', (amount, iban_id))
         else:
-            cursor.execute('UPDATE ibans SET balance = balance - ? WHERE id=?', (amount, iban_id))
+            cursor.execute('''
+            UPDATE ibans SET balance = balance - ?, movements_since_snapshot = movements_since_snapshot + 1
+            WHERE id=?
+            ''', (amount, iban_id))
+
+        # Instantané de solde toutes les SNAPSHOT_INTERVAL écritures du compte
+        cursor.execute('''
+        INSERT INTO balance_snapshots (iban_id, last_transaction_id, balance, snapshot_at)
+        SELECT i.id, t.id, i.balance, t.date
+        FROM ibans i
+        JOIN transactions t ON t.id = ?
+        WHERE i.id = ? AND i.movements_since_snapshot >= ?
+        ''', (transaction_id, iban_id, self.SNAPSHOT_INTERVAL))
+        if cursor.rowcount:
+            cursor.execute('UPDATE ibans SET movements_since_snapshot = 0 WHERE id=?', (iban_id,))
+
+        # Le solde a changé: invalidation immédiate, puis de nouveau après le commit
+        self._evict_account(iban_id, result['iban'])
+        self._pending_evictions.append((iban_id, result['iban']))
+        return transaction_id
+
+    def _get_idempotent_result(self, idempotency_key: str, operation: str, request_hash: str):
+        """
+        Retourne le résultat enregistré pour une clé d'idempotence (None si la clé est inconnue)
+        Raises:
+            ValueError: Si la clé a déjà servi pour une autre opération ou d'autres paramètres
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT operation, request_hash, result FROM idempotency_keys WHERE idempotency_key = ?
+        ''', (idempotency_key,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        if row['operation'] != operation or row['request_hash'] != request_hash:
+            raise ValueError("Clé d'idempotence déjà utilisée pour une autre opération")
+        return json.loads(row['result'])
+
+    def _run_idempotent(self, idempotency_key: Optional[str], operation: str, params: tuple, action):
+        """
+        Exécute action() dans une transaction, une seule fois par clé d'idempotence
+        Returns:
+            tuple: (résultat, True si le résultat provient d'une exécution précédente)
+        """
+        if idempotency_key is None:
+            with self.conn:
+                return action(), False
+
+        request_hash = hashlib.sha256(json.dumps([operation, *params]).encode()).hexdigest()
+        stored = self._get_idempotent_result(idempotency_key, operation, request_hash)
+        if stored is not None:
+            return stored, True
 
-    def deposit(self, iban_id: int, amount: float, description: str = "") -> None:
-        """Effectue un dépôt sur un compte"""
         try:
             with self.conn:
-                self._execute_transaction(iban_id, amount, 'Dépôt', description)
+                result = action()
+                self.conn.execute('''
+                INSERT INTO idempotency_keys (idempotency_key, operation, request_hash, result)
+                VALUES (?, ?, ?, ?)
+                ''', (idempotency_key, operation, request_hash, json.dumps(result)))
+        except sqlite3.IntegrityError:
+            # Une requête concurrente a enregistré la même clé: son opération fait foi
+            stored = self._get_idempotent_result(idempotency_key, operation, request_hash)
+            if stored is None:
+                raise
+            return stored, True
+        return result, False
+
+    def deposit(self, iban_id: int, amount: float, description: str = "",
+                idempotency_key: str = None) -> int:
+        """
+        Effectue un dépôt sur un compte
+        Args:
+            idempotency_key: Clé unique de l'opération; une clé déjà utilisée retourne
+                le résultat d'origine sans reposter le dépôt
+        Returns:
+            int: ID de la transaction
+        """
+        try:
+            transaction_id, replayed = self._run_idempotent(
+                idempotency_key, 'deposit', (iban_id, amount, description),
+                lambda: self._execute_transaction(iban_id, amount, 'Dépôt', description)
+            )
+            if not replayed:
+                self._notify_write('transaction')
+            return transaction_id
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors du dépôt: {str(e)}")
+        finally:
+            self._apply_pending_evictions()
 
-    def withdraw(self, iban_id: int, amount: float, description: str = "") -> None:
-        """Effectue un retrait sur un compte"""
+    def withdraw(self, iban_id: int, amount: float, description: str = "",
+                 idempotency_key: str = None) -> int:
+        """
+        Effectue un retrait sur un compte
+        Args:
+            idempotency_key: Clé unique de l'opération; une clé déjà utilisée retourne
+                le résultat d'origine sans reposter le retrait
+        Returns:
+            int: ID de la transaction
+        """
         try:
-            with self.conn:
-                self._execute_transaction(iban_id, amount, 'Retrait', description)
+            transaction_id, replayed = self._run_idempotent(
+                idempotency_key, 'withdraw', (iban_id, amount, description),
+                lambda: self._execute_transaction(iban_id, amount, 'Retrait', description)
+            )
+            if not replayed:
+                self._notify_write('transaction')
+            return transaction_id
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors du retrait: {str(e)}")
+        finally:
+            self._apply_pending_evictions()
+
+    def transfer(self, source_id: int, target_id: int, amount: float, description: str = "",
+                 idempotency_key: str = None) -> Dict[str, int]:
+        """
+        Effectue un virement atomique entre deux comptes (débit et crédit dans la même transaction)
+        Args:
+            source_id: ID du compte débité
+            target_id: ID du compte crédité
+            amount: Montant du virement
+            description: Libellé ajouté aux deux écritures
+            idempotency_key: Clé unique de l'opération; une clé déjà utilisée retourne
+                le résultat d'origine sans reposter le virement
+        Returns:
+            Dict: IDs des écritures {'debit_id', 'credit_id'}
+        """
+        if source_id == target_id:
+            raise ValueError("Les comptes source et destinataire doivent être différents")
+
+        def action():
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT id, iban FROM ibans WHERE id IN (?, ?)', (source_id, target_id))
+            ibans = {row['id']: row['iban'] for row in cursor.fetchall()}
+            suffix = f" - {description}" if description else ""
+            # Mêmes types d'écriture que les virements saisis jusqu'ici (retrait puis dépôt)
+            debit_id = self._execute_transaction(
+                source_id, amount, 'Retrait', f"Virement vers {ibans.get(target_id, target_id)}{suffix}")
+            credit_id = self._execute_transaction(
+                target_id, amount, 'Dépôt', f"Virement depuis {ibans.get(source_id, source_id)}{suffix}")
+            return {'debit_id': debit_id, 'credit_id': credit_id}
+
+        try:
+            result, replayed = self._run_idempotent(
+                idempotency_key, 'transfer', (source_id, target_id, amount, description), action
+            )
+            if not replayed:
+                self._notify_write('transaction')
+            return result
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors du virement: {str(e)}")
+        finally:
+            self._apply_pending_evictions()
+
+    def purge_idempotency_keys(self, older_than_days: int = 30) -> int:
+        """
+        Supprime les clés d'idempotence plus anciennes que la période de rejeu
+        Returns:
+            int: Nombre de clés supprimées
+        """
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                DELETE FROM idempotency_keys WHERE created_at < datetime('now', ?)
+                ''', (f'-{int(older_than_days)} days',))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la purge des clés d'idempotence: {str(e)}")
+
+    # ===== Instantanés de solde =====
+    def write_daily_balance_snapshots(self) -> int:
+        """
+        Écrit un instantané pour chaque compte mouvementé depuis son dernier instantané
+        (tâche de fin de journée)
+        Returns:
+            int: Nombre d'instantanés écrits
+        """
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                INSERT OR IGNORE INTO balance_snapshots (iban_id, last_transaction_id, balance, snapshot_at)
+                SELECT i.id, t.id, i.balance, t.date
+                FROM ibans i
+                JOIN transactions t ON t.id = (
+                    SELECT id FROM transactions
+                    WHERE iban_id = i.id
+                    ORDER BY date DESC, id DESC
+                    LIMIT 1
+                )
+                WHERE i.movements_since_snapshot > 0
+                ''')
+                written = cursor.rowcount
+                cursor.execute('UPDATE ibans SET movements_since_snapshot = 0 WHERE movements_since_snapshot > 0')
+            logger.info(f"Instantanés de solde écrits: {written}")
+            return written
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de l'écriture des instantanés de solde: {str(e)}")
+
+    def backfill_balance_snapshots(self, interval: int = None) -> int:
+        """
+        Reconstruit les instantanés de tous les comptes à partir de l'historique:
+        un instantané toutes les `interval` écritures, plus un après la dernière
+        Args:
+            interval: Nombre d'écritures entre deux instantanés (par défaut SNAPSHOT_INTERVAL)
+        Returns:
+            int: Nombre d'instantanés écrits
+        """
+        interval = interval or self.SNAPSHOT_INTERVAL
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute('DELETE FROM balance_snapshots')
+                # Le solde initial n'est pas une écriture: on remonte depuis le solde courant
+                cursor.execute('''
+                INSERT INTO balance_snapshots (iban_id, last_transaction_id, balance, snapshot_at)
+                SELECT iban_id, id, ROUND(balance_after, 2), date
+                FROM (
+                    SELECT t.iban_id, t.id, t.date,
+                           ROW_NUMBER() OVER w AS from_end,
+                           COUNT(*) OVER (PARTITION BY t.iban_id) AS total,
+                           i.balance - COALESCE(SUM(
+                               CASE WHEN t.type = 'Dépôt' THEN t.amount ELSE -t.amount END
+                           ) OVER (w ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) AS balance_after
+                    FROM transactions t
+                    JOIN ibans i ON i.id = t.iban_id
+                    WINDOW w AS (PARTITION BY t.iban_id ORDER BY t.date DESC, t.id DESC)
+                )
+                WHERE from_end = 1 OR (total - from_end + 1) % ? = 0
+                ''', (interval,))
+                written = cursor.rowcount
+                cursor.execute('UPDATE ibans SET movements_since_snapshot = 0')
+            logger.info(f"Instantanés de solde reconstruits: {written}")
+            return written
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la reconstruction des instantanés de solde: {str(e)}")
+
+    def get_balance_at(self, iban_id: int, at: Union[datetime, str]) -> float:
+        """
+        Récupère le solde d'un compte à une date donnée (mouvements de cette date inclus)
+        en partant de l'instantané le plus proche et en rejouant seulement les écritures
+        qui l'en séparent
+        Args:
+            iban_id: ID du compte
+            at: Date (datetime ou 'YYYY-MM-DD HH:MM:SS'; 'YYYY-MM-DD' = début de journée)
+        Returns:
+            float: Solde à la date demandée
+        """
+        ts = at.strftime('%Y-%m-%d %H:%M:%S') if isinstance(at, datetime) else str(at)
+        signed = "CASE WHEN t.type = 'Dépôt' THEN t.amount ELSE -t.amount END"
+        try:
+            cursor = self.conn.cursor()
+
+            # Dernier instantané antérieur: on rejoue les écritures suivantes jusqu'à la date
+            cursor.execute(f'''
+            SELECT s.balance + COALESCE((
+                SELECT SUM({signed}) FROM transactions t
+                WHERE t.iban_id = s.iban_id
+                  AND t.date >= s.snapshot_at AND t.date <= ?
+                  AND (t.date > s.snapshot_at OR t.id > s.last_transaction_id)
+            ), 0)
+            FROM balance_snapshots s
+            WHERE s.iban_id = ? AND s.snapshot_at <= ?
+            ORDER BY s.snapshot_at DESC, s.last_transaction_id DESC
+            LIMIT 1
+            ''', (ts, iban_id, ts))
+            row = cursor.fetchone()
+
+            if not row:
+                # Premier instantané postérieur: on annule les écritures qui l'en séparent
+                cursor.execute(f'''
+                SELECT s.balance - COALESCE((
+                    SELECT SUM({signed}) FROM transactions t
+                    WHERE t.iban_id = s.iban_id
+                      AND t.date > ? AND t.date <= s.snapshot_at
+                      AND (t.date < s.snapshot_at OR t.id <= s.last_transaction_id)
+                ), 0)
+                FROM balance_snapshots s
+                WHERE s.iban_id = ? AND s.snapshot_at > ?
+                ORDER BY s.snapshot_at, s.last_transaction_id
+                LIMIT 1
+                ''', (ts, iban_id, ts))
+                row = cursor.fetchone()
+
+            if not row:
+                # Aucun instantané: on remonte depuis le solde courant
+                cursor.execute(f'''
+                SELECT i.balance - COALESCE((
+                    SELECT SUM({signed}) FROM transactions t
+                    WHERE t.iban_id = i.id AND t.date > ?
+                ), 0)
+                FROM ibans i
+                WHERE i.id = ?
+                ''', (ts, iban_id))
+                row = cursor.fetchone()
+                if not row:
+                    raise NotFoundError(f"IBAN avec ID {iban_id} non trouvé")
+
+            return round(row[0], 2)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors du calcul du solde historique: {str(e)}")
+
+    def get_account_history(self, iban_id: int, start: Union[datetime, str] = None,
+                            end: Union[datetime, str] = None, page: int = 1,
+                            page_size: int = 50) -> Dict:
+        """
+        Récupère les mouvements d'un compte, dans l'ordre chronologique, avec le solde après chaque mouvement
+        Args:
+            iban_id: ID du compte
+            start: Début de période inclus (datetime ou 'YYYY-MM-DD[ HH:MM:SS]')
+            end: Fin de période incluse ('YYYY-MM-DD' = toute la journée)
+            page: Numéro de page (à partir de 1)
+            page_size: Nombre de mouvements par page
+        Returns:
+            Dict: {'transactions', 'opening_balance', 'total', 'page', 'page_size', 'pages'}
+        """
+        page = max(1, int(page))
+        page_size = max(1, int(page_size))
+        start_ts = start.strftime('%Y-%m-%d %H:%M:%S') if isinstance(start, datetime) else (start or '')
+        end_ts = end.strftime('%Y-%m-%d %H:%M:%S') if isinstance(end, datetime) else (end or '9999-12-31')
+        if len(end_ts) == 10:
+            end_ts += ' 23:59:59'
+        signed = "CASE WHEN t.type = 'Dépôt' THEN t.amount ELSE -t.amount END"
+
+        try:
+            cursor = self.conn.cursor()
+
+            # Solde d'ouverture: solde à la date de début, moins les mouvements datés exactement de cet instant
+            opening_balance = self.get_balance_at(iban_id, start_ts)
+            cursor.execute(f'''
+            SELECT COALESCE(SUM({signed}), 0) FROM transactions t WHERE t.iban_id = ? AND t.date = ?
+            ''', (iban_id, start_ts))
+            opening_balance = round(opening_balance - cursor.fetchone()[0], 2)
+
+            cursor.execute('''
+            SELECT COUNT(*) FROM transactions WHERE iban_id = ? AND date >= ? AND date <= ?
+            ''', (iban_id, start_ts, end_ts))
+            total = cursor.fetchone()[0]
+
+            cursor.execute(f'''
+            SELECT * FROM (
+                SELECT t.id, t.date, t.type, t.amount, t.description,
+                       ROUND(? + SUM({signed}) OVER (ORDER BY t.date, t.id ROWS UNBOUNDED PRECEDING), 2)
+                           AS balance_after
+                FROM transactions t
+                WHERE t.iban_id = ? AND t.date >= ? AND t.date <= ?
+            )
+            ORDER BY date, id
+            LIMIT ? OFFSET ?
+            ''', (opening_balance, iban_id, start_ts, end_ts, page_size, (page - 1) * page_size))
+
+            return {
+                'transactions': [dict(row) for row in cursor.fetchall()],
+                'opening_balance': opening_balance,
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'pages': max(1, -(-total // page_size))
+            }
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la récupération de l'historique du compte: {str(e)}")
 
     def get_transaction_by_id(self, transaction_id: int) -> Optional[Dict]:
         """Récupère une transaction par son ID"""
@@ -922,6 +1539,262 @@ class BankDatabase:
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur lors de la récupération de la transaction: {str(e)}")
 
+    _TRANSACTION_CONTEXT_SELECT = '''
+            SELECT
+                t.id, t.iban_id, t.client_id, t.type, t.amount, t.description, t.date,
+                i.iban, i.currency, i.type AS iban_type, i.balance, i.bank_name,
+                i.bank_code, i.bic, i.rib_key, i.account_number, i.branch_code,
+                i.created_at AS iban_created_at,
+                c.first_name, c.last_name, c.email, c.phone,
+                c.type AS client_type, c.status AS client_status,
+                c.created_at AS client_created_at
+            FROM transactions t
+            JOIN ibans i ON t.iban_id = i.id
+            JOIN clients c ON t.client_id = c.id
+            '''
+
+    @staticmethod
+    def _transaction_context_from_row(row: sqlite3.Row) -> Dict:
+        """Découpe une ligne de _TRANSACTION_CONTEXT_SELECT en {'transaction', 'client', 'iban'}"""
+        transaction = {
+            'id': row['id'],
+            'iban_id': row['iban_id'],
+            'client_id': row['client_id'],
+            'type': row['type'],
+            'amount': row['amount'],
+            'description': row['description'],
+            'date': row['date'],
+            'iban': row['iban'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name']
+        }
+        client = {
+            'id': row['client_id'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'email': row['email'],
+            'phone': row['phone'],
+            'type': row['client_type'],
+            'status': row['client_status'],
+            'created_at': row['client_created_at']
+        }
+        iban = {
+            'id': row['iban_id'],
+            'client_id': row['client_id'],
+            'iban': row['iban'],
+            'currency': row['currency'],
+            'type': row['iban_type'],
+            'balance': row['balance'],
+            'bank_name': row['bank_name'],
+            'bank_code': row['bank_code'],
+            'bic': row['bic'],
+            'rib_key': row['rib_key'],
+            'account_number': row['account_number'],
+            'branch_code': row['branch_code'],
+            'created_at': row['iban_created_at']
+        }
+        return {'transaction': transaction, 'client': client, 'iban': iban}
+
+    def get_transaction_context(self, transaction_id: int) -> Optional[Dict]:
+        """
+        Récupère une transaction avec son client et son compte en une seule requête
+        Args:
+            transaction_id: ID de la transaction
+        Returns:
+            Dict: {'transaction', 'client', 'iban'} ou None si la transaction n'existe pas
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(self._TRANSACTION_CONTEXT_SELECT + 'WHERE t.id = ?', (transaction_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            return self._transaction_context_from_row(row)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la récupération du contexte de transaction: {str(e)}")
+
+    def get_transaction_contexts(self, transaction_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Récupère le contexte de plusieurs transactions en une seule requête
+        Args:
+            transaction_ids: IDs des transactions (au plus quelques centaines par appel)
+        Returns:
+            Dict[int, Dict]: ID -> {'transaction', 'client', 'iban'}, sans les IDs inexistants
+        """
+        if not transaction_ids:
+            return {}
+        try:
+            cursor = self.conn.cursor()
+            placeholders = ', '.join('?' for _ in transaction_ids)
+            cursor.execute(self._TRANSACTION_CONTEXT_SELECT + f'WHERE t.id IN ({placeholders})',
+                           [int(transaction_id) for transaction_id in transaction_ids])
+            return {row['id']: self._transaction_context_from_row(row) for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la récupération des contextes de transaction: {str(e)}")
+
+    def get_transaction_ids(self, start: Union[datetime, str] = None, end: Union[datetime, str] = None,
+                            client_id: int = None) -> List[int]:
+        """
+        Sélectionne les transactions d'une période et/ou d'un client, dans l'ordre chronologique
+        Args:
+            start: Début de période inclus (datetime ou 'YYYY-MM-DD[ HH:MM:SS]')
+            end: Fin de période incluse ('YYYY-MM-DD' = toute la journée)
+            client_id: ID du client (optionnel)
+        Returns:
+            List[int]: IDs des transactions
+        """
+        start_ts = start.strftime('%Y-%m-%d %H:%M:%S') if isinstance(start, datetime) else (start or '')
+        end_ts = end.strftime('%Y-%m-%d %H:%M:%S') if isinstance(end, datetime) else (end or '9999-12-31')
+        if len(end_ts) == 10:
+            end_ts += ' 23:59:59'
+        conditions, params = ['date >= ?', 'date <= ?'], [start_ts, end_ts]
+        if client_id is not None:
+            conditions.append('client_id = ?')
+            params.append(client_id)
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(f'''
+            SELECT id FROM transactions
+            WHERE {' AND '.join(conditions)}
+            ORDER BY date, id
+            ''', params)
+            return [row[0] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la sélection des transactions: {str(e)}")
+
+    def iter_journal_transactions(self, start: Union[datetime, str], end: Union[datetime, str] = None,
+                                  branch_code: str = None, batch_size: int = 500) -> Iterator[sqlite3.Row]:
+        """
+        Parcourt les transactions d'une période dans l'ordre chronologique, par lots lus
+        depuis le curseur (mémoire constante quel que soit le nombre de lignes)
+        Args:
+            start: Début de période inclus (datetime ou 'YYYY-MM-DD[ HH:MM:SS]')
+            end: Fin de période incluse ('YYYY-MM-DD' = toute la journée, par défaut le jour de start)
+            branch_code: Code guichet des comptes (optionnel)
+            batch_size: Nombre de lignes lues par appel à fetchmany
+        Yields:
+            sqlite3.Row: id, date, type, amount, description, iban, currency, branch_code, first_name, last_name
+        """
+        start_ts = start.strftime('%Y-%m-%d %H:%M:%S') if isinstance(start, datetime) else start
+        if end is None:
+            end = start_ts[:10]
+        end_ts = end.strftime('%Y-%m-%d %H:%M:%S') if isinstance(end, datetime) else end
+        if len(end_ts) == 10:
+            end_ts += ' 23:59:59'
+        conditions, params = ['t.date >= ?', 't.date <= ?'], [start_ts, end_ts]
+        if branch_code:
+            conditions.append('i.branch_code = ?')
+            params.append(branch_code)
+        try:
+            # Curseur dédié: les autres requêtes de la connexion ne l'interrompent pas
+            cursor = self.conn.cursor()
+            cursor.execute(f'''
+            SELECT t.id, t.date, t.type, t.amount, t.description,
+                   i.iban, i.currency, i.branch_code, c.first_name, c.last_name
+            FROM transactions t
+            JOIN ibans i ON t.iban_id = i.id
+            JOIN clients c ON t.client_id = c.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY t.date, t.id
+            ''', params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la lecture du journal des transactions: {str(e)}")
+
+    def get_branch_codes(self) -> List[str]:
+        """Codes guichet distincts des comptes, triés"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            SELECT DISTINCT branch_code FROM ibans
+            WHERE branch_code IS NOT NULL AND branch_code != ''
+            ORDER BY branch_code
+            ''')
+            return [row[0] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la récupération des codes guichet: {str(e)}")
+
+    def get_client_overview(self, client_id: int, recent_limit: int = 10) -> Optional[Dict]:
+        """
+        Vue complète d'un client (fiche, comptes, transactions récentes, totaux)
+        en un nombre fixe de requêtes, quel que soit le nombre de comptes
+        Args:
+            client_id: ID du client
+            recent_limit: Nombre de transactions récentes à inclure
+        Returns:
+            Dict: {'client', 'accounts', 'recent_transactions', 'totals'} ou None
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT * FROM clients WHERE id=?', (client_id,))
+            client = cursor.fetchone()
+            if not client:
+                return None
+
+            # Comptes et agrégats par compte en une seule passe sur les transactions du client
+            cursor.execute('''
+            SELECT
+                i.*,
+                COALESCE(t.deposits, 0) AS total_deposits,
+                COALESCE(t.debits, 0) AS total_debits,
+                COALESCE(t.tx_count, 0) AS transaction_count,
+                t.last_date AS last_transaction_date
+            FROM ibans i
+            LEFT JOIN (
+                SELECT
+                    iban_id,
+                    SUM(CASE WHEN type = 'Dépôt' THEN amount ELSE 0 END) AS deposits,
+                    SUM(CASE WHEN type != 'Dépôt' THEN amount ELSE 0 END) AS debits,
+                    COUNT(*) AS tx_count,
+                    MAX(date) AS last_date
+                FROM transactions
+                WHERE client_id = ?
+                GROUP BY iban_id
+            ) t ON t.iban_id = i.id
+            WHERE i.client_id = ?
+            ORDER BY i.id
+            ''', (client_id, client_id))
+            accounts = [dict(row) for row in cursor.fetchall()]
+
+            cursor.execute('''
+            SELECT t.*, i.iban, i.currency
+            FROM transactions t
+            JOIN ibans i ON t.iban_id = i.id
+            WHERE t.client_id = ?
+            ORDER BY t.date DESC, t.id DESC
+            LIMIT ?
+            ''', (client_id, recent_limit))
+            recent_transactions = [dict(row) for row in cursor.fetchall()]
+
+            balance_by_currency = {}
+            for account in accounts:
+                currency = account['currency']
+                balance_by_currency[currency] = balance_by_currency.get(currency, 0) + (account['balance'] or 0)
+
+            totals = {
+                'account_count': len(accounts),
+                'transaction_count': sum(a['transaction_count'] for a in accounts),
+                'deposits': sum(a['total_deposits'] for a in accounts),
+                'debits': sum(a['total_debits'] for a in accounts),
+                'balance_by_currency': balance_by_currency
+            }
+
+            return {
+                'client': dict(client),
+                'accounts': accounts,
+                'recent_transactions': recent_transactions,
+                'totals': totals
+            }
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erreur lors de la récupération de la vue client: {str(e)}")
+
     def get_all_transactions(self) -> List[Dict]:
         """Récupère toutes les transactions"""
         try:
@@ -1039,4 +1912,4 @@ class BankDatabase:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Ferme la connexion à la fin du contexte"""
-        self.close()
\ No newline at end of file
+        self.close()
\ No newline at end of file
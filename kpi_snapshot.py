@@ -0,0 +1,209 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from database import BankDatabase, DatabaseError
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité par défaut d'un instantané (secondes)
+DEFAULT_TTL = 30.0
+
+
+class KPISnapshotService:
+    """
+    Calcule les indicateurs du tableau de bord dans une seule transaction de lecture
+    et les garde en cache pour tout le processus
+    """
+
+    def __init__(self, db_name: str = "bank_database.db", ttl: float = DEFAULT_TTL):
+        """
+        Args:
+            db_name: Chemin de la base de données
+            ttl: Durée de validité d'un instantané en secondes
+        """
+        self.db_path = os.path.abspath(db_name)
+        self.ttl = ttl
+        self._snapshot: Optional[Dict] = None
+        self._computed_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        BankDatabase.add_write_listener(self._on_write)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connexion dédiée, partagée entre threads sous self._lock"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=15, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def _on_write(self, db_path: str, entity: str) -> None:
+        """Écouteur appelé par les méthodes d'écriture de BankDatabase"""
+        if db_path == self.db_path and entity in ('client', 'transaction'):
+            self.mark_stale()
+
+    def mark_stale(self) -> None:
+        """Marque l'instantané comme périmé et réveille le thread de rafraîchissement"""
+        self._stale = True
+        self._wakeup.set()
+
+    def is_fresh(self) -> bool:
+        """Indique si l'instantané courant peut être servi tel quel"""
+        return (
+            self._snapshot is not None
+            and not self._stale
+            and time.monotonic() - self._computed_at < self.ttl
+        )
+
+    def get_snapshot(self) -> Dict:
+        """Retourne l'instantané courant, recalculé s'il est périmé"""
+        if self.is_fresh():
+            return self._snapshot
+        return self.refresh()
+
+    def refresh(self) -> Dict:
+        """Recalcule tous les indicateurs dans une seule transaction de lecture"""
+        with self._lock:
+            # Un autre thread a pu rafraîchir pendant l'attente du verrou
+            if self.is_fresh():
+                return self._snapshot
+
+            # Le drapeau est levé avant la lecture: une écriture concurrente le remettra
+            self._stale = False
+            try:
+                snapshot = self._compute(self._connection())
+            except sqlite3.Error as e:
+                self._stale = True
+                raise DatabaseError(f"Erreur lors du calcul des indicateurs: {str(e)}")
+
+            self._snapshot = snapshot
+            self._computed_at = time.monotonic()
+            return snapshot
+
+    def _compute(self, conn: sqlite3.Connection) -> Dict:
+        """Exécute les requêtes d'indicateurs dans une même transaction"""
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        tomorrow = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+        week_start = (now - timedelta(days=7)).strftime('%Y-%m-%d')
+
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        try:
+            cursor.execute('''
+            SELECT type, COUNT(*) AS count, SUM(status = 'Actif') AS active
+            FROM clients
+            GROUP BY type
+            ''')
+            client_rows = cursor.fetchall()
+
+            cursor.execute('''
+            SELECT
+                COALESCE(SUM(CASE WHEN type = 'Dépôt' THEN amount END), 0) AS deposits,
+                COALESCE(SUM(CASE WHEN type = 'Retrait' THEN amount END), 0) AS withdrawals
+            FROM transactions
+            ''')
+            totals = cursor.fetchone()
+
+            cursor.execute('''
+            SELECT COUNT(*) FROM transactions WHERE date >= ? AND date < ?
+            ''', (today, tomorrow))
+            daily_count = cursor.fetchone()[0]
+
+            cursor.execute('''
+            SELECT
+                date(date) AS day,
+                COALESCE(SUM(CASE WHEN type = 'Dépôt' THEN amount END), 0) AS deposit,
+                COALESCE(SUM(CASE WHEN type = 'Retrait' THEN amount END), 0) AS withdrawal
+            FROM transactions
+            WHERE date >= ? AND date < ?
+            GROUP BY day
+            ''', (week_start, tomorrow))
+            per_day = {row['day']: row for row in cursor.fetchall()}
+        finally:
+            conn.commit()
+
+        # Série hebdomadaire au même format que BankDatabase.get_last_week_transactions()
+        weekly = {'date': [], 'deposit': [], 'withdrawal': []}
+        current = now - timedelta(days=7)
+        while current <= now:
+            day = current.strftime('%Y-%m-%d')
+            row = per_day.get(day)
+            weekly['date'].append(day)
+            weekly['deposit'].append(row['deposit'] if row else 0)
+            weekly['withdrawal'].append(row['withdrawal'] if row else 0)
+            current += timedelta(days=1)
+
+        return {
+            'active_clients': sum(row['active'] or 0 for row in client_rows),
+            'clients_by_type': [(row['type'], row['count']) for row in client_rows],
+            'daily_transactions': daily_count,
+            'total_deposits': totals['deposits'],
+            'total_withdrawals': totals['withdrawals'],
+            'weekly': weekly,
+            'computed_at': now.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    # ===== Rafraîchissement en arrière-plan =====
+    def start(self, interval: float = None) -> None:
+        """
+        Démarre le thread qui rafraîchit l'instantané à intervalle régulier
+        et dès qu'une écriture le marque comme périmé
+        Args:
+            interval: Période de rafraîchissement (par défaut: le TTL)
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        interval = interval or self.ttl
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="kpi-snapshot-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh()
+            except DatabaseError as e:
+                logger.error(f"Rafraîchissement des indicateurs impossible: {str(e)}")
+
+    def stop(self) -> None:
+        """Arrête le thread de rafraîchissement et ferme la connexion"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_services: Dict[str, KPISnapshotService] = {}
+_services_lock = threading.Lock()
+
+
+def get_kpi_service(db_name: str = "bank_database.db", ttl: float = DEFAULT_TTL) -> KPISnapshotService:
+    """Retourne le service d'indicateurs du processus pour une base (démarré au premier appel)"""
+    db_path = os.path.abspath(db_name)
+    with _services_lock:
+        service = _services.get(db_path)
+        if service is None:
+            service = KPISnapshotService(db_path, ttl=ttl)
+            service.start()
+            _services[db_path] = service
+        return service
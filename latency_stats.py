@@ -0,0 +1,19 @@
+from typing import List
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Percentile par interpolation linéaire sur des valeurs triées
+    (partagé par benchmark.py et load_test.py pour que leurs p95 soient comparables)
+    Args:
+        sorted_values: Valeurs triées par ordre croissant
+        fraction: Rang voulu entre 0 et 1 (0.95 = p95)
+    Returns:
+        float: Valeur du percentile, 0.0 si la liste est vide
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
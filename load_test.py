@@ -0,0 +1,394 @@
+"""
+Test de charge des guichets sur un fichier SQLite partagé
+
+Lance N processus x M threads qui exécutent un mélange d'opérations (dépôt, retrait,
+virement, recherche, génération de reçu) via BankDatabase sur la même base, puis
+rapporte le débit, l'histogramme des latences, les erreurs "database is locked"
+et la cohérence des soldes en fin de test.
+
+Exemples:
+    python load_test.py --db charge.db --profile 10k --processes 4 --threads 4 --duration 30
+    python load_test.py --db charge.db --hot-accounts 10 --mix deposit=70,withdraw=30
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from data_generator import PROFILES, BankDataGenerator
+from database import BankDatabase, DatabaseError, NotFoundError
+from latency_stats import percentile
+
+OPERATIONS = ('deposit', 'withdraw', 'virement', 'search', 'receipt')
+DEFAULT_MIX = 'deposit=40,withdraw=25,virement=15,search=15,receipt=5'
+DESCRIPTION_PREFIX = "Test de charge"
+# Bornes supérieures des classes de l'histogramme (millisecondes)
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """Convertit 'deposit=40,withdraw=25' en poids par opération"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Opération inconnue: {name}")
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("Le mélange d'opérations est vide")
+    return mix
+
+
+def is_lock_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def new_op_stats() -> Dict:
+    return {'count': 0, 'errors': 0, 'locked': 0, 'rejected': 0, 'last_error': None, 'latencies': []}
+
+
+class TellerWorker:
+    """Un guichetier: une connexion BankDatabase et une suite d'opérations aléatoires"""
+
+    def __init__(self, db_path: str, iban_ids: List[int], mix: Dict[str, int],
+                 seed: int, busy_timeout: int = None):
+        self.db = BankDatabase(db_path)
+        if busy_timeout is not None:
+            self.db.conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+        self.iban_ids = iban_ids
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.rng = random.Random(seed)
+        self.stats = {name: new_op_stats() for name in self.names}
+        # Montants effectivement postés, comparés au grand livre en fin de test
+        self.tally = {'credits': 0.0, 'debits': 0.0}
+        self.last_transaction_id = None
+
+    def amount(self) -> float:
+        return float(self.rng.randint(1, 500) * 100)
+
+    def op_deposit(self):
+        amount = self.amount()
+        self.db.deposit(self.rng.choice(self.iban_ids), amount, f"{DESCRIPTION_PREFIX} dépôt")
+        self.tally['credits'] += amount
+
+    def op_withdraw(self):
+        amount = self.amount()
+        self.db.withdraw(self.rng.choice(self.iban_ids), amount, f"{DESCRIPTION_PREFIX} retrait")
+        self.tally['debits'] += amount
+
+    def op_virement(self):
+        source, target = self.rng.sample(self.iban_ids, 2)
+        amount = self.amount()
+        self.db.transfer(source, target, amount, f"{DESCRIPTION_PREFIX} virement")
+        self.tally['debits'] += amount
+        self.tally['credits'] += amount
+
+    def op_search(self):
+        if self.rng.random() < 0.5:
+            self.db.search_accounts(min_balance=float(self.rng.randint(0, 1_000_000)))
+        else:
+            self.db.search_avis(search_term=self.rng.choice(["AVI-", "CG42", "300"]))
+
+    def op_receipt(self):
+        from receipt_generator import generate_receipt_pdf
+
+        if self.last_transaction_id is None:
+            row = self.db.conn.execute("SELECT MAX(id) FROM transactions").fetchone()
+            self.last_transaction_id = row[0]
+        if not self.last_transaction_id:
+            return
+        context = self.db.get_transaction_context(self.rng.randint(1, self.last_transaction_id))
+        if context is None:
+            return
+        generate_receipt_pdf(context['transaction'], context['client'], context['iban'],
+                             "Digital Financial Service", include_qr=True)
+
+    def run_once(self) -> None:
+        name = self.rng.choices(self.names, self.weights)[0]
+        stats = self.stats[name]
+        started = time.perf_counter_ns()
+        try:
+            getattr(self, f"op_{name}")()
+        except ValueError:
+            # Solde insuffisant: refus métier, pas une erreur de charge
+            stats['rejected'] += 1
+        except Exception as e:
+            stats['errors'] += 1
+            stats['last_error'] = f"{type(e).__name__}: {str(e)}"
+            if isinstance(e, (DatabaseError, NotFoundError)) and is_lock_error(e):
+                stats['locked'] += 1
+        stats['count'] += 1
+        stats['latencies'].append((time.perf_counter_ns() - started) / 1e6)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def _run_thread(worker: TellerWorker, start_event, duration: float, max_ops: int) -> None:
+    start_event.wait()
+    deadline = time.monotonic() + duration
+    done = 0
+    while time.monotonic() < deadline and (not max_ops or done < max_ops):
+        worker.run_once()
+        done += 1
+    worker.close()
+
+
+def worker_process(index: int, db_path: str, iban_ids: List[int], mix: Dict[str, int],
+                   threads: int, duration: float, max_ops: int, seed: int,
+                   busy_timeout: int, start_event, queue) -> None:
+    """Processus de test: lance les threads guichetiers et renvoie leurs mesures"""
+    # Les reçus sont écrits relativement au répertoire courant
+    workdir = tempfile.mkdtemp(prefix=f"load_test_{index}_")
+    os.chdir(workdir)
+
+    # Chaque thread ouvre sa propre connexion (sqlite3 interdit le partage entre threads)
+    workers = []
+    ready = threading.Barrier(threads + 1)
+
+    def teller(i):
+        worker = TellerWorker(db_path, iban_ids, mix, seed * 1000 + index * 100 + i, busy_timeout)
+        workers.append(worker)
+        ready.wait()
+        _run_thread(worker, start_event, duration, max_ops)
+
+    pool = [threading.Thread(target=teller, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    ready.wait()
+    for thread in pool:
+        thread.join()
+
+    result = {'stats': {}, 'tally': {'credits': 0.0, 'debits': 0.0}}
+    for worker in workers:
+        for name, stats in worker.stats.items():
+            merged = result['stats'].setdefault(name, new_op_stats())
+            for key in ('count', 'errors', 'locked', 'rejected'):
+                merged[key] += stats[key]
+            merged['last_error'] = stats['last_error'] or merged['last_error']
+            merged['latencies'].extend(stats['latencies'])
+        for key in result['tally']:
+            result['tally'][key] += worker.tally[key]
+    queue.put(result)
+
+
+# ===== Rapport =====
+def histogram(latencies: List[float]) -> List[tuple]:
+    """Retourne [(borne, nombre)] avec une dernière classe ouverte"""
+    counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    for value in latencies:
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f"<= {b} ms" for b in HISTOGRAM_BOUNDS_MS] + [f"> {HISTOGRAM_BOUNDS_MS[-1]} ms"]
+    return list(zip(labels, counts))
+
+
+def snapshot_balances(db_path: str) -> tuple:
+    """Retourne (soldes par compte, dernier ID de transaction)"""
+    db = BankDatabase(db_path)
+    try:
+        balances = {row['id']: row['balance'] for row in db.conn.execute("SELECT id, balance FROM ibans")}
+        max_id = db.conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+        return balances, max_id
+    finally:
+        db.close()
+
+
+def check_consistency(db_path: str, balances_before: Dict[int, float], max_id_before: int,
+                      tally: Dict) -> Dict:
+    """
+    Vérifie que chaque solde final égale le solde initial plus les mouvements du test,
+    et que le grand livre contient exactement les montants annoncés par les guichetiers
+    """
+    db = BankDatabase(db_path)
+    try:
+        cursor = db.conn.cursor()
+        cursor.execute('''
+        SELECT iban_id,
+               SUM(CASE WHEN type = 'Dépôt' THEN amount ELSE 0 END) AS credits,
+               SUM(CASE WHEN type != 'Dépôt' THEN amount ELSE 0 END) AS debits
+        FROM transactions
+        WHERE id > ?
+        GROUP BY iban_id
+        ''', (max_id_before,))
+        movements = {row['iban_id']: row for row in cursor.fetchall()}
+        balances_after = {row['id']: row['balance'] for row in cursor.execute("SELECT id, balance FROM ibans")}
+    finally:
+        db.close()
+
+    mismatched = []
+    for iban_id, before in balances_before.items():
+        row = movements.get(iban_id)
+        expected = before + ((row['credits'] - row['debits']) if row else 0)
+        if abs(balances_after.get(iban_id, 0) - expected) > 0.005:
+            mismatched.append(iban_id)
+
+    ledger_credits = sum(row['credits'] for row in movements.values())
+    ledger_debits = sum(row['debits'] for row in movements.values())
+    return {
+        'accounts_checked': len(balances_before),
+        'mismatched_accounts': mismatched,
+        'negative_balances': sum(1 for b in balances_after.values() if b < 0),
+        'ledger_credits': ledger_credits,
+        'ledger_debits': ledger_debits,
+        'reported_credits': tally['credits'],
+        'reported_debits': tally['debits'],
+        'consistent': (
+            not mismatched
+            and abs(ledger_credits - tally['credits']) < 0.005
+            and abs(ledger_debits - tally['debits']) < 0.005
+        )
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\nDurée: {report['elapsed']:.1f}s   Opérations: {report['total_ops']:,}   "
+          f"Débit: {report['throughput']:.1f} ops/s   Verrous: {report['total_locked']:,}")
+    print(f"{'Opération':<10} {'nb':>8} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'erreurs':>8} {'verrous':>8} {'refus':>7}")
+    for name, op in report['operations'].items():
+        print(f"{name:<10} {op['count']:>8} {op['ops_per_sec']:>9.1f} {op['p50_ms']:>9.2f} "
+              f"{op['p95_ms']:>9.2f} {op['p99_ms']:>9.2f} {op['errors']:>8} {op['locked']:>8} {op['rejected']:>7}")
+        if op['last_error']:
+            print(f"{'':<10} dernière erreur: {op['last_error']}")
+
+    print("\nHistogramme des latences")
+    peak = max((count for _, count in report['histogram']), default=0) or 1
+    for label, count in report['histogram']:
+        print(f"  {label:>12} {count:>8} {'#' * int(40 * count / peak)}")
+
+    c = report['consistency']
+    print(f"\nCohérence des soldes: {'OK' if c['consistent'] else 'ÉCHEC'}")
+    print(f"  Comptes vérifiés: {c['accounts_checked']}   Écarts: {len(c['mismatched_accounts'])}   "
+          f"Soldes négatifs: {c['negative_balances']}")
+    print(f"  Crédits grand livre/annoncés: {c['ledger_credits']:,.2f} / {c['reported_credits']:,.2f}")
+    print(f"  Débits grand livre/annoncés: {c['ledger_debits']:,.2f} / {c['reported_debits']:,.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge concurrent sur une base SQLite partagée")
+    parser.add_argument('--db', default='load_test.db', help="Base cible (générée si absente)")
+    parser.add_argument('--profile', default='10k', choices=sorted(PROFILES),
+                        help="Volumétrie utilisée si la base doit être générée")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help="Threads par processus")
+    parser.add_argument('--duration', type=float, default=30.0, help="Durée du test en secondes")
+    parser.add_argument('--ops', type=int, default=0, help="Nombre maximal d'opérations par thread")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Poids des opérations")
+    parser.add_argument('--hot-accounts', type=int, default=0,
+                        help="Limite les opérations aux N premiers comptes pour accroître la contention")
+    parser.add_argument('--busy-timeout', type=int, help="PRAGMA busy_timeout (ms) par connexion")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Fichier JSON où écrire le rapport")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    db_path = os.path.abspath(args.db)
+    if not os.path.exists(db_path):
+        generator = BankDataGenerator(db_path, seed=args.seed)
+        try:
+            generator.run(**PROFILES[args.profile])
+        finally:
+            generator.close()
+
+    balances_before, max_id_before = snapshot_balances(db_path)
+    iban_ids = sorted(balances_before)
+    if args.hot_accounts:
+        iban_ids = iban_ids[:max(2, args.hot_accounts)]
+    if len(iban_ids) < 2:
+        print("Il faut au moins deux comptes pour le test de charge")
+        return 2
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    start_event = ctx.Event()
+    processes = [
+        ctx.Process(target=worker_process, args=(
+            i, db_path, iban_ids, mix, args.threads, args.duration, args.ops,
+            args.seed, args.busy_timeout, start_event, queue
+        ))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    # Tous les processus démarrent ensemble une fois leurs connexions ouvertes
+    time.sleep(1.0)
+    started = time.perf_counter()
+    start_event.set()
+    results = [queue.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    tally = {'credits': 0.0, 'debits': 0.0}
+    merged = {}
+    for result in results:
+        for key in tally:
+            tally[key] += result['tally'][key]
+        for name, stats in result['stats'].items():
+            op = merged.setdefault(name, new_op_stats())
+            for key in ('count', 'errors', 'locked', 'rejected'):
+                op[key] += stats[key]
+            op['last_error'] = stats['last_error'] or op['last_error']
+            op['latencies'].extend(stats['latencies'])
+
+    all_latencies = []
+    operations = {}
+    for name in OPERATIONS:
+        if name not in merged:
+            continue
+        op = merged[name]
+        latencies = sorted(op['latencies'])
+        all_latencies.extend(latencies)
+        operations[name] = {
+            'count': op['count'],
+            'ops_per_sec': round(op['count'] / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+            'errors': op['errors'],
+            'locked': op['locked'],
+            'rejected': op['rejected'],
+            'last_error': op['last_error']
+        }
+
+    total_ops = sum(op['count'] for op in operations.values())
+    report = {
+        'processes': args.processes,
+        'threads': args.threads,
+        'mix': mix,
+        'elapsed': round(elapsed, 3),
+        'total_ops': total_ops,
+        'throughput': round(total_ops / elapsed, 2),
+        'total_locked': sum(op['locked'] for op in operations.values()),
+        'operations': operations,
+        'histogram': histogram(all_latencies),
+        'consistency': check_consistency(db_path, balances_before, max_id_before, tally)
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    return 0 if report['consistency']['consistent'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
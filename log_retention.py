@@ -0,0 +1,183 @@
+import csv
+import gzip
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Politique par défaut: 90 jours en ligne, le reste archivé par mois
+DEFAULT_RETENTION_DAYS = 90
+ARCHIVE_MODES = ('table', 'file')
+DEFAULT_ARCHIVE_DIR = os.path.join("archives", "activity_logs")
+ARCHIVE_COLUMNS = ('id', 'user_id', 'action', 'details', 'ip_address', 'created_at')
+
+
+class RetentionError(Exception):
+    """Erreur lors de l'archivage des logs d'activité"""
+    pass
+
+
+class ActivityLogRetention:
+    """Archive les logs d'activité anciens par mois et conserve leurs comptes journaliers par action"""
+
+    def __init__(self, db_name: str = "bank_database.db", retention_days: int = DEFAULT_RETENTION_DAYS,
+                 archive_mode: str = 'table', archive_dir: str = DEFAULT_ARCHIVE_DIR):
+        """
+        Args:
+            db_name: Chemin de la base de données
+            retention_days: Nombre de jours conservés dans activity_logs
+            archive_mode: 'table' (tables activity_logs_archive_AAAA_MM) ou 'file' (CSV gzip par mois)
+            archive_dir: Répertoire des archives en mode 'file'
+        """
+        if archive_mode not in ARCHIVE_MODES:
+            raise ValueError(f"Mode d'archivage inconnu: {archive_mode}")
+        self.db_path = os.path.abspath(db_name)
+        self.retention_days = retention_days
+        self.archive_mode = archive_mode
+        self.archive_dir = archive_dir
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        try:
+            with self.conn:
+                self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS activity_log_daily_summary (
+                    day DATE NOT NULL,
+                    action TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, action)
+                )''')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_activity_logs_created ON activity_logs (created_at)')
+        except sqlite3.Error as e:
+            raise RetentionError(f"Erreur lors de la création des tables d'archivage: {str(e)}")
+
+    def cutoff(self, now: datetime = None) -> str:
+        """Horodatage (UTC) avant lequel les logs sont archivés"""
+        now = now or datetime.now(timezone.utc)
+        return (now - timedelta(days=self.retention_days)).strftime('%Y-%m-%d 00:00:00')
+
+    def compact(self, now: datetime = None) -> Dict[str, int]:
+        """
+        Archive les logs antérieurs à la période de rétention, un mois par transaction
+        Returns:
+            Dict[str, int]: Nombre de logs archivés par mois ('AAAA_MM')
+        """
+        cutoff = self.cutoff(now)
+        try:
+            months = [row[0] for row in self.conn.execute('''
+            SELECT DISTINCT strftime('%Y_%m', created_at) FROM activity_logs
+            WHERE created_at < ?
+            ORDER BY 1
+            ''', (cutoff,))]
+        except sqlite3.Error as e:
+            raise RetentionError(f"Erreur lors de la lecture des logs à archiver: {str(e)}")
+
+        archived = {}
+        for month in months:
+            year, month_number = (int(part) for part in month.split('_'))
+            start = f"{year:04d}-{month_number:02d}-01 00:00:00"
+            next_month = datetime(year + month_number // 12, month_number % 12 + 1, 1)
+            end = min(next_month.strftime('%Y-%m-%d %H:%M:%S'), cutoff)
+            archived[month] = self._archive_range(month, start, end)
+            logger.info(f"Logs d'activité archivés pour {month}: {archived[month]}")
+        return archived
+
+    def _archive_range(self, month: str, start: str, end: str) -> int:
+        """Résume, archive puis supprime les logs de [start, end)"""
+        where = 'created_at >= ? AND created_at < ?'
+        try:
+            if self.archive_mode == 'file':
+                # Le fichier est écrit avant la suppression: une interruption peut dupliquer, jamais perdre
+                self._append_to_file(month, where, (start, end))
+
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute(f'''
+                INSERT INTO activity_log_daily_summary (day, action, count)
+                SELECT date(created_at), action, COUNT(*) FROM activity_logs
+                WHERE {where}
+                GROUP BY date(created_at), action
+                ON CONFLICT (day, action) DO UPDATE SET count = count + excluded.count
+                ''', (start, end))
+
+                if self.archive_mode == 'table':
+                    table = f"activity_logs_archive_{month}"
+                    cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY,
+                        user_id INTEGER NOT NULL,
+                        action TEXT NOT NULL,
+                        details TEXT,
+                        ip_address TEXT,
+                        created_at TIMESTAMP
+                    )''')
+                    cursor.execute(f'''
+                    INSERT OR IGNORE INTO {table} ({', '.join(ARCHIVE_COLUMNS)})
+                    SELECT {', '.join(ARCHIVE_COLUMNS)} FROM activity_logs WHERE {where}
+                    ''', (start, end))
+
+                cursor.execute(f'DELETE FROM activity_logs WHERE {where}', (start, end))
+                return cursor.rowcount
+        except (sqlite3.Error, OSError) as e:
+            raise RetentionError(f"Erreur lors de l'archivage des logs de {month}: {str(e)}")
+
+    def _append_to_file(self, month: str, where: str, params: tuple) -> None:
+        """Ajoute les logs de la période au fichier CSV gzip du mois"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"activity_logs_{month}.csv.gz")
+        new_file = not os.path.exists(path)
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM activity_logs WHERE {where} ORDER BY id", params
+        )
+        # Chaque compactage ajoute un membre gzip: le fichier reste lisible d'un seul tenant
+        with gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(ARCHIVE_COLUMNS)
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                writer.writerows(tuple(row) for row in rows)
+
+    def get_daily_counts(self, start_day: str, end_day: str) -> List[Dict]:
+        """
+        Comptes journaliers par action, des archives résumées et des logs en ligne
+        Args:
+            start_day: Premier jour inclus ('YYYY-MM-DD')
+            end_day: Dernier jour inclus ('YYYY-MM-DD')
+        """
+        try:
+            cursor = self.conn.execute('''
+            SELECT day, action, SUM(count) AS count FROM (
+                SELECT day, action, count FROM activity_log_daily_summary
+                WHERE day >= ? AND day <= ?
+                UNION ALL
+                SELECT date(created_at) AS day, action, COUNT(*) AS count FROM activity_logs
+                WHERE created_at >= ? AND created_at < date(?, '+1 day')
+                GROUP BY day, action
+            )
+            GROUP BY day, action
+            ORDER BY day, action
+            ''', (start_day, end_day, start_day, end_day))
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            raise RetentionError(f"Erreur lors du calcul des comptes journaliers: {str(e)}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def compact_activity_logs(db_name: str, retention_days: int = DEFAULT_RETENTION_DAYS,
+                          archive_mode: str = 'table') -> Dict[str, int]:
+    """Tâche planifiée: applique la politique de rétention des logs d'activité"""
+    retention = ActivityLogRetention(db_name, retention_days, archive_mode)
+    try:
+        return retention.compact()
+    finally:
+        retention.close()
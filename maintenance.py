@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from database import BankDatabase, DatabaseError
+from log_retention import compact_activity_logs
+from receipt_store import collect_receipt_garbage
+from session_store import get_session_store
+
+logger = logging.getLogger(__name__)
+
+# Heure d'exécution par défaut des tâches de fin de journée
+DEFAULT_RUN_AT = "23:55"
+# Délai avant de relancer une tâche en échec, doublé à chaque échec jusqu'au maximum
+DEFAULT_RETRY_DELAY = 300.0
+MAX_RETRY_DELAY = 3600.0
+
+
+class DailyJobScheduler:
+    """Exécute des tâches de maintenance une fois par jour, dans un thread en arrière-plan"""
+
+    def __init__(self, run_at: str = DEFAULT_RUN_AT, poll_interval: float = 60.0,
+                 retry_delay: float = DEFAULT_RETRY_DELAY):
+        """
+        Args:
+            run_at: Heure (HH:MM) à partir de laquelle les tâches du jour sont lancées
+            poll_interval: Période de vérification en secondes
+            retry_delay: Délai (secondes) avant de relancer une tâche en échec
+        """
+        self.run_at = datetime.strptime(run_at, "%H:%M").time()
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._jobs: Dict[str, Callable[[], None]] = {}
+        # Dernier jour où la tâche a réussi
+        self._last_run: Dict[str, str] = {}
+        # Tâches en échec: (nombre d'échecs consécutifs, prochaine tentative)
+        self._failures: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, job: Callable[[], None]) -> None:
+        """Ajoute une tâche quotidienne"""
+        with self._lock:
+            self._jobs[name] = job
+
+    def run_pending(self, now: datetime = None) -> None:
+        """
+        Lance les tâches qui n'ont pas encore réussi aujourd'hui, une fois l'heure passée.
+        Une tâche en échec est relancée après un délai qui double à chaque échec
+        """
+        now = now or datetime.now()
+        if now.time() < self.run_at:
+            return
+        today = now.strftime('%Y-%m-%d')
+        with self._lock:
+            pending = [
+                (name, job) for name, job in self._jobs.items()
+                if self._last_run.get(name) != today
+                and (name not in self._failures or self._failures[name][1] <= now)
+            ]
+        for name, job in pending:
+            try:
+                job()
+            except Exception as e:
+                with self._lock:
+                    failures = self._failures.get(name, (0, now))[0] + 1
+                    delay = min(self.retry_delay * 2 ** (failures - 1), MAX_RETRY_DELAY)
+                    self._failures[name] = (failures, now + timedelta(seconds=delay))
+                logger.error(f"Échec de la tâche de maintenance '{name}' "
+                             f"(nouvelle tentative dans {int(delay)} s): {str(e)}")
+                continue
+            logger.info(f"Tâche de maintenance '{name}' exécutée")
+            with self._lock:
+                self._last_run[name] = today
+                self._failures.pop(name, None)
+
+    def start(self) -> None:
+        """Démarre le thread de vérification"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="daily-maintenance", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.run_pending()
+
+    def stop(self) -> None:
+        """Arrête le thread de vérification"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def write_balance_snapshots(db_name: str) -> None:
+    """Tâche de fin de journée: instantané de solde des comptes mouvementés"""
+    db = BankDatabase(db_name)
+    try:
+        db.write_daily_balance_snapshots()
+    except DatabaseError as e:
+        logger.error(f"Instantanés de solde impossibles: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+_schedulers: Dict[str, DailyJobScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_maintenance_scheduler(db_name: str = "bank_database.db") -> DailyJobScheduler:
+    """Retourne le planificateur de maintenance du processus pour une base (démarré au premier appel)"""
+    db_path = os.path.abspath(db_name)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(db_path)
+        if scheduler is None:
+            scheduler = DailyJobScheduler()
+            scheduler.register('balance_snapshots', lambda: write_balance_snapshots(db_path))
+            scheduler.register('activity_log_compaction', lambda: compact_activity_logs(db_path))
+            scheduler.register('session_purge', lambda: get_session_store(db_path).purge_expired())
+            scheduler.register('receipt_store_gc', lambda: collect_receipt_garbage(db_path))
+            scheduler.start()
+            _schedulers[db_path] = scheduler
+        return scheduler
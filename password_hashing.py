@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "pbkdf2_sha256"
+# Durée cible d'un hachage; le nombre d'itérations est calibré une fois par processus
+TARGET_SECONDS = 0.25
+MIN_ITERATIONS = 100_000
+MAX_ITERATIONS = 5_000_000
+SALT_BYTES = 16
+
+# Pool de vérification: quelques threads (pbkdf2_hmac libère le GIL) et une file bornée
+MAX_WORKERS = max(2, min(4, os.cpu_count() or 1))
+MAX_PENDING = MAX_WORKERS * 8
+DEFAULT_TIMEOUT = 10.0
+
+
+class PasswordHashingBusy(Exception):
+    """Trop de calculs de mot de passe en attente"""
+    pass
+
+
+_iterations: Optional[int] = None
+_calibration_lock = threading.Lock()
+_dummy_hash: Optional[str] = None
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="password-hash")
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+
+
+def calibrate(target_seconds: float = TARGET_SECONDS) -> int:
+    """Mesure la machine et retourne le nombre d'itérations PBKDF2 pour la durée cible"""
+    sample = 20_000
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac('sha256', b'calibration', b'0' * SALT_BYTES, sample)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    iterations = int(sample * target_seconds / elapsed)
+    return max(MIN_ITERATIONS, min(MAX_ITERATIONS, iterations))
+
+
+def get_iterations() -> int:
+    """Nombre d'itérations courant (calibré au premier appel)"""
+    global _iterations
+    if _iterations is None:
+        with _calibration_lock:
+            if _iterations is None:
+                _iterations = calibrate()
+                logger.info(f"Hachage des mots de passe: {ALGORITHM}, {_iterations} itérations")
+    return _iterations
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+
+def _hash(password: str) -> str:
+    iterations = get_iterations()
+    salt = secrets.token_bytes(SALT_BYTES)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(_pbkdf2(password, salt, iterations))}"
+
+
+def is_legacy_hash(stored_hash: str) -> bool:
+    """Indique un ancien hachage SHA-256 hexadécimal sans sel"""
+    return '$' not in stored_hash and len(stored_hash) == 64
+
+
+def _verify(password: str, stored_hash: str) -> bool:
+    if is_legacy_hash(stored_hash):
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, stored_hash)
+    try:
+        algorithm, iterations, salt, expected = stored_hash.split('$')
+        if algorithm != ALGORITHM:
+            return False
+        candidate = _pbkdf2(password, base64.b64decode(salt), int(iterations))
+        return hmac.compare_digest(candidate, base64.b64decode(expected))
+    except (ValueError, TypeError):
+        return False
+
+
+def _run(func, *args, timeout: float = DEFAULT_TIMEOUT):
+    """Exécute un calcul dans le pool borné et attend son résultat"""
+    if not _pending.acquire(timeout=timeout):
+        raise PasswordHashingBusy("Service d'authentification surchargé, réessayez")
+    try:
+        future = _executor.submit(func, *args)
+    except Exception:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future.result(timeout=timeout)
+
+
+def hash_password(password: str) -> str:
+    """Hache un mot de passe (PBKDF2-SHA256 salé, coût calibré) dans le pool de calcul"""
+    return _run(_hash, password)
+
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """Vérifie un mot de passe contre un hachage PBKDF2 ou un ancien SHA-256, dans le pool de calcul"""
+    if not stored_hash:
+        return False
+    return _run(_verify, password, stored_hash)
+
+
+def get_dummy_hash() -> str:
+    """
+    Hachage factice au coût courant, vérifié à la place de celui d'un utilisateur inexistant:
+    la durée de la vérification ne révèle pas si le nom d'utilisateur existe
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        get_iterations()  # calibration hors du verrou (non réentrant)
+        with _calibration_lock:
+            if _dummy_hash is None:
+                _dummy_hash = _hash(secrets.token_urlsafe(16))
+    return _dummy_hash
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """Indique si le hachage doit être recalculé (ancien format ou coût inférieur au coût courant)"""
+    if is_legacy_hash(stored_hash):
+        return True
+    try:
+        algorithm, iterations, _, _ = stored_hash.split('$')
+        # Marge sur le coût: la calibration varie légèrement d'un démarrage à l'autre
+        return algorithm != ALGORITHM or int(iterations) < get_iterations() * 0.8
+    except ValueError:
+        return True
+
+
+# Calibration lancée au chargement du module, sans bloquer le démarrage
+_executor.submit(get_iterations)
@@ -0,0 +1,122 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import qrcode
+from reportlab.lib import colors
+from reportlab.platypus import Flowable
+
+# Taille du cache des matrices (une entrée par contenu distinct)
+QR_CACHE_SIZE = 1024
+# Masque fixe: le choix automatique évalue les 8 masques et représente ~80 % du calcul.
+# Tout masque donne un QR code valide (il est inscrit dans les informations de format)
+DEFAULT_MASK_PATTERN = 0
+
+ERROR_CORRECTION_LEVELS = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_matrix(payload: str, error_correction: str = 'L', border: int = 2,
+              mask_pattern: Optional[int] = DEFAULT_MASK_PATTERN) -> Tuple[Tuple[bool, ...], ...]:
+    """
+    Calcule la matrice des modules d'un QR code (bordure incluse)
+    Args:
+        payload: Contenu encodé
+        error_correction: Niveau de correction ('L', 'M', 'Q' ou 'H')
+        border: Largeur de la marge blanche, en modules
+        mask_pattern: Masque 0-7, ou None pour le choix automatique (plus lent)
+    Returns:
+        Tuple: Lignes de modules (True = module foncé), non modifiables car partagées par le cache
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=ERROR_CORRECTION_LEVELS[error_correction],
+        border=border,
+        mask_pattern=mask_pattern,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return tuple(tuple(row) for row in qr.get_matrix())
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_rects(payload: str, error_correction: str = 'L', border: int = 2) -> Tuple[int, Tuple[Tuple[int, int, int, int], ...]]:
+    """
+    Décompose les modules foncés en rectangles: segments horizontaux, fusionnés
+    verticalement lorsqu'ils se répètent à l'identique sur les lignes suivantes
+    Returns:
+        Tuple: (nombre de modules par côté, rectangles (ligne, colonne, largeur, hauteur))
+    """
+    matrix = qr_matrix(payload, error_correction, border)
+    open_rects = {}  # (colonne, largeur) -> [ligne de début, hauteur]
+    rects: List[Tuple[int, int, int, int]] = []
+    for row_index, row in enumerate(matrix):
+        segments = set()
+        start = None
+        for col_index, dark in enumerate(row + (False,)):
+            if dark and start is None:
+                start = col_index
+            elif not dark and start is not None:
+                segments.add((start, col_index - start))
+                start = None
+        for key in list(open_rects):
+            if key in segments:
+                open_rects[key][1] += 1
+            else:
+                top, height = open_rects.pop(key)
+                rects.append((top, key[0], key[1], height))
+        for key in segments - open_rects.keys():
+            open_rects[key] = [row_index, 1]
+    rects.extend((top, col, width, height) for (col, width), (top, height) in open_rects.items())
+    return len(matrix), tuple(sorted(rects))
+
+
+def draw_qr_reportlab(canv, payload: str, x: float, y: float, size: float,
+                      error_correction: str = 'L', border: int = 2, color=colors.black) -> None:
+    """Dessine un QR code vectoriel sur un canvas reportlab ((x, y) = coin inférieur gauche)"""
+    modules, rects = qr_rects(payload, error_correction, border)
+    module = size / modules
+    canv.saveState()
+    canv.setFillColor(color)
+    # Un seul chemin rempli pour tous les rectangles
+    path = canv.beginPath()
+    for row, col, width, height in rects:
+        path.rect(x + col * module, y + size - (row + height) * module, width * module, height * module)
+    canv.drawPath(path, stroke=0, fill=1)
+    canv.restoreState()
+
+
+def draw_qr_fpdf(pdf, payload: str, x: float, y: float, size: float,
+                 error_correction: str = 'L', border: int = 2, color=(0, 0, 0)) -> None:
+    """Dessine un QR code vectoriel sur une page FPDF ((x, y) = coin supérieur gauche, unités du document)"""
+    modules, rects = qr_rects(payload, error_correction, border)
+    module = size / modules
+    with pdf.local_context(fill_color=color):
+        for row, col, width, height in rects:
+            pdf.rect(x + col * module, y + row * module, width * module, height * module, style='F')
+
+
+class QRCodeFlowable(Flowable):
+    """QR code vectoriel à insérer dans un document platypus"""
+
+    def __init__(self, payload: str, size: float, error_correction: str = 'L', border: int = 2):
+        super().__init__()
+        self.payload = payload
+        self.size = size
+        self.error_correction = error_correction
+        self.border = border
+        self.width = self.height = size
+        self.hAlign = 'CENTER'
+
+    def draw(self) -> None:
+        draw_qr_reportlab(self.canv, self.payload, 0, 0, self.size, self.error_correction, self.border)
+
+
+def qr_cache_info() -> dict:
+    """Statistiques du cache des matrices"""
+    info = qr_matrix.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize}
@@ -0,0 +1,169 @@
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+# Par nom d'utilisateur: 5 essais d'affilée, puis 1 toutes les 30 secondes
+USERNAME_CAPACITY = 5
+USERNAME_REFILL_PER_SECOND = 1 / 30
+# Par adresse IP: 20 essais d'affilée, puis 1 toutes les 3 secondes
+IP_CAPACITY = 20
+IP_REFILL_PER_SECOND = 1 / 3
+# Nombre maximal de clés suivies par limiteur (les moins récentes sont évincées)
+DEFAULT_MAX_KEYS = 10_000
+
+
+class TokenBucketLimiter:
+    """Seaux à jetons en mémoire, un par clé, bornés en nombre avec éviction LRU"""
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = DEFAULT_MAX_KEYS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            capacity: Nombre d'essais autorisés d'affilée
+            refill_per_second: Jetons regagnés par seconde
+            max_keys: Nombre maximal de seaux conservés
+            clock: Horloge monotone (remplaçable pour les mesures)
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._clock = clock
+        # clé -> (jetons restants, instant de la dernière mise à jour)
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated_at) * self.refill_per_second)
+
+    def peek(self, key: str) -> bool:
+        """Indique si un essai serait accepté, sans consommer de jeton"""
+        with self._lock:
+            return self._tokens(key, self._clock()) >= 1
+
+    def consume(self, key: str) -> bool:
+        """
+        Consomme un jeton pour la clé
+        Returns:
+            bool: True si l'essai est autorisé
+        """
+        now = self._clock()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+                self.allowed += 1
+            else:
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            return allowed
+
+    def retry_after(self, key: str) -> float:
+        """Secondes avant qu'un jeton soit de nouveau disponible"""
+        with self._lock:
+            missing = 1 - self._tokens(key, self._clock())
+        return max(0.0, missing / self.refill_per_second)
+
+    def reset(self, key: str) -> None:
+        """Remet le seau d'une clé à sa capacité"""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'keys': len(self._buckets),
+                'max_keys': self.max_keys,
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+                'evictions': self.evictions,
+            }
+
+
+class LoginRateLimiter:
+    """Limitation des tentatives de connexion par nom d'utilisateur et par adresse IP"""
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.by_username = TokenBucketLimiter(USERNAME_CAPACITY, USERNAME_REFILL_PER_SECOND, max_keys)
+        self.by_ip = TokenBucketLimiter(IP_CAPACITY, IP_REFILL_PER_SECOND, max_keys)
+
+    def check(self, username: str, ip_address: str) -> Optional[float]:
+        """
+        Enregistre une tentative de connexion
+        Returns:
+            Optional[float]: None si la tentative est autorisée, sinon le délai d'attente en secondes
+        """
+        username_key = (username or "").strip().lower()
+        # Un jeton n'est consommé que si les deux seaux en ont un: un refus IP n'épuise pas le compte
+        if not self.by_ip.peek(ip_address):
+            self.by_ip.consume(ip_address)
+            return self.by_ip.retry_after(ip_address)
+        if not self.by_username.consume(username_key):
+            return self.by_username.retry_after(username_key)
+        self.by_ip.consume(ip_address)
+        return None
+
+    def reset_username(self, username: str) -> None:
+        """Rend ses essais à un utilisateur après une connexion réussie"""
+        self.by_username.reset((username or "").strip().lower())
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Compteurs par limiteur, pour le tableau de bord administrateur"""
+        return {'username': self.by_username.stats(), 'ip': self.by_ip.stats()}
+
+
+def resolve_client_address(peer: Optional[str], forwarded_for: Optional[str] = None,
+                           trusted_proxies: Iterable[str] = ()) -> Optional[str]:
+    """
+    Adresse du client servant de clé de limitation.
+    X-Forwarded-For n'est lu que si la connexion vient d'un proxy de confiance: la chaîne est
+    alors parcourue de droite à gauche et le premier saut non fiable est retenu (les sauts de
+    gauche sont fournis par le client et peuvent être falsifiés)
+    Args:
+        peer: Adresse de la connexion TCP
+        forwarded_for: En-tête X-Forwarded-For
+        trusted_proxies: Adresses ou réseaux (CIDR) des proxys inverses de confiance
+    Returns:
+        Optional[str]: Adresse retenue, ou None si l'adresse de connexion est inconnue
+    """
+    if not peer:
+        return None
+    networks = [ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies]
+
+    def is_trusted(address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in networks)
+
+    if not forwarded_for or not is_trusted(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+_login_limiter: Optional[LoginRateLimiter] = None
+_login_limiter_lock = threading.Lock()
+
+
+def get_login_rate_limiter() -> LoginRateLimiter:
+    """Retourne le limiteur de connexions du processus"""
+    global _login_limiter
+    with _login_limiter_lock:
+        if _login_limiter is None:
+            _login_limiter = LoginRateLimiter()
+        return _login_limiter
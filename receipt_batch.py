@@ -0,0 +1,159 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import IO, Callable, Dict, List, Optional
+
+from PyPDF2 import PdfMerger
+
+from database import BankDatabase
+from receipt_store import ReceiptStore, get_receipt_store
+
+logger = logging.getLogger(__name__)
+
+BATCH_FORMATS = ('zip', 'pdf')
+# Nombre de reçus rendus par tâche envoyée à un processus
+DEFAULT_CHUNK_SIZE = 25
+# En dessous de ce nombre de reçus, le coût de démarrage du pool n'est pas rentable
+MIN_PARALLEL_RECEIPTS = 20
+DEFAULT_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Options transmises à generate_receipt_pdf
+RECEIPT_OPTIONS = ('company_name', 'receipt_title', 'additional_notes', 'include_signature',
+                   'include_qr', 'logo_bytes')
+
+# Connexion et stockage des reçus propres à chaque processus du pool (ouverts par _init_worker)
+_worker_db: Optional[BankDatabase] = None
+_worker_store: Optional[ReceiptStore] = None
+
+
+def _init_worker(db_name: str) -> None:
+    global _worker_db, _worker_store
+    _worker_db = BankDatabase(db_name)
+    _worker_store = get_receipt_store(db_name)
+
+
+def _render(db: BankDatabase, store: ReceiptStore, transaction_ids: List[int], options: Dict) -> List[tuple]:
+    """
+    Rend les reçus d'un lot de transactions
+    Returns:
+        List[tuple]: (ID, octets du PDF ou None si la transaction n'existe pas), dans l'ordre reçu
+    """
+    contexts = db.get_transaction_contexts(transaction_ids)
+    rendered = []
+    for transaction_id in transaction_ids:
+        context = contexts.get(transaction_id)
+        if context is None:
+            rendered.append((transaction_id, None))
+            continue
+        # Les reçus déjà rendus avec les mêmes options sont relus depuis le stockage
+        pdf_bytes = store.get_or_render(context['transaction'], context['client'], context['iban'], options)
+        rendered.append((transaction_id, pdf_bytes))
+    return rendered
+
+
+def _render_chunk(transaction_ids: List[int], options: Dict) -> List[tuple]:
+    """Tâche exécutée dans un processus du pool"""
+    return _render(_worker_db, _worker_store, transaction_ids, options)
+
+
+def _iter_rendered(chunks: List[List[int]], options: Dict, db_name: str, max_workers: int):
+    """Produit les reçus lot par lot, dans l'ordre, avec au plus 2 lots en attente par processus"""
+    if max_workers <= 1 or sum(len(chunk) for chunk in chunks) < MIN_PARALLEL_RECEIPTS:
+        db = BankDatabase(db_name)
+        store = get_receipt_store(db_name)
+        try:
+            for chunk in chunks:
+                yield _render(db, store, chunk, options)
+        finally:
+            db.close()
+        return
+
+    # spawn: pas de fork d'un processus qui a déjà des threads (Streamlit, logger d'activité)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=_init_worker, initargs=(db_name,)) as executor:
+        pending = deque()
+        remaining = iter(chunks)
+        for chunk in remaining:
+            pending.append(executor.submit(_render_chunk, chunk, options))
+            if len(pending) >= max_workers * 2:
+                break
+        while pending:
+            rendered = pending.popleft().result()
+            for chunk in remaining:
+                pending.append(executor.submit(_render_chunk, chunk, options))
+                break
+            yield rendered
+
+
+def generate_receipts_batch(transaction_ids: List[int], options: Dict = None,
+                            db_name: str = "bank_database.db", output_format: str = 'zip',
+                            destination: IO[bytes] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE,
+                            progress_callback: Callable[[int, int], None] = None) -> Dict:
+    """
+    Génère les reçus de plusieurs transactions en parallèle et les regroupe
+    Args:
+        transaction_ids: IDs des transactions, dans l'ordre voulu
+        options: Paramètres de generate_receipt_pdf (company_name, receipt_title,
+            additional_notes, include_signature, include_qr, logo_bytes)
+        db_name: Chemin de la base de données
+        output_format: 'zip' (un PDF par transaction) ou 'pdf' (un seul PDF fusionné)
+        destination: Fichier binaire de sortie (par défaut un fichier temporaire en mémoire puis sur disque)
+        max_workers: Nombre de processus de rendu
+        chunk_size: Nombre de reçus par tâche
+        progress_callback: Appelée avec (reçus traités, total) après chaque lot
+    Returns:
+        Dict: {'file' (positionné au début, None si aucun reçu n'a été rendu), 'count', 'missing'}
+    """
+    if output_format not in BATCH_FORMATS:
+        raise ValueError(f"Format de lot inconnu: {output_format}")
+    options = dict(options or {})
+    unknown = set(options) - set(RECEIPT_OPTIONS)
+    if unknown:
+        raise ValueError(f"Options de reçu inconnues: {', '.join(sorted(unknown))}")
+    options.setdefault('company_name', "Digital Financial Service")
+
+    ids = [int(transaction_id) for transaction_id in transaction_ids]
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    output = destination if destination is not None else tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    db_path = os.path.abspath(db_name)
+
+    count, done, missing = 0, 0, []
+    archive = zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) if output_format == 'zip' else None
+    merger = PdfMerger() if output_format == 'pdf' else None
+    try:
+        for rendered in _iter_rendered(chunks, options, db_path, max_workers):
+            for transaction_id, pdf_bytes in rendered:
+                if pdf_bytes is None:
+                    missing.append(transaction_id)
+                elif archive is not None:
+                    archive.writestr(f"recu_{transaction_id}.pdf", pdf_bytes)
+                    count += 1
+                else:
+                    merger.append(BytesIO(pdf_bytes))
+                    count += 1
+            done += len(rendered)
+            if progress_callback:
+                progress_callback(done, len(ids))
+        if merger is not None and count:
+            merger.write(output)
+    finally:
+        if archive is not None:
+            archive.close()
+        if merger is not None:
+            merger.close()
+
+    if missing:
+        logger.warning(f"Reçus par lot: {len(missing)} transaction(s) introuvable(s)")
+    if not count:
+        # Aucun reçu: pas de fichier vide à proposer au téléchargement
+        if destination is None:
+            output.close()
+        return {'file': None, 'count': 0, 'missing': missing}
+    output.seek(0)
+    return {'file': output, 'count': count, 'missing': missing}
@@ -5,10 +5,14 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Tabl
 from reportlab.lib.units import cm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from dataclasses import dataclass
 from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping
 import os
-import qrcode
+import threading
 from io import BytesIO
+from qr_rendering import QRCodeFlowable
 
 # Enregistrement des polices (à faire une seule fois dans votre application)
 try:
@@ -17,9 +21,105 @@ try:
 except:
     # Fallback aux polices standard si les polices personnalisées ne sont pas disponibles
     pass
+
+
+@dataclass(frozen=True)
+class ReceiptTheme:
+    """Styles, couleurs et styles de tableaux du reçu, construits une fois par processus (lecture seule)"""
+    styles: Mapping[str, ParagraphStyle]
+    colors: Mapping[str, colors.Color]
+    info_table_style: TableStyle
+    signature_table_style: TableStyle
+
+
+def _build_receipt_theme() -> ReceiptTheme:
+    palette = {
+        'text': colors.HexColor('#333333'),
+        'label': colors.HexColor('#555555'),
+        'accent': colors.HexColor('#3498db'),
+        'grid': colors.HexColor('#eeeeee'),
+        'footer': colors.HexColor('#7f8c8d'),
+    }
+
+    # Feuille privée: les styles partagés de getSampleStyleSheet ne sont jamais modifiés
+    sample = getSampleStyleSheet()
+    styles = {
+        'Title': sample['Title'],
+        'Heading4': sample['Heading4'],
+        'Italic': sample['Italic'],
+        'Normal': ParagraphStyle(
+            name='ReceiptNormal',
+            parent=sample['Normal'],
+            fontName='Helvetica',
+            textColor=palette['text']
+        ),
+        'Footer': ParagraphStyle(
+            name='Footer',
+            fontName='Helvetica',
+            fontSize=8,
+            leading=9,
+            alignment=1,
+            textColor=palette['footer']
+        ),
+    }
+
+    info_table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('TEXTCOLOR', (0, 0), (0, -1), palette['label']),
+        ('TEXTCOLOR', (1, 0), (1, -1), palette['text']),
+        ('GRID', (0, 0), (-1, -1), 0.5, palette['grid'])
+    ])
+
+    signature_table_style = TableStyle([
+        ('LINEABOVE', (1, 0), (1, 0), 0.5, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('TEXTCOLOR', (0, 0), (-1, -1), palette['label']),
+        ('LEFTPADDING', (0, 0), (0, -1), 0),
+        ('TOPPADDING', (1, 1), (1, 1), 0)
+    ])
+
+    return ReceiptTheme(
+        styles=MappingProxyType(styles),
+        colors=MappingProxyType(palette),
+        info_table_style=info_table_style,
+        signature_table_style=signature_table_style
+    )
+
+
+_receipt_theme = None
+_receipt_theme_lock = threading.Lock()
+
+
+def get_receipt_theme() -> ReceiptTheme:
+    """Retourne le thème des reçus du processus (construit au premier appel)"""
+    global _receipt_theme
+    if _receipt_theme is None:
+        with _receipt_theme_lock:
+            if _receipt_theme is None:
+                _receipt_theme = _build_receipt_theme()
+    return _receipt_theme
+
+
+RECEIPT_OUTPUTS = ('file', 'bytes')
+
+
+def receipt_file_path(transaction_id) -> str:
+    """Chemin d'enregistrement d'un reçu dans le dossier receipts"""
+    return f"receipts/receipt_{transaction_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
 def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name, 
                         logo_path=None, receipt_title="REÇU DE TRANSACTION", 
-                        additional_notes="", include_signature=True, include_qr=True):
+                        additional_notes="", include_signature=True, include_qr=True,
+                        output="file", logo_bytes=None, persist=False):
                         
     """
     Génère un reçu PDF professionnel avec QR code
@@ -36,17 +136,26 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
         qr_code: Booléen pour inclure ou non le QR code
         include_signature: Inclure une ligne de signature
         include_qr: Inclure un QR code de vérification
+        output: 'file' (écrit dans receipts/) ou 'bytes' (rendu en mémoire)
+        logo_bytes: Contenu du logo (prioritaire sur logo_path), sans fichier temporaire
+        persist: En mode 'bytes', enregistre aussi une copie dans receipts/
     
     Returns:
-        Chemin vers le fichier PDF généré
+        Chemin vers le fichier PDF généré, ou son contenu en mode 'bytes'
     """
-    # Créer le dossier de sortie
-    os.makedirs("receipts", exist_ok=True)
-    pdf_path = f"receipts/receipt_{transaction_data['id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    if output not in RECEIPT_OUTPUTS:
+        raise ValueError(f"Mode de sortie inconnu: {output}")
+
+    # Rendu en mémoire en mode 'bytes', sinon directement dans le fichier
+    pdf_path = None
+    if output == 'file':
+        os.makedirs("receipts", exist_ok=True)
+        pdf_path = receipt_file_path(transaction_data['id'])
+    buffer = BytesIO() if output == 'bytes' else None
     
     # Créer le document avec des marges plus modernes
     doc = SimpleDocTemplate(
-        pdf_path, 
+        buffer if buffer is not None else pdf_path, 
         pagesize=A4,
         leftMargin=1.5*cm,
         rightMargin=1.5*cm,
@@ -54,40 +163,19 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
         bottomMargin=1.5*cm
     )
     
-    # Styles personnalisés
-    styles = getSampleStyleSheet()
-    
-    # Modifier les styles existants ou ajouter des nouveaux
-    if 'Title' not in styles:
-        styles.add(ParagraphStyle(
-            name='Title',
-            fontName='Helvetica-Bold',
-            fontSize=16,
-            leading=20,
-            alignment=1,  # Centré
-            spaceAfter=12,
-            textColor=colors.HexColor('#2c3e50')
-        ))
-    
-    if 'Heading2' not in styles:
-        styles.add(ParagraphStyle(
-            name='Heading2',
-            fontName='Helvetica-Bold',
-            fontSize=12,
-            leading=15,
-            spaceAfter=6,
-            textColor=colors.HexColor('#3498db')
-        ))
-    
-    # Modifier le style Normal existant
-    styles['Normal'].fontName = 'Helvetica'
-    styles['Normal'].textColor = colors.HexColor('#333333')
+    # Styles précompilés, partagés par tous les reçus
+    theme = get_receipt_theme()
+    styles = theme.styles
     
     # Éléments du PDF
     elements = []
     
     # En-tête avec logo
-    if logo_path and os.path.exists(logo_path):
+    if logo_bytes:
+        logo = Image(BytesIO(logo_bytes), width=4*cm, height=2*cm)
+        elements.append(logo)
+        elements.append(Spacer(1, 0.5*cm))
+    elif logo_path and os.path.exists(logo_path):
         logo = Image(logo_path, width=4*cm, height=2*cm)
         elements.append(logo)
         elements.append(Spacer(1, 0.5*cm))
@@ -102,7 +190,7 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
         width="100%",
         thickness=1,
         lineCap='round',
-        color=colors.HexColor('#3498db'),
+        color=theme.colors['accent'],
         spaceAfter=0.5*cm
     ))
     
@@ -120,16 +208,7 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
     ]
     
     t = Table(transaction_info, colWidths=[3*cm, 12*cm])
-    t.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#555555')),
-        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#333333')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#eeeeee'))
-    ]))
+    t.setStyle(theme.info_table_style)
     
     elements.append(t)
     elements.append(Spacer(1, 0.5*cm))
@@ -145,16 +224,7 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
     ]
     
     t = Table(client_info, colWidths=[3*cm, 12*cm])
-    t.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#555555')),
-        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#333333')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#eeeeee'))
-    ]))
+    t.setStyle(theme.info_table_style)
     
     elements.append(t)
     elements.append(Spacer(1, 0.5*cm))
@@ -169,23 +239,9 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
         Montant: {formatted_amount} {iban_data['currency']}
         """
         
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=4,
-            border=2,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        img_bytes = BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        
-        qr_img = Image(img_bytes, width=3*cm, height=3*cm)
+        # QR code vectoriel (matrice mise en cache par contenu), sans image intermédiaire
         elements.append(Spacer(1, 0.5*cm))
-        elements.append(qr_img)
+        elements.append(QRCodeFlowable(qr_data, 3*cm))
         elements.append(Paragraph(
             "<i>Scannez ce code pour vérifier la transaction</i>",
             styles['Italic']
@@ -206,17 +262,7 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
             ["", "Pour " + company_name]
         ], colWidths=[10*cm, 5*cm])
         
-        signature_table.setStyle(TableStyle([
-            ('LINEABOVE', (1, 0), (1, 0), 0.5, colors.black),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#555555')),
-            ('LEFTPADDING', (0, 0), (0, -1), 0),
-            ('TOPPADDING', (1, 1), (1, 1), 0)
-        ]))
+        signature_table.setStyle(theme.signature_table_style)
         
         elements.append(signature_table)
     
@@ -228,15 +274,16 @@ def generate_receipt_pdf(transaction_data, client_data, iban_data, company_name,
     Ce document est une preuve officielle de transaction. Conservez-le précieusement.
     """
     
-    elements.append(Paragraph(footer_text, ParagraphStyle(
-        name='Footer',
-        fontName='Helvetica',
-        fontSize=8,
-        leading=9,
-        alignment=1,
-        textColor=colors.HexColor('#7f8c8d')
-    )))
+    elements.append(Paragraph(footer_text, styles['Footer']))
     
     # Générer le PDF
     doc.build(elements)
-    return pdf_path
+    if buffer is None:
+        return pdf_path
+
+    pdf_bytes = buffer.getvalue()
+    if persist:
+        os.makedirs("receipts", exist_ok=True)
+        with open(receipt_file_path(transaction_data['id']), "wb") as f:
+            f.write(pdf_bytes)
+    return pdf_bytes
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from database import BankDatabase
+from receipt_generator import generate_receipt_pdf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join("receipts", "store")
+LEGACY_RECEIPTS_DIR = "receipts"
+# À incrémenter à chaque changement de mise en page: les anciens reçus ne sont plus resservis
+RECEIPT_TEMPLATE_VERSION = 1
+# Versions non consultées depuis ce délai et remplacées par une version plus récente
+DEFAULT_GC_MAX_AGE_DAYS = 30
+# Les fichiers récents sans entrée d'index peuvent être en cours d'enregistrement
+UNTRACKED_GRACE_SECONDS = 3600
+
+_LEGACY_RECEIPT_NAME = re.compile(r'^receipt_(\d+)_(\d{8}_\d{6})\.pdf$')
+
+
+class ReceiptStoreError(Exception):
+    """Erreur du stockage des reçus"""
+    pass
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def receipt_key(transaction_data: Dict, client_data: Dict, iban_data: Dict, options: Dict) -> str:
+    """
+    Empreinte SHA-256 d'un reçu: données de la transaction, du client, du compte et options du modèle
+    Args:
+        options: Paramètres de generate_receipt_pdf (le logo est représenté par son empreinte)
+    """
+    options = dict(options)
+    logo_bytes = options.pop('logo_bytes', None)
+    if logo_bytes:
+        options['logo_sha256'] = hashlib.sha256(logo_bytes).hexdigest()
+    document = {
+        'template': RECEIPT_TEMPLATE_VERSION,
+        'transaction': transaction_data,
+        'client': client_data,
+        'iban': iban_data,
+        'options': options,
+    }
+    canonical = json.dumps(document, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ReceiptStore:
+    """
+    Reçus adressés par contenu: un reçu déjà rendu pour les mêmes données et options
+    est relu depuis le disque au lieu d'être régénéré (la date de génération imprimée
+    reste celle du premier rendu)
+    """
+
+    def __init__(self, db_name: str = "bank_database.db", store_dir: str = DEFAULT_STORE_DIR):
+        """
+        Args:
+            db_name: Chemin de la base de données (index des reçus)
+            store_dir: Répertoire des fichiers PDF, répartis par préfixe d'empreinte
+        """
+        self.db_path = os.path.abspath(db_name)
+        self.store_dir = os.path.abspath(store_dir)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        try:
+            with self.conn:
+                self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS receipt_store (
+                    content_hash TEXT PRIMARY KEY,
+                    transaction_id INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at TIMESTAMP NOT NULL,
+                    last_accessed TIMESTAMP NOT NULL
+                )''')
+                self.conn.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_receipt_store_transaction ON receipt_store (transaction_id, created_at)')
+        except sqlite3.Error as e:
+            raise ReceiptStoreError(f"Erreur lors de la création de l'index des reçus: {str(e)}")
+
+    def _path_for(self, content_hash: str) -> str:
+        return os.path.join(self.store_dir, content_hash[:2], f"{content_hash}.pdf")
+
+    def get_or_render(self, transaction_data: Dict, client_data: Dict, iban_data: Dict,
+                      options: Dict = None) -> bytes:
+        """
+        Retourne le reçu stocké pour ces données et options, ou le génère et le stocke
+        Args:
+            options: Paramètres de generate_receipt_pdf (company_name, receipt_title,
+                additional_notes, include_signature, include_qr, logo_bytes)
+        Returns:
+            bytes: Contenu du PDF
+        """
+        options = dict(options or {})
+        content_hash = receipt_key(transaction_data, client_data, iban_data, options)
+        pdf_bytes = self.get(content_hash)
+        if pdf_bytes is None:
+            pdf_bytes = generate_receipt_pdf(transaction_data, client_data, iban_data,
+                                             output="bytes", **options)
+            self._save(content_hash, transaction_data['id'], pdf_bytes)
+        self._record_issue(transaction_data['id'], self._path_for(content_hash), len(pdf_bytes))
+        return pdf_bytes
+
+    def _record_issue(self, transaction_id: int, path: str, size: int) -> None:
+        """Chaque reçu délivré (rendu ou relu) est compté dans la table documents"""
+        try:
+            with self._lock, self.conn:
+                BankDatabase.insert_document(self.conn, 'receipt', transaction_id, path, size)
+        except sqlite3.Error as e:
+            raise ReceiptStoreError(f"Erreur lors de l'enregistrement du reçu délivré: {str(e)}")
+
+    def get(self, content_hash: str) -> Optional[bytes]:
+        """Relit un reçu stocké (None si absent ou si son fichier a disparu)"""
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    'SELECT path FROM receipt_store WHERE content_hash=?', (content_hash,)).fetchone()
+            if row is not None:
+                with open(row['path'], 'rb') as f:
+                    pdf_bytes = f.read()
+                with self._lock, self.conn:
+                    self.conn.execute('UPDATE receipt_store SET last_accessed=? WHERE content_hash=?',
+                                      (_utc_now(), content_hash))
+                    self.hits += 1
+                return pdf_bytes
+        except FileNotFoundError:
+            logger.warning(f"Reçu stocké introuvable sur disque: {content_hash}")
+        except sqlite3.Error as e:
+            raise ReceiptStoreError(f"Erreur lors de la lecture du reçu stocké: {str(e)}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _save(self, content_hash: str, transaction_id: int, pdf_bytes: bytes) -> None:
+        """Écrit le fichier (remplacement atomique) puis l'entrée d'index"""
+        path = self._path_for(content_hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(pdf_bytes)
+            os.replace(temp_path, path)
+            now = _utc_now()
+            with self._lock, self.conn:
+                self.conn.execute('''
+                INSERT INTO receipt_store (content_hash, transaction_id, path, size, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash) DO UPDATE SET path=excluded.path, size=excluded.size,
+                    last_accessed=excluded.last_accessed
+                ''', (content_hash, transaction_id, path, len(pdf_bytes), now, now))
+        except (sqlite3.Error, OSError) as e:
+            raise ReceiptStoreError(f"Erreur lors de l'enregistrement du reçu: {str(e)}")
+
+    # ===== Nettoyage =====
+    def collect_garbage(self, max_age_days: int = DEFAULT_GC_MAX_AGE_DAYS) -> Dict[str, int]:
+        """
+        Supprime les versions orphelines:
+        - reçus de transactions supprimées;
+        - versions remplacées par une plus récente (données ou options modifiées) et non consultées depuis max_age_days;
+        - entrées dont le fichier a disparu, et fichiers sans entrée d'index
+        Returns:
+            Dict[str, int]: Nombre d'éléments supprimés par catégorie
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        removed = {'deleted_transactions': 0, 'superseded': 0, 'missing_files': 0, 'untracked_files': 0}
+        try:
+            with self._lock:
+                orphans = self.conn.execute('''
+                SELECT s.content_hash, s.path, 'deleted_transactions' AS reason FROM receipt_store s
+                WHERE NOT EXISTS (SELECT 1 FROM transactions t WHERE t.id = s.transaction_id)
+                UNION ALL
+                SELECT s.content_hash, s.path, 'superseded' FROM receipt_store s
+                WHERE s.last_accessed < ?
+                  AND EXISTS (SELECT 1 FROM transactions t WHERE t.id = s.transaction_id)
+                  AND EXISTS (
+                      SELECT 1 FROM receipt_store newer
+                      WHERE newer.transaction_id = s.transaction_id AND newer.created_at > s.created_at
+                  )
+                ''', (cutoff,)).fetchall()
+                tracked = {row['content_hash']: row['path'] for row in
+                           self.conn.execute('SELECT content_hash, path FROM receipt_store')}
+        except sqlite3.Error as e:
+            raise ReceiptStoreError(f"Erreur lors de la recherche des reçus orphelins: {str(e)}")
+
+        to_delete = []
+        for row in orphans:
+            to_delete.append(row['content_hash'])
+            tracked.pop(row['content_hash'], None)
+            removed[row['reason']] += 1
+            self._remove_file(row['path'])
+        for content_hash, path in tracked.items():
+            if not os.path.exists(path):
+                to_delete.append(content_hash)
+                removed['missing_files'] += 1
+
+        if os.path.isdir(self.store_dir):
+            known = set(tracked.values())
+            grace_limit = time.time() - UNTRACKED_GRACE_SECONDS
+            for directory, _, files in os.walk(self.store_dir):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    if path not in known and os.path.getmtime(path) < grace_limit:
+                        self._remove_file(path)
+                        removed['untracked_files'] += 1
+
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany('DELETE FROM receipt_store WHERE content_hash=?',
+                                      [(content_hash,) for content_hash in to_delete])
+        except sqlite3.Error as e:
+            raise ReceiptStoreError(f"Erreur lors du nettoyage de l'index des reçus: {str(e)}")
+        logger.info(f"Nettoyage des reçus stockés: {removed}")
+        return removed
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def prune_legacy_receipts(self, directory: str = LEGACY_RECEIPTS_DIR) -> int:
+        """
+        Supprime les doublons horodatés receipts/receipt_<id>_<date>.pdf en gardant le plus récent par transaction
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        if not os.path.isdir(directory):
+            return 0
+        latest: Dict[str, str] = {}
+        duplicates = []
+        for name in sorted(os.listdir(directory)):
+            match = _LEGACY_RECEIPT_NAME.match(name)
+            if not match:
+                continue
+            # Tri par nom: l'horodatage AAAAMMJJ_HHMMSS place la version la plus récente en dernier
+            previous = latest.get(match.group(1))
+            if previous:
+                duplicates.append(previous)
+            latest[match.group(1)] = name
+        for name in duplicates:
+            self._remove_file(os.path.join(directory, name))
+        return len(duplicates)
+
+    def stats(self) -> Dict[str, int]:
+        """Nombre de reçus stockés, taille totale et succès/échecs du cache"""
+        try:
+            with self._lock:
+                row = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM receipt_store').fetchone()
+                return {'receipts': row[0], 'bytes': row[1], 'hits': self.hits, 'misses': self.misses}
+        except sqlite3.Error as e:
+            raise ReceiptStoreError(f"Erreur lors du calcul des statistiques des reçus: {str(e)}")
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+_stores: Dict[str, ReceiptStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_receipt_store(db_name: str = "bank_database.db") -> ReceiptStore:
+    """Retourne le stockage des reçus du processus pour une base"""
+    db_path = os.path.abspath(db_name)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = ReceiptStore(db_path)
+            _stores[db_path] = store
+        return store
+
+
+def collect_receipt_garbage(db_name: str) -> Dict[str, int]:
+    """Tâche planifiée: nettoyage du stockage des reçus et des doublons horodatés"""
+    store = get_receipt_store(db_name)
+    removed = store.collect_garbage()
+    removed['legacy_duplicates'] = store.prune_legacy_receipts()
+    return removed
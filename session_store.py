@@ -0,0 +1,245 @@
+import hashlib
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie d'une session et taille du cache en mémoire
+DEFAULT_SESSION_TTL_HOURS = 12
+DEFAULT_CACHE_SIZE = 1024
+# Délai après lequel une entrée du cache revérifie la version de l'utilisateur en base
+# (modifications faites par un autre processus)
+DEFAULT_REVALIDATE_SECONDS = 30.0
+
+SESSION_FIELDS = ('id', 'username', 'email', 'role', 'status', 'auth_version')
+
+
+class SessionError(Exception):
+    """Erreur du stockage des sessions"""
+    pass
+
+
+def _token_digest(token: str) -> str:
+    """Seule l'empreinte du jeton est stockée en base"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class SessionStore:
+    """
+    Sessions côté serveur: jetons stockés dans SQLite, avec un cache LRU en mémoire
+    du rôle et du statut de l'utilisateur. Chaque modification du rôle ou du statut
+    incrémente users.auth_version, ce qui invalide les entrées en cache
+    """
+
+    def __init__(self, db_name: str = "bank_database.db", ttl_hours: int = DEFAULT_SESSION_TTL_HOURS,
+                 cache_size: int = DEFAULT_CACHE_SIZE, revalidate_seconds: float = DEFAULT_REVALIDATE_SECONDS):
+        """
+        Args:
+            db_name: Chemin de la base de données (table users existante)
+            ttl_hours: Durée de validité d'une session
+            cache_size: Nombre maximal de sessions gardées en mémoire
+            revalidate_seconds: Âge maximal d'une entrée avant revérification de la version en base
+        """
+        self.db_path = os.path.abspath(db_name)
+        self.ttl_hours = ttl_hours
+        self.cache_size = cache_size
+        self.revalidate_seconds = revalidate_seconds
+        # Cache: empreinte du jeton -> (données de session, instant de la dernière vérification)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # Dernière version connue par utilisateur, tenue à jour par invalidate_user
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        try:
+            with self.conn:
+                self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS user_sessions (
+                    token_hash TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    created_at TIMESTAMP NOT NULL,
+                    expires_at TIMESTAMP NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )''')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_user ON user_sessions (user_id)')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions (expires_at)')
+        except sqlite3.Error as e:
+            raise SessionError(f"Erreur lors de la création de la table des sessions: {str(e)}")
+
+    # ===== Cycle de vie des sessions =====
+    def create_session(self, user_id: int) -> str:
+        """
+        Ouvre une session pour un utilisateur
+        Returns:
+            str: Jeton de session (à conserver côté client, jamais stocké en clair)
+        """
+        token = secrets.token_urlsafe(32)
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(hours=self.ttl_hours)
+        try:
+            with self._db_lock, self.conn:
+                self.conn.execute('''
+                INSERT INTO user_sessions (token_hash, user_id, created_at, expires_at)
+                VALUES (?, ?, ?, ?)
+                ''', (_token_digest(token), user_id,
+                      now.strftime('%Y-%m-%d %H:%M:%S'), expires_at.strftime('%Y-%m-%d %H:%M:%S')))
+        except sqlite3.Error as e:
+            raise SessionError(f"Erreur lors de la création de la session: {str(e)}")
+        return token
+
+    def get_session(self, token: Optional[str]) -> Optional[Dict]:
+        """
+        Résout un jeton en utilisateur courant (rôle et statut à jour)
+        Returns:
+            Optional[Dict]: id, username, email, role, status, ou None si la session
+            est inconnue, expirée ou si le compte n'est plus actif
+        """
+        if not token:
+            return None
+        digest = _token_digest(token)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None:
+                session, checked_at = entry
+                current = self._versions.get(session['id'], session['auth_version'])
+                if current == session['auth_version'] and session['expires_at'] > _utc_now():
+                    if now - checked_at < self.revalidate_seconds:
+                        self._cache.move_to_end(digest)
+                        return dict(session)
+                else:
+                    del self._cache[digest]
+                    entry = None
+
+        if entry is not None:
+            # Entrée ancienne: une seule lecture de la version suffit si rien n'a changé
+            version = self._read_version(session['id'])
+            if version == session['auth_version']:
+                with self._lock:
+                    if digest in self._cache:
+                        self._cache[digest] = (session, now)
+                        self._cache.move_to_end(digest)
+                return dict(session)
+
+        session = self._load(digest)
+        if session is None or session['status'] != 'active':
+            with self._lock:
+                self._cache.pop(digest, None)
+            return None
+        with self._lock:
+            self._versions[session['id']] = session['auth_version']
+            self._cache[digest] = (session, now)
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(session)
+
+    def _read_version(self, user_id: int) -> Optional[int]:
+        try:
+            with self._db_lock:
+                row = self.conn.execute('SELECT auth_version FROM users WHERE id=?', (user_id,)).fetchone()
+        except sqlite3.Error as e:
+            raise SessionError(f"Erreur lors de la vérification de la session: {str(e)}")
+        return row[0] if row else None
+
+    def _load(self, digest: str) -> Optional[Dict]:
+        """Charge la session et l'utilisateur associé en une requête"""
+        try:
+            with self._db_lock:
+                row = self.conn.execute(f'''
+                SELECT {', '.join('u.' + field for field in SESSION_FIELDS)}, s.expires_at
+                FROM user_sessions s
+                JOIN users u ON u.id = s.user_id
+                WHERE s.token_hash = ? AND s.expires_at > ?
+                ''', (digest, _utc_now())).fetchone()
+        except sqlite3.Error as e:
+            raise SessionError(f"Erreur lors de la lecture de la session: {str(e)}")
+        return dict(row) if row else None
+
+    def revoke(self, token: Optional[str]) -> None:
+        """Ferme une session (déconnexion)"""
+        if not token:
+            return
+        digest = _token_digest(token)
+        with self._lock:
+            self._cache.pop(digest, None)
+        try:
+            with self._db_lock, self.conn:
+                self.conn.execute('DELETE FROM user_sessions WHERE token_hash=?', (digest,))
+        except sqlite3.Error as e:
+            raise SessionError(f"Erreur lors de la fermeture de la session: {str(e)}")
+
+    def revoke_user(self, user_id: int) -> int:
+        """
+        Ferme toutes les sessions d'un utilisateur
+        Returns:
+            int: Nombre de sessions fermées
+        """
+        self.invalidate_user(user_id)
+        try:
+            with self._db_lock, self.conn:
+                cursor = self.conn.execute('DELETE FROM user_sessions WHERE user_id=?', (user_id,))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            raise SessionError(f"Erreur lors de la fermeture des sessions: {str(e)}")
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Écarte du cache les sessions d'un utilisateur après une modification de son rôle ou statut"""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            stale = [digest for digest, (session, _) in self._cache.items() if session['id'] == user_id]
+            for digest in stale:
+                del self._cache[digest]
+
+    def purge_expired(self) -> int:
+        """
+        Supprime les sessions expirées
+        Returns:
+            int: Nombre de sessions supprimées
+        """
+        try:
+            with self._db_lock, self.conn:
+                cursor = self.conn.execute('DELETE FROM user_sessions WHERE expires_at <= ?', (_utc_now(),))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            raise SessionError(f"Erreur lors de la purge des sessions: {str(e)}")
+
+    def cache_info(self) -> Dict[str, int]:
+        """Taille courante et capacité du cache"""
+        with self._lock:
+            return {'size': len(self._cache), 'capacity': self.cache_size}
+
+    def close(self) -> None:
+        with self._db_lock:
+            self.conn.close()
+
+
+_stores: Dict[str, SessionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_session_store(db_name: str = "bank_database.db") -> SessionStore:
+    """Retourne le stockage de sessions du processus pour une base"""
+    db_path = os.path.abspath(db_name)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = SessionStore(db_path)
+            _stores[db_path] = store
+        return store
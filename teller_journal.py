@@ -0,0 +1,384 @@
+import gc
+import os
+import shutil
+import tempfile
+from collections import deque
+from datetime import date, datetime
+from io import BytesIO
+from typing import IO, Dict, List, Tuple, Union
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (ArrayObject, DictionaryObject, EncodedStreamObject, IndirectObject,
+                            NameObject, NumberObject, StreamObject, create_string_object)
+
+from database import BankDatabase
+from receipt_generator import RECEIPT_OUTPUTS, get_receipt_theme
+
+JOURNAL_DIR = "journals"
+PAGE_SIZE = landscape(A4)
+MARGIN = 1.5 * cm
+ROW_HEIGHT = 0.5 * cm
+FONT_SIZE = 8
+# Les pages sont écrites par segments dans des fichiers temporaires puis recopiées une à une
+# dans le PDF final: reportlab garde le contenu non compressé de toutes les pages d'un canvas
+# jusqu'à save()
+SEGMENT_PAGES = 100
+# Colonnes du journal: (titre, largeur, alignement)
+COLUMNS = (
+    ("Date", 2.6 * cm, 'left'),
+    ("N°", 1.5 * cm, 'right'),
+    ("Compte", 5.4 * cm, 'left'),
+    ("Client", 4.2 * cm, 'left'),
+    ("Type", 2.3 * cm, 'left'),
+    ("Libellé", 6.8 * cm, 'left'),
+    ("Montant", 2.8 * cm, 'right'),
+    ("Devise", 1.1 * cm, 'left'),
+)
+
+
+def journal_file_path(start: str, end: str, branch_code: str = None) -> str:
+    """Chemin d'enregistrement d'un journal dans le dossier journals"""
+    period = start if start == end else f"{start}_{end}"
+    suffix = f"_{branch_code}" if branch_code else ""
+    return os.path.join(JOURNAL_DIR, f"journal_{period}{suffix}.pdf")
+
+
+def _period_bound(value: Union[date, datetime, str]) -> str:
+    """Borne de période au format de la base ('YYYY-MM-DD' ou 'YYYY-MM-DD HH:MM:SS')"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def _format_amount(amount: float) -> str:
+    return f"{float(amount):,.2f}".replace(",", " ")
+
+
+def _fit(text: str, width: float, font: str) -> str:
+    """Tronque un texte à la largeur d'une colonne"""
+    text = str(text or "")
+    if stringWidth(text, font, FONT_SIZE) <= width:
+        return text
+    while text and stringWidth(text + "…", font, FONT_SIZE) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+class _JournalCanvas:
+    """Dessine le journal ligne par ligne et change de page à la demande"""
+
+    def __init__(self, target, title: str, subtitle: str, company_name: str):
+        self.theme = get_receipt_theme()
+        self.font = self.theme.styles['Normal'].fontName
+        self.bold_font = 'Helvetica-Bold'
+        self.target = target
+        self.segments = []
+        self.segment_pages = 0
+        self.canv = None
+        self.title = title
+        self.subtitle = subtitle
+        self.company_name = company_name
+        self.generated_at = datetime.now().strftime('%d/%m/%Y à %H:%M')
+        self.page = 0
+        self.count = 0
+        self.y = 0.0
+        self._new_page()
+
+    def _open_segment(self) -> None:
+        self.segments.append(tempfile.TemporaryFile())
+        self.canv = canvas.Canvas(self.segments[-1], pagesize=PAGE_SIZE, pageCompression=1)
+        self.canv.setTitle(self.title)
+        self.segment_pages = 0
+
+    def _new_page(self) -> None:
+        if self.page:
+            self._draw_footer()
+            if self.segment_pages >= SEGMENT_PAGES:
+                self.canv.save()
+                self._open_segment()
+            else:
+                self.canv.showPage()
+        else:
+            self._open_segment()
+        self.page += 1
+        self.segment_pages += 1
+        width, height = PAGE_SIZE
+        colors = self.theme.colors
+        title_style = self.theme.styles['Title']
+
+        self.canv.setFillColor(colors['accent'])
+        self.canv.setFont(title_style.fontName, 14)
+        self.canv.drawString(MARGIN, height - MARGIN, self.title)
+        self.canv.setFillColor(colors['label'])
+        self.canv.setFont(self.font, 9)
+        self.canv.drawString(MARGIN, height - MARGIN - 0.55 * cm, self.subtitle)
+        self.canv.drawRightString(width - MARGIN, height - MARGIN, self.company_name)
+
+        self.y = height - MARGIN - 1.4 * cm
+        self.canv.setFillColor(colors['accent'])
+        self.canv.rect(MARGIN, self.y - 0.15 * cm, width - 2 * MARGIN, ROW_HEIGHT, stroke=0, fill=1)
+        self.canv.setFillColorRGB(1, 1, 1)
+        self._draw_cells([column[0] for column in COLUMNS], self.bold_font)
+        self.y -= ROW_HEIGHT
+
+    def _draw_footer(self) -> None:
+        width = PAGE_SIZE[0]
+        self.canv.setFont(self.font, 7)
+        self.canv.setFillColor(self.theme.colors['footer'])
+        self.canv.drawString(MARGIN, MARGIN / 2,
+                             f"{self.company_name} • Journal généré le {self.generated_at}")
+        self.canv.drawRightString(width - MARGIN, MARGIN / 2,
+                                  f"Page {self.page} • {self.count} opération(s) reportée(s)")
+
+    def _draw_cells(self, values, font: str) -> None:
+        self.canv.setFont(font, FONT_SIZE)
+        x = MARGIN
+        for value, (_, width, align) in zip(values, COLUMNS):
+            text = _fit(value, width - 0.2 * cm, font)
+            if align == 'right':
+                self.canv.drawRightString(x + width - 0.1 * cm, self.y, text)
+            else:
+                self.canv.drawString(x + 0.1 * cm, self.y, text)
+            x += width
+
+    def add_row(self, values) -> None:
+        if self.y < MARGIN + ROW_HEIGHT:
+            self._new_page()
+        self.canv.setFillColor(self.theme.colors['text'])
+        self._draw_cells(values, self.font)
+        self.canv.setStrokeColor(self.theme.colors['grid'])
+        self.canv.setLineWidth(0.5)
+        self.canv.line(MARGIN, self.y - 0.17 * cm, PAGE_SIZE[0] - MARGIN, self.y - 0.17 * cm)
+        self.y -= ROW_HEIGHT
+        self.count += 1
+
+    def add_table(self, heading: str, table: Table) -> None:
+        """Ajoute un tableau de synthèse, sur une nouvelle page s'il ne tient pas sur la page courante"""
+        width = PAGE_SIZE[0] - 2 * MARGIN
+        _, table_height = table.wrapOn(self.canv, width, PAGE_SIZE[1])
+        if self.y - table_height - 1.2 * cm < MARGIN:
+            self._new_page()
+        self.y -= 0.6 * cm
+        self.canv.setFillColor(self.theme.colors['accent'])
+        self.canv.setFont(self.bold_font, 11)
+        self.canv.drawString(MARGIN, self.y, heading)
+        self.y -= 0.3 * cm + table_height
+        table.drawOn(self.canv, MARGIN, self.y)
+
+    def save(self) -> None:
+        """Termine la dernière page et écrit le PDF complet dans la cible"""
+        self._draw_footer()
+        self.canv.save()
+        output = open(self.target, 'wb') if isinstance(self.target, str) else self.target
+        try:
+            if len(self.segments) == 1:
+                self.segments[0].seek(0)
+                shutil.copyfileobj(self.segments[0], output)
+            else:
+                _write_concatenated(self.segments, output, self.title)
+        finally:
+            for segment in self.segments:
+                segment.close()
+            if output is not self.target:
+                output.close()
+
+
+def _write_concatenated(segments: List[IO[bytes]], output: IO[bytes], title: str) -> None:
+    """
+    Concatène des PDF dans la sortie, un segment à la fois: les objets de chaque segment
+    sont renumérotés et écrits aussitôt. Seuls la position des objets écrits et les
+    références des pages (quelques octets par page) restent en mémoire
+    """
+    base = output.tell()
+    # Objets 1 à 3 réservés à l'arbre des pages, au catalogue et aux métadonnées, écrits à la fin
+    offsets: List[int] = [0, 0, 0]
+    pages_ref = IndirectObject(1, 0, None)
+    page_refs = ArrayObject()
+
+    output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write_object(number: int, obj) -> None:
+        offsets[number - 1] = output.tell() - base
+        output.write(f"{number} 0 obj\n".encode())
+        obj.write_to_stream(output, None)
+        output.write(b"\nendobj\n")
+
+    for segment in segments:
+        segment.seek(0)
+        reader = PdfReader(segment)
+        numbers: Dict[int, int] = {}  # numéro dans le segment -> numéro dans la sortie
+        pending = deque()
+
+        def reference(indirect: IndirectObject) -> IndirectObject:
+            if indirect.idnum not in numbers:
+                offsets.append(0)
+                numbers[indirect.idnum] = len(offsets)
+                pending.append(indirect)
+            return IndirectObject(numbers[indirect.idnum], 0, None)
+
+        def remap(obj):
+            if isinstance(obj, IndirectObject):
+                return reference(obj)
+            if isinstance(obj, StreamObject):
+                stream = EncodedStreamObject()
+                for key, value in obj.items():
+                    stream[key] = remap(value)
+                stream._data = obj._data
+                return stream
+            if isinstance(obj, DictionaryObject):
+                return DictionaryObject({key: remap(value) for key, value in obj.items()})
+            if isinstance(obj, ArrayObject):
+                return ArrayObject(remap(value) for value in obj)
+            return obj
+
+        page_numbers = set()
+        for page in reader.pages:
+            page_refs.append(reference(page.indirect_reference))
+            page_numbers.add(page.indirect_reference.idnum)
+        while pending:
+            indirect = pending.popleft()
+            obj = reader.get_object(indirect)
+            if indirect.idnum in page_numbers:
+                # Le parent d'origine (arbre des pages du segment) n'est pas recopié
+                obj = DictionaryObject({key: value for key, value in obj.items() if key != '/Parent'})
+                obj = remap(obj)
+                obj[NameObject('/Parent')] = pages_ref
+            else:
+                obj = remap(obj)
+            write_object(numbers[indirect.idnum], obj)
+        # Les objets lus forment des cycles avec le lecteur: sans collecte explicite,
+        # les segments déjà recopiés s'accumulent jusqu'au prochain passage du ramasse-miettes
+        del reader, reference, remap
+        gc.collect()
+
+    write_object(1, DictionaryObject({
+        NameObject('/Type'): NameObject('/Pages'),
+        NameObject('/Kids'): page_refs,
+        NameObject('/Count'): NumberObject(len(page_refs)),
+    }))
+    write_object(2, DictionaryObject({
+        NameObject('/Type'): NameObject('/Catalog'),
+        NameObject('/Pages'): pages_ref,
+    }))
+    write_object(3, DictionaryObject({NameObject('/Title'): create_string_object(title)}))
+
+    xref_offset = output.tell() - base
+    output.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode())
+    output.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 2 0 R /Info 3 0 R >>\n"
+                 f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def _subtotals_table(subtotals: Dict[Tuple[str, str], list]) -> Table:
+    """Sous-totaux par type et devise, suivis du total par devise"""
+    theme = get_receipt_theme()
+    rows = [["Type", "Devise", "Opérations", "Montant"]]
+    for (transaction_type, currency), (count, amount) in sorted(subtotals.items()):
+        rows.append([transaction_type, currency, str(count), _format_amount(amount)])
+    by_currency: Dict[str, list] = {}
+    for (_, currency), (count, amount) in subtotals.items():
+        total = by_currency.setdefault(currency, [0, 0.0])
+        total[0] += count
+        total[1] += amount
+    first_total_row = len(rows)
+    for currency, (count, amount) in sorted(by_currency.items()):
+        rows.append(["Total", currency, str(count), _format_amount(amount)])
+
+    style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('TEXTCOLOR', (0, 0), (-1, 0), theme.colors['label']),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, first_total_row), (-1, -1), 'Helvetica-Bold'),
+        ('LINEABOVE', (0, first_total_row), (-1, first_total_row), 1, theme.colors['accent']),
+    ], parent=theme.info_table_style)
+    table = Table(rows, colWidths=[4 * cm, 2 * cm, 3 * cm, 4 * cm], hAlign='LEFT')
+    table.setStyle(style)
+    return table
+
+
+def generate_teller_journal(db: BankDatabase, start: Union[date, datetime, str],
+                            end: Union[date, datetime, str] = None, branch_code: str = None,
+                            company_name: str = "Digital Financial Service",
+                            output: str = "file", destination: Union[str, IO[bytes]] = None) -> Dict:
+    """
+    Génère le journal de caisse d'une journée ou d'une période: toutes les transactions
+    dans un seul PDF paginé, suivies des sous-totaux par type et devise.
+    Les lignes sont lues par lots depuis un curseur et dessinées directement sur le canvas:
+    la mémoire ne dépend pas du nombre de transactions (les pages terminées sont écrites
+    par segments dans des fichiers temporaires, recopiés un à un dans le PDF final; seuls
+    quelques octets par page sont conservés pour la table des objets).
+    En mode "bytes", le PDF complet est bien sûr renvoyé en mémoire
+
+    Args:
+        db: Base de données
+        start: Premier jour (ou instant) de la période
+        end: Dernier jour inclus (par défaut le jour de start)
+        branch_code: Code guichet des comptes (optionnel, tous les guichets par défaut)
+        company_name: Nom de l'entreprise
+        output: "file" (fichier dans le dossier journals ou destination) ou "bytes"
+        destination: Chemin ou fichier binaire de sortie (mode "file")
+    Returns:
+        Dict: {'file' (chemin, fichier ou octets du PDF selon le mode), 'count', 'pages', 'subtotals'}
+    """
+    if output not in RECEIPT_OUTPUTS:
+        raise ValueError(f"Mode de sortie inconnu: {output}")
+    start_text = _period_bound(start)
+    end_text = _period_bound(end) if end else start_text[:10]
+
+    if output == "bytes":
+        target = BytesIO()
+    elif destination is not None:
+        target = destination
+    else:
+        target = journal_file_path(start_text[:10], end_text[:10], branch_code)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    period = (f"Journée du {datetime.strptime(start_text[:10], '%Y-%m-%d').strftime('%d/%m/%Y')}"
+              if start_text[:10] == end_text[:10] else f"Du {start_text} au {end_text}")
+    subtitle = period + (f" • Guichet {branch_code}" if branch_code else " • Tous les guichets")
+    journal = _JournalCanvas(target, "JOURNAL DE CAISSE", subtitle, company_name)
+
+    # (type, devise) -> [nombre d'opérations, montant]
+    subtotals: Dict[Tuple[str, str], list] = {}
+    for row in db.iter_journal_transactions(start_text, end_text, branch_code):
+        journal.add_row((
+            datetime.strptime(row['date'][:19], '%Y-%m-%d %H:%M:%S').strftime('%d/%m %H:%M:%S'),
+            row['id'],
+            row['iban'],
+            f"{row['first_name']} {row['last_name']}",
+            row['type'],
+            row['description'],
+            _format_amount(row['amount']),
+            row['currency'],
+        ))
+        subtotal = subtotals.setdefault((row['type'], row['currency']), [0, 0.0])
+        subtotal[0] += 1
+        subtotal[1] += row['amount']
+
+    if subtotals:
+        journal.add_table("Sous-totaux par type et devise", _subtotals_table(subtotals))
+    else:
+        journal.add_row(("", "", "Aucune transaction sur la période", "", "", "", "", ""))
+        journal.count = 0
+    journal.save()
+
+    result = {
+        'count': journal.count,
+        'pages': journal.page,
+        'subtotals': {key: tuple(value) for key, value in subtotals.items()},
+    }
+    if output == "bytes":
+        result['file'] = target.getvalue()
+    else:
+        if not isinstance(target, str):
+            target.seek(0)
+        result['file'] = target
+    return result
@@ -0,0 +1,45 @@
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import pytest
+
+# Les modules de l'application sont à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_generator import BankDataGenerator  # noqa: E402
+from database import BankDatabase  # noqa: E402
+
+SEED = 1234
+
+
+@pytest.fixture(scope="session", autouse=True)
+def working_directory(tmp_path_factory):
+    """Les fichiers relatifs (database.log, receipts/, journals/) sont écrits hors du dépôt"""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("cwd"))
+    yield
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def dataset_path(tmp_path_factory) -> str:
+    """Petit jeu de données synthétique, généré une fois pour la session"""
+    path = str(tmp_path_factory.mktemp("data") / "bank.db")
+    generator = BankDataGenerator(path, seed=SEED, days=30, end_date=datetime(2025, 1, 31))
+    try:
+        generator.run(clients=20, accounts_per_client=2, transactions=800, avis=0, activity_logs=300, users=5)
+    finally:
+        generator.close()
+    return path
+
+
+@pytest.fixture
+def db(dataset_path, tmp_path) -> BankDatabase:
+    """Copie du jeu de données propre à chaque test"""
+    path = str(tmp_path / "bank.db")
+    shutil.copyfile(dataset_path, path)
+    database = BankDatabase(path)
+    yield database
+    database.close()
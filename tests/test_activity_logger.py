@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from activity_logger import BufferedActivityLogger, create_user_tables
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    path = str(tmp_path / "logs.db")
+    conn = sqlite3.connect(path)
+    create_user_tables(conn)
+    conn.close()
+    return path
+
+
+def logged_actions(db_path: str) -> list:
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT action FROM activity_logs ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_flush_writes_in_arrival_order(db_path):
+    activity_logger = BufferedActivityLogger(db_path)
+    for i in range(5):
+        activity_logger.log(1, f"action_{i}")
+    assert activity_logger.flush() == 5
+    assert activity_logger.pending() == 0
+    assert logged_actions(db_path) == [f"action_{i}" for i in range(5)]
+    activity_logger.stop()
+
+
+def test_bad_row_is_dropped_after_bounded_retries(db_path):
+    activity_logger = BufferedActivityLogger(db_path, max_retries=2)
+    activity_logger.log(1, "avant")
+    activity_logger.log(None, "invalide")  # user_id NOT NULL: le lot entier est refusé
+    activity_logger.log(1, "apres")
+
+    assert activity_logger.flush() == 0
+    assert activity_logger.pending() == 3  # première tentative: le lot est conservé
+
+    # Deuxième échec: écriture ligne par ligne, seule la ligne invalide est abandonnée
+    assert activity_logger.flush() == 2
+    assert activity_logger.pending() == 0
+    assert logged_actions(db_path) == ["avant", "apres"]
+
+    # Les événements suivants ne sont plus bloqués
+    activity_logger.log(1, "suivant")
+    assert activity_logger.flush() == 1
+    activity_logger.stop()
+
+
+def test_buffer_is_capped_by_dropping_the_oldest(db_path):
+    activity_logger = BufferedActivityLogger(db_path, max_pending=3)
+    for i in range(5):
+        activity_logger.log(1, f"action_{i}")
+    assert activity_logger.pending() == 3
+    assert activity_logger.flush() == 3
+    assert logged_actions(db_path) == ["action_2", "action_3", "action_4"]
+    activity_logger.stop()
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+SIGNED = "CASE WHEN type = 'Dépôt' THEN amount ELSE -amount END"
+
+
+def brute_force_balance(db, iban_id: int, at: str) -> float:
+    """Solde courant moins toutes les écritures postérieures à la date (aucun instantané)"""
+    current = db.conn.execute("SELECT balance FROM ibans WHERE id=?", (iban_id,)).fetchone()[0]
+    later = db.conn.execute(
+        f"SELECT COALESCE(SUM({SIGNED}), 0) FROM transactions WHERE iban_id=? AND date > ?",
+        (iban_id, at)).fetchone()[0]
+    return current - later
+
+
+def sample_instants(db, iban_id: int):
+    """Dates de chaque écriture, la seconde précédente, et des dates hors de l'historique"""
+    dates = [row[0] for row in db.conn.execute(
+        "SELECT date FROM transactions WHERE iban_id=? ORDER BY date, id", (iban_id,))]
+    instants = {'2000-01-01 00:00:00', '2100-01-01 00:00:00'}
+    for value in dates:
+        instants.add(value)
+        before = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S') - timedelta(seconds=1)
+        instants.add(before.strftime('%Y-%m-%d %H:%M:%S'))
+    return sorted(instants)
+
+
+@pytest.mark.parametrize("interval", [1, 7, 100])
+def test_balance_at_matches_brute_force(db, interval):
+    db.backfill_balance_snapshots(interval=interval)
+    iban_ids = [row[0] for row in db.conn.execute("SELECT id FROM ibans ORDER BY id LIMIT 8")]
+    for iban_id in iban_ids:
+        for at in sample_instants(db, iban_id):
+            assert db.get_balance_at(iban_id, at) == pytest.approx(
+                brute_force_balance(db, iban_id, at), abs=0.01), (iban_id, at)
+
+
+def test_balance_at_after_live_postings(db, monkeypatch):
+    # Instantanés écrits au fil des opérations (un toutes les 3 écritures du compte)
+    monkeypatch.setattr(type(db), 'SNAPSHOT_INTERVAL', 3)
+    iban_id = db.conn.execute("SELECT id FROM ibans ORDER BY balance DESC LIMIT 1").fetchone()[0]
+    for amount in (120.0, 35.5, 80.25, 10.0, 999.99, 42.0, 7.5):
+        db.deposit(iban_id, amount, "Test")
+        db.withdraw(iban_id, round(amount / 2, 2), "Test")
+
+    snapshots = db.conn.execute(
+        "SELECT COUNT(*) FROM balance_snapshots WHERE iban_id=?", (iban_id,)).fetchone()[0]
+    assert snapshots > 1
+    for at in sample_instants(db, iban_id):
+        assert db.get_balance_at(iban_id, at) == pytest.approx(
+            brute_force_balance(db, iban_id, at), abs=0.01), at
@@ -0,0 +1,54 @@
+import csv
+import gzip
+import os
+from datetime import datetime
+
+import pytest
+
+from log_retention import ActivityLogRetention
+
+# Jeu de test: logs du 2 au 31 janvier 2025; seuil à 30 jours du 15 février = 16 janvier
+NOW = datetime(2025, 2, 15)
+
+
+def daily_counts(db):
+    return {(row[0], row[1]): row[2] for row in db.conn.execute(
+        "SELECT date(created_at), action, COUNT(*) FROM activity_logs GROUP BY 1, 2")}
+
+
+@pytest.mark.parametrize("archive_mode", ['table', 'file'])
+def test_compact_preserves_totals(db, tmp_path, archive_mode):
+    before = daily_counts(db)
+    total = sum(before.values())
+    retention = ActivityLogRetention(db.db_path, retention_days=30, archive_mode=archive_mode,
+                                     archive_dir=str(tmp_path / "archives"))
+    try:
+        cutoff = retention.cutoff(NOW)
+        archived = retention.compact(NOW)
+        assert archived and sum(archived.values()) < total
+
+        # Les logs en ligne sont tous postérieurs au seuil, et aucun n'est perdu
+        remaining = db.conn.execute("SELECT COUNT(*), MIN(created_at) FROM activity_logs").fetchone()
+        assert remaining[0] + sum(archived.values()) == total
+        assert remaining[1] >= cutoff
+
+        # Résumés + logs en ligne = comptes journaliers d'origine
+        after = {(row['day'], row['action']): row['count']
+                 for row in retention.get_daily_counts('2000-01-01', '2100-12-31')}
+        assert after == before
+
+        if archive_mode == 'table':
+            for month, count in archived.items():
+                assert db.conn.execute(f"SELECT COUNT(*) FROM activity_logs_archive_{month}").fetchone()[0] == count
+        else:
+            for month, count in archived.items():
+                path = os.path.join(str(tmp_path / "archives"), f"activity_logs_{month}.csv.gz")
+                with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+                    assert len(list(csv.reader(f))) == count + 1  # en-tête
+
+        # Un second passage n'a plus rien à archiver et ne modifie pas les comptes
+        assert retention.compact(NOW) == {}
+        assert {(row['day'], row['action']): row['count']
+                for row in retention.get_daily_counts('2000-01-01', '2100-12-31')} == before
+    finally:
+        retention.close()
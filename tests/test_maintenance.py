@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from maintenance import DailyJobScheduler
+
+
+def test_failed_job_is_retried_with_backoff_until_it_succeeds():
+    scheduler = DailyJobScheduler(run_at="23:00", retry_delay=60)
+    outcomes = [False, False, True]
+    calls = []
+
+    def job():
+        calls.append(len(calls))
+        if not outcomes[len(calls) - 1]:
+            raise RuntimeError("base verrouillée")
+
+    scheduler.register("job", job)
+    start = datetime(2025, 1, 31, 23, 0)
+
+    scheduler.run_pending(start - timedelta(minutes=1))
+    assert calls == []  # Avant l'heure
+
+    scheduler.run_pending(start)
+    assert len(calls) == 1
+    scheduler.run_pending(start + timedelta(seconds=59))
+    assert len(calls) == 1  # Premier délai: 60 s
+    scheduler.run_pending(start + timedelta(seconds=60))
+    assert len(calls) == 2
+    scheduler.run_pending(start + timedelta(seconds=60 + 119))
+    assert len(calls) == 2  # Délai doublé: 120 s
+    scheduler.run_pending(start + timedelta(seconds=60 + 120))
+    assert len(calls) == 3
+
+    # Réussie: plus relancée de la journée, relancée le lendemain
+    scheduler.run_pending(start + timedelta(minutes=30))
+    assert len(calls) == 3
+    outcomes.append(True)
+    scheduler.run_pending(start + timedelta(days=1))
+    assert len(calls) == 4
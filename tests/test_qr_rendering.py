@@ -0,0 +1,39 @@
+import pytest
+
+from qr_rendering import qr_matrix, qr_rects
+
+
+def painted(payload: str, error_correction: str = 'L', border: int = 2):
+    """Modules couverts par les rectangles, en vérifiant qu'aucun n'est couvert deux fois"""
+    _, rects = qr_rects(payload, error_correction, border)
+    cells = set()
+    for row, col, width, height in rects:
+        assert width > 0 and height > 0
+        for r in range(row, row + height):
+            for c in range(col, col + width):
+                assert (r, c) not in cells
+                cells.add((r, c))
+    return cells
+
+
+@pytest.mark.parametrize("payload", [
+    "1",
+    "Transaction 123 - 150000.00 XAF",
+    "RIB CM21 10005 00199 12345678901 23 " * 6,
+])
+@pytest.mark.parametrize("error_correction", ['L', 'H'])
+def test_rects_cover_exactly_the_dark_modules(payload, error_correction):
+    matrix = qr_matrix(payload, error_correction, 2)
+    modules, _ = qr_rects(payload, error_correction, 2)
+    assert modules == len(matrix) == len(matrix[0])
+    dark = {(r, c) for r, row in enumerate(matrix) for c, value in enumerate(row) if value}
+    assert painted(payload, error_correction) == dark
+
+
+def test_border_is_left_blank():
+    matrix = qr_matrix("bordure", 'L', 4)
+    modules, rects = qr_rects("bordure", 'L', 4)
+    for row, col, width, height in rects:
+        assert 4 <= row and row + height <= modules - 4
+        assert 4 <= col and col + width <= modules - 4
+    assert not any(matrix[0]) and not any(matrix[-1])
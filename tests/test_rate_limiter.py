@@ -0,0 +1,75 @@
+import pytest
+
+from rate_limiter import (IP_CAPACITY, USERNAME_CAPACITY, USERNAME_REFILL_PER_SECOND, LoginRateLimiter,
+                          TokenBucketLimiter, resolve_client_address)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bucket_refills_at_the_configured_rate():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(capacity=3, refill_per_second=0.5, clock=clock)
+    assert [limiter.consume("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.retry_after("a") == pytest.approx(2.0)
+
+    clock.now += 1.9
+    assert not limiter.consume("a")
+    clock.now += 0.2  # 2,1 s depuis l'épuisement: un jeton, pas deux
+    assert limiter.consume("a")
+    assert not limiter.consume("a")
+
+    # La réserve ne dépasse jamais la capacité
+    clock.now += 3600
+    assert [limiter.consume("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.stats()['allowed'] == 7
+
+
+def test_keys_are_independent_and_evicted_lru():
+    limiter = TokenBucketLimiter(capacity=1, refill_per_second=0.001, max_keys=2, clock=FakeClock())
+    assert limiter.consume("a") and limiter.consume("b")
+    assert not limiter.consume("a")
+    limiter.consume("c")  # évince "b", le moins récemment utilisé
+    assert limiter.stats()['evictions'] == 1
+    assert limiter.consume("b")
+    assert not limiter.peek("c")
+
+
+def test_login_limiter_ip_refusal_does_not_drain_username():
+    limiter = LoginRateLimiter()
+    clock = FakeClock()
+    for bucket in (limiter.by_username, limiter.by_ip):
+        bucket._clock = clock
+
+    for attempt in range(IP_CAPACITY):
+        assert limiter.check(f"user{attempt}", "198.51.100.1") is None
+    assert limiter.check("alice", "198.51.100.1") is not None
+    # "alice" n'a rien consommé: ses essais restent entiers depuis une autre adresse
+    for _ in range(USERNAME_CAPACITY):
+        assert limiter.check("alice", "203.0.113.9") is None
+    retry_after = limiter.check("ALICE ", "203.0.113.10")
+    assert retry_after == pytest.approx(1 / USERNAME_REFILL_PER_SECOND)
+
+    limiter.reset_username("alice")
+    assert limiter.check("alice", "203.0.113.11") is None
+
+
+@pytest.mark.parametrize("peer, forwarded_for, trusted, expected", [
+    (None, "203.0.113.5", (), None),
+    ("198.51.100.7", None, (), "198.51.100.7"),
+    # Sans proxy de confiance, l'en-tête fourni par le client est ignoré
+    ("198.51.100.7", "203.0.113.5", (), "198.51.100.7"),
+    ("198.51.100.7", "203.0.113.5", ("127.0.0.1",), "198.51.100.7"),
+    # Derrière un proxy de confiance: saut le plus à droite qui n'est pas un proxy
+    ("127.0.0.1", "6.6.6.6, 203.0.113.5", ("127.0.0.1",), "203.0.113.5"),
+    ("10.0.0.2", "6.6.6.6, 203.0.113.5, 10.0.0.9", ("10.0.0.0/8",), "203.0.113.5"),
+    ("10.0.0.2", "10.0.0.8, 10.0.0.9", ("10.0.0.0/8",), "10.0.0.8"),
+    ("127.0.0.1", "", ("127.0.0.1",), "127.0.0.1"),
+])
+def test_resolve_client_address(peer, forwarded_for, trusted, expected):
+    assert resolve_client_address(peer, forwarded_for, trusted) == expected
@@ -0,0 +1,29 @@
+import zipfile
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from receipt_batch import generate_receipts_batch
+
+
+def test_pdf_batch_merges_existing_receipts_and_reports_missing(db):
+    ids = [row[0] for row in db.conn.execute("SELECT id FROM transactions ORDER BY id LIMIT 3")]
+    batch = generate_receipts_batch(ids + [10 ** 9], {'include_qr': False}, db_name=db.db_path,
+                                    output_format='pdf', max_workers=1)
+    assert (batch['count'], batch['missing']) == (3, [10 ** 9])
+    with batch['file'] as batch_file:
+        assert len(PdfReader(BytesIO(batch_file.read())).pages) >= 3
+
+
+def test_zip_batch_has_one_pdf_per_transaction(db):
+    ids = [row[0] for row in db.conn.execute("SELECT id FROM transactions ORDER BY id LIMIT 2")]
+    batch = generate_receipts_batch(ids, {'include_qr': False}, db_name=db.db_path, max_workers=1)
+    with batch['file'] as batch_file, zipfile.ZipFile(batch_file) as archive:
+        assert archive.namelist() == [f"recu_{transaction_id}.pdf" for transaction_id in ids]
+
+
+def test_batch_without_any_receipt_returns_no_file(db):
+    for output_format in ('pdf', 'zip'):
+        batch = generate_receipts_batch([10 ** 9], db_name=db.db_path, output_format=output_format,
+                                        max_workers=1)
+        assert batch == {'file': None, 'count': 0, 'missing': [10 ** 9]}
@@ -0,0 +1,101 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import receipt_store
+from receipt_store import UNTRACKED_GRACE_SECONDS, ReceiptStore, receipt_key
+
+TRANSACTION = {'id': 7, 'type': 'Dépôt', 'amount': 1500.0, 'description': 'Versement', 'date': '2025-01-10 09:30:00'}
+CLIENT = {'id': 3, 'first_name': 'Awa', 'last_name': 'Ngono', 'email': 'awa@example.com', 'phone': '690000000'}
+IBAN = {'id': 5, 'iban': 'CM2110005001991234567890123', 'currency': 'XAF', 'bank_name': 'EcoCapital'}
+OPTIONS = {'company_name': 'Digital Financial Service', 'include_qr': False}
+
+
+def days_ago(days: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+@pytest.fixture
+def store(db, tmp_path):
+    store = ReceiptStore(db.db_path, store_dir=str(tmp_path / "store"))
+    yield store
+    store.close()
+
+
+def test_receipt_key_is_canonical():
+    key = receipt_key(TRANSACTION, CLIENT, IBAN, OPTIONS)
+    reordered = dict(reversed(list(TRANSACTION.items())))
+    assert receipt_key(reordered, CLIENT, IBAN, dict(reversed(list(OPTIONS.items())))) == key
+
+
+@pytest.mark.parametrize("change", [
+    lambda t, c, i, o: t.update(amount=1500.01),
+    lambda t, c, i, o: c.update(last_name='Ngono Mballa'),
+    lambda t, c, i, o: i.update(currency='EUR'),
+    lambda t, c, i, o: o.update(include_qr=True),
+    lambda t, c, i, o: o.update(logo_bytes=b'logo'),
+])
+def test_receipt_key_changes_with_content(change):
+    transaction, client, iban, options = dict(TRANSACTION), dict(CLIENT), dict(IBAN), dict(OPTIONS)
+    change(transaction, client, iban, options)
+    assert receipt_key(transaction, client, iban, options) != receipt_key(TRANSACTION, CLIENT, IBAN, OPTIONS)
+
+
+def test_receipt_key_logo_and_template_version(monkeypatch):
+    with_logo = dict(OPTIONS, logo_bytes=b'logo-v1')
+    key = receipt_key(TRANSACTION, CLIENT, IBAN, with_logo)
+    assert receipt_key(TRANSACTION, CLIENT, IBAN, dict(OPTIONS, logo_bytes=b'logo-v1')) == key
+    assert receipt_key(TRANSACTION, CLIENT, IBAN, dict(OPTIONS, logo_bytes=b'logo-v2')) != key
+    monkeypatch.setattr(receipt_store, 'RECEIPT_TEMPLATE_VERSION', receipt_store.RECEIPT_TEMPLATE_VERSION + 1)
+    assert receipt_key(TRANSACTION, CLIENT, IBAN, with_logo) != key
+
+
+def test_repeat_render_is_served_from_disk(db, store):
+    context = db.get_transaction_context(1)
+    first = store.get_or_render(context['transaction'], context['client'], context['iban'], OPTIONS)
+    second = store.get_or_render(context['transaction'], context['client'], context['iban'], OPTIONS)
+    assert first == second and first.startswith(b'%PDF')
+    stats = store.stats()
+    assert (stats['receipts'], stats['hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_collect_garbage_rules(db, store):
+    def add(content_hash: str, transaction_id: int, created: str, accessed: str) -> str:
+        store._save(content_hash, transaction_id, b'%PDF-test')
+        store.conn.execute('UPDATE receipt_store SET created_at=?, last_accessed=? WHERE content_hash=?',
+                           (created, accessed, content_hash))
+        store.conn.commit()
+        return store._path_for(content_hash)
+
+    deleted_id = db.conn.execute('SELECT MAX(id) FROM transactions').fetchone()[0]
+    orphan = add('aa' * 32, deleted_id, days_ago(1), days_ago(1))
+    db.conn.execute('DELETE FROM transactions WHERE id=?', (deleted_id,))
+    db.conn.commit()
+
+    # Transaction 1: ancienne version non consultée (supprimée), version courante (conservée)
+    stale = add('bb' * 32, 1, days_ago(90), days_ago(60))
+    current = add('cc' * 32, 1, days_ago(2), days_ago(2))
+    # Transaction 2: ancienne version encore consultée récemment (conservée)
+    recently_read = add('dd' * 32, 2, days_ago(90), days_ago(1))
+    add('de' * 32, 2, days_ago(2), days_ago(2))
+    # Transaction 3: entrée dont le fichier a disparu
+    os.remove(add('ee' * 32, 3, days_ago(5), days_ago(5)))
+
+    untracked_old = os.path.join(store.store_dir, 'ff', 'ff' * 32 + '.pdf')
+    untracked_new = os.path.join(store.store_dir, 'ff', 'fe' * 32 + '.pdf')
+    os.makedirs(os.path.dirname(untracked_old), exist_ok=True)
+    for path in (untracked_old, untracked_new):
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-untracked')
+    old = time.time() - UNTRACKED_GRACE_SECONDS - 60
+    os.utime(untracked_old, (old, old))
+
+    removed = store.collect_garbage(max_age_days=30)
+    assert removed == {'deleted_transactions': 1, 'superseded': 1, 'missing_files': 1, 'untracked_files': 1}
+
+    remaining = {row[0] for row in store.conn.execute('SELECT content_hash FROM receipt_store')}
+    assert remaining == {'cc' * 32, 'dd' * 32, 'de' * 32}
+    assert not os.path.exists(orphan) and not os.path.exists(stale) and not os.path.exists(untracked_old)
+    assert os.path.exists(current) and os.path.exists(recently_read) and os.path.exists(untracked_new)
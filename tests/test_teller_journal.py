@@ -0,0 +1,64 @@
+from io import BytesIO
+
+import pytest
+from PyPDF2 import PdfReader
+
+import teller_journal
+from teller_journal import generate_teller_journal
+
+PERIOD = ('2025-01-01', '2025-01-31')
+
+
+def expected_subtotals(db, start: str, end: str, branch_code: str = None):
+    query = '''
+    SELECT t.type, i.currency, COUNT(*), SUM(t.amount) FROM transactions t
+    JOIN ibans i ON i.id = t.iban_id
+    WHERE t.date >= ? AND t.date <= ?
+    '''
+    params = [start, end + ' 23:59:59']
+    if branch_code:
+        query += ' AND i.branch_code = ?'
+        params.append(branch_code)
+    return {(row[0], row[1]): (row[2], row[3]) for row in db.conn.execute(query + ' GROUP BY 1, 2', params)}
+
+
+def assert_subtotals(actual, expected):
+    assert set(actual) == set(expected)
+    for key, (count, amount) in expected.items():
+        assert actual[key][0] == count
+        assert actual[key][1] == pytest.approx(amount, abs=0.005)
+
+
+def test_subtotals_match_sql_and_pages_are_merged(db, monkeypatch):
+    # Segments de 3 pages: le journal est recopié depuis plusieurs fichiers temporaires
+    monkeypatch.setattr(teller_journal, 'SEGMENT_PAGES', 3)
+    journal = generate_teller_journal(db, *PERIOD, output="bytes")
+
+    expected = expected_subtotals(db, *PERIOD)
+    assert_subtotals(journal['subtotals'], expected)
+    assert journal['count'] == sum(count for count, _ in expected.values())
+
+    reader = PdfReader(BytesIO(journal['file']), strict=True)
+    assert journal['pages'] > 3 * 2
+    assert len(reader.pages) == journal['pages']
+    assert reader.metadata.title == "JOURNAL DE CAISSE"
+    last_page = reader.pages[-1].extract_text()
+    assert "Sous-totaux par type et devise" in last_page
+    assert f"{journal['count']} opération(s) reportée(s)" in last_page
+
+
+def test_branch_filter(db):
+    branch_code = db.conn.execute('''
+    SELECT i.branch_code FROM transactions t JOIN ibans i ON i.id = t.iban_id
+    WHERE t.date >= ? GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+    ''', (PERIOD[0],)).fetchone()[0]
+    journal = generate_teller_journal(db, *PERIOD, branch_code=branch_code, output="bytes")
+    assert_subtotals(journal['subtotals'], expected_subtotals(db, *PERIOD, branch_code))
+    assert 0 < journal['count'] < db.conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+
+
+def test_empty_day_still_produces_a_document(db, tmp_path):
+    path = str(tmp_path / "journal.pdf")
+    journal = generate_teller_journal(db, '1999-01-01', destination=path)
+    assert (journal['file'], journal['count'], journal['pages'], journal['subtotals']) == (path, 0, 1, {})
+    assert len(PdfReader(path).pages) == 1